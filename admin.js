@@ -2,8 +2,13 @@ document.addEventListener("DOMContentLoaded", () => {
     // Constants
     const API_URL = "http://localhost:8000";
 
-    // Load latest votes on page load
-    loadLatestVotes();
+    // Follow votes live; fall back to polling where EventSource is missing
+    if (window.EventSource) {
+        followLiveVotes();
+    } else {
+        loadLatestVotes();
+        setInterval(loadLatestVotes, 30000);
+    }
     
     // Add event listeners to form buttons
     const votingWindowsForm = document.getElementById('votingWindowsForm');
@@ -28,34 +33,62 @@ document.addEventListener("DOMContentLoaded", () => {
                 }
                 return response.json();
             })
-            .then(data => {
-                // Clear any existing rows
-                tbody.innerHTML = '';
-                
-                // Add new rows
-                data.forEach(vote => {
-                    const row = document.createElement('tr');
-                    row.innerHTML = `
-                        <td>${vote.username || 'Anonymous'}</td>
-                        <td>${formatTimestamp(vote.timestamp)}</td>
-                        <td>${vote.temperature}°C</td>
-                    `;
-                    tbody.appendChild(row);
-                });
-                
-                // Display message if no votes
-                if (data.length === 0) {
-                    const row = document.createElement('tr');
-                    row.innerHTML = '<td colspan="3" class="text-center">No votes in the current time window</td>';
-                    tbody.appendChild(row);
-                }
-            })
+            .then(data => renderVotes(tbody, data))
             .catch(error => {
                 console.error('Error fetching votes:', error);
                 displayError(tbody, 'Failed to load votes. Please try again.');
             });
     }
 
+    /**
+     * Subscribes to /votes/live: a snapshot of the current interval, then
+     * one event per accepted vote. EventSource reconnects by itself and
+     * the server answers a reconnect with a fresh snapshot.
+     */
+    function followLiveVotes() {
+        const tbody = document.querySelector('#votesTable tbody');
+        if (!tbody) return;
+
+        const source = new EventSource(`${API_URL}/votes/live`);
+        source.addEventListener('snapshot', (event) => {
+            renderVotes(tbody, JSON.parse(event.data).votes);
+        });
+        source.addEventListener('vote', (event) => {
+            const empty = tbody.querySelector('.no-votes');
+            if (empty) empty.remove();
+            tbody.appendChild(voteRow(JSON.parse(event.data)));
+        });
+    }
+
+    /**
+     * Replaces the table body with the given votes
+     */
+    function renderVotes(tbody, votes) {
+        // Clear any existing rows
+        tbody.innerHTML = '';
+
+        // Add new rows
+        votes.forEach(vote => tbody.appendChild(voteRow(vote)));
+
+        // Display message if no votes
+        if (votes.length === 0) {
+            const row = document.createElement('tr');
+            row.className = 'no-votes';
+            row.innerHTML = '<td colspan="3" class="text-center">No votes in the current time window</td>';
+            tbody.appendChild(row);
+        }
+    }
+
+    function voteRow(vote) {
+        const row = document.createElement('tr');
+        row.innerHTML = `
+            <td>${vote.username || 'Anonymous'}</td>
+            <td>${formatTimestamp(vote.timestamp)}</td>
+            <td>${vote.temperature}°C</td>
+        `;
+        return row;
+    }
+
     /**
      * Formats a timestamp string into a localized time string
      */
@@ -123,7 +156,4 @@ document.addEventListener("DOMContentLoaded", () => {
         // You can implement this with a custom notification system or use alert()
         alert(message);
     }
-
-    // Set up auto-refresh of votes table (every 30 seconds)
-    setInterval(loadLatestVotes, 30000);
 });
\ No newline at end of file
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Set, Tuple
+
+
+class RateLimiter:
+    """
+    Token bucket per key: `rate` tokens a second, holding at most `burst`.
+
+    Buckets are kept in least-recently-used order and the oldest are
+    dropped beyond `max_keys`; a dropped key simply starts with a full
+    bucket again. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 200000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.rejected = 0
+
+        # key -> [tokens, monotonic time of the last refill]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Take one token for `key`. Returns 0 if allowed, otherwise the
+    # seconds until a token is available.
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        granted, wait = self.acquire_many(key, 1, now)
+        return wait
+
+    # Take up to `count` tokens for `key`, as many as the bucket holds.
+    # Returns (tokens taken, seconds until the next one if none were).
+    def acquire_many(self, key: str, count: int, now: Optional[float] = None) -> Tuple[int, float]:
+        if self.rate <= 0:
+            return count, 0.0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            granted = min(count, int(bucket[0]))
+            bucket[0] -= granted
+            self.rejected += count - granted
+            if granted:
+                return granted, 0.0
+            return 0, (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class WindowVoters:
+    """
+    Who has voted in the current voting window, so a repeat vote is
+    turned away without touching SQLite. The set is replaced when a vote
+    for a new window arrives; 100k voters take a few MB.
+    """
+
+    def __init__(self):
+        self.window: Optional[datetime] = None
+        self.rejected = 0
+        self._voters: Set[str] = set()
+        self._lock = threading.Lock()
+
+    # Record `voter` for the window opened at `window`. False if they
+    # already voted in it.
+    def claim(self, voter: str, window: datetime) -> bool:
+        with self._lock:
+            if window != self.window:
+                if self.window is not None and window < self.window:
+                    # A straggler from the previous window; the database
+                    # constraint still catches a duplicate
+                    return True
+                self.window = window
+                self._voters = set()
+            if voter in self._voters:
+                self.rejected += 1
+                return False
+            self._voters.add(voter)
+            return True
+
+    # Forget a claim whose vote was not stored, so the voter can retry
+    def release(self, voter: str, window: datetime):
+        with self._lock:
+            if window == self.window:
+                self._voters.discard(voter)
+
+    def __len__(self):
+        return len(self._voters)
@@ -0,0 +1,208 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+
+# Size of the sliding window served by /average
+WINDOW = timedelta(hours=1)
+
+
+# Votes that fell within a single minute
+class _Bucket:
+    __slots__ = ("count", "total", "min", "max", "entries")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        # (timestamp, temperature) pairs kept sorted, only read for the
+        # minute that straddles the window edge
+        self.entries: List[Tuple[datetime, float]] = []
+
+    def add(self, timestamp: datetime, temperature: float):
+        self.count += 1
+        self.total += temperature
+        self.min = temperature if self.min is None else min(self.min, temperature)
+        self.max = temperature if self.max is None else max(self.max, temperature)
+        insort(self.entries, (timestamp, temperature))
+
+    def since(self, cutoff: datetime) -> List[float]:
+        idx = bisect_left(self.entries, (cutoff,))
+        return [temp for _, temp in self.entries[idx:]]
+
+
+def _minute(timestamp: datetime) -> datetime:
+    return timestamp.replace(second=0, microsecond=0)
+
+
+class VoteAggregator:
+    """
+    Running count/sum/min/max of the votes cast within the last hour,
+    kept in per-minute buckets so a read touches at most 61 buckets
+    regardless of how many votes were cast.
+    """
+
+    def __init__(self, window: timedelta = WINDOW):
+        self.window = window
+        self._buckets: Dict[datetime, _Bucket] = {}
+        self._lock = threading.Lock()
+        # Highest vote id read from the database, for catch_up
+        self.last_id = 0
+
+    def add(self, temperature: float, timestamp: datetime):
+        with self._lock:
+            key = _minute(timestamp)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            bucket.add(timestamp, temperature)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    # Rebuild the buckets from the votes table, e.g. at startup
+    def rebuild(self, db, now: Optional[datetime] = None):
+        from database import Vote
+
+        now = now or datetime.utcnow()
+        rows = db.query(Vote.timestamp, Vote.temperature).filter(
+            Vote.timestamp >= now - self.window
+        ).order_by(Vote.id).all()
+        last_id = db.query(func.max(Vote.id)).scalar() or 0
+
+        with self._lock:
+            self._buckets.clear()
+            self.last_id = last_id
+        for timestamp, temperature in rows:
+            self.add(temperature, timestamp)
+
+    # Add votes committed since the last read, by any process, to this
+    # aggregate and to `zones`; returns the new (timestamp, temperature) rows
+    def catch_up(self, db, zones: Optional["ZoneAggregators"] = None) -> List[Tuple[datetime, float]]:
+        from database import Vote
+
+        rows = db.query(Vote.id, Vote.timestamp, Vote.temperature, Vote.zone_id).filter(
+            Vote.id > self.last_id
+        ).order_by(Vote.id).all()
+        if not rows:
+            return []
+        for _, timestamp, temperature, zone_id in rows:
+            self.add(temperature, timestamp)
+            if zones is not None and zone_id is not None:
+                zones.add(zone_id, temperature, timestamp)
+        self.last_id = rows[-1][0]
+        return [(timestamp, temperature) for _, timestamp, temperature, _ in rows]
+
+    def _evict(self, cutoff: datetime):
+        edge = _minute(cutoff)
+        for key in [k for k in self._buckets if k < edge]:
+            del self._buckets[key]
+
+    def stats(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        cutoff = now - self.window
+
+        count, total = 0, 0.0
+        low, high = None, None
+        with self._lock:
+            self._evict(cutoff)
+            for key in sorted(self._buckets):
+                bucket = self._buckets[key]
+                if key < cutoff:
+                    # Edge minute: only the votes at or after the cutoff count
+                    temps = bucket.since(cutoff)
+                    if not temps:
+                        continue
+                    b_count, b_total = len(temps), sum(temps)
+                    b_min, b_max = min(temps), max(temps)
+                else:
+                    b_count, b_total = bucket.count, bucket.total
+                    b_min, b_max = bucket.min, bucket.max
+                count += b_count
+                total += b_total
+                low = b_min if low is None else min(low, b_min)
+                high = b_max if high is None else max(high, b_max)
+
+        return {"count": count, "sum": total, "min": low, "max": high}
+
+    # When the oldest vote in the window drops out of it, i.e. when stats()
+    # changes even if no vote arrives; None without votes
+    def expires_at(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        now = now or datetime.utcnow()
+        cutoff = now - self.window
+        with self._lock:
+            self._evict(cutoff)
+            for key in sorted(self._buckets):
+                entries = self._buckets[key].entries
+                idx = bisect_left(entries, (cutoff,))
+                if idx < len(entries):
+                    return entries[idx][0] + self.window
+        return None
+
+    # Same rounding as the original per-request query
+    def average(self, now: Optional[datetime] = None) -> Optional[float]:
+        stats = self.stats(now)
+        if not stats["count"]:
+            return None
+        return round(stats["sum"] / stats["count"], 1)
+
+
+class ZoneAggregators:
+    """
+    One VoteAggregator per zone, created by the zone's first vote, so a
+    zone's average reads only that zone's buckets however many zones and
+    votes there are. Zones that received votes are remembered until
+    take_touched() so their thermostats can be updated.
+    """
+
+    def __init__(self, window: timedelta = WINDOW):
+        self.window = window
+        self._zones: Dict[int, VoteAggregator] = {}
+        self._touched = set()
+        self._lock = threading.Lock()
+
+    def add(self, zone_id: int, temperature: float, timestamp: datetime):
+        with self._lock:
+            aggregator = self._zones.get(zone_id)
+            if aggregator is None:
+                aggregator = self._zones[zone_id] = VoteAggregator(self.window)
+            self._touched.add(zone_id)
+        aggregator.add(temperature, timestamp)
+
+    def get(self, zone_id: int) -> Optional[VoteAggregator]:
+        return self._zones.get(zone_id)
+
+    def zone_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._zones)
+
+    # Zones with votes added since the last call
+    def take_touched(self) -> List[int]:
+        with self._lock:
+            touched, self._touched = self._touched, set()
+        return sorted(touched)
+
+    def average(self, zone_id: int, now: Optional[datetime] = None) -> Optional[float]:
+        aggregator = self._zones.get(zone_id)
+        return aggregator.average(now) if aggregator is not None else None
+
+    def expires_at(self, zone_id: int, now: Optional[datetime] = None) -> Optional[datetime]:
+        aggregator = self._zones.get(zone_id)
+        return aggregator.expires_at(now) if aggregator is not None else None
+
+    # Rebuild every zone from the votes table, e.g. at startup
+    def rebuild(self, db, now: Optional[datetime] = None):
+        from database import Vote
+
+        now = now or datetime.utcnow()
+        rows = db.query(Vote.zone_id, Vote.timestamp, Vote.temperature).filter(
+            Vote.zone_id.isnot(None), Vote.timestamp >= now - self.window
+        ).order_by(Vote.id).all()
+
+        with self._lock:
+            self._zones.clear()
+        for zone_id, timestamp, temperature in rows:
+            self.add(zone_id, temperature, timestamp)
@@ -0,0 +1,227 @@
+import argparse
+import gzip
+import json
+import os
+from itertools import chain
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from database import Vote, VoteArchive
+from schedule import VotingSchedule
+import config
+import rollups
+
+# Rows read from votes.db per round trip while writing an archive
+READ_CHUNK = 5000
+
+# Free pages handed back per incremental vacuum step
+VACUUM_PAGES = 2000
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def archive_name(month: datetime) -> str:
+    return f"votes-{month:%Y-%m}.ndjson.gz"
+
+
+def _directory(directory: Optional[str]) -> str:
+    return directory or config.ARCHIVE_DIR
+
+
+# Write rows (id order) to `path` in the NDJSON export format, through a
+# temporary file so a crash never leaves a truncated archive behind.
+# Returns (count, first_id, last_id).
+def write_rows(path: str, rows: Iterable[tuple]) -> Tuple[int, Optional[int], Optional[int]]:
+    count, first_id, last_id = 0, None, None
+    partial = path + ".partial"
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            for vote_id, temperature, timestamp, username in rows:
+                line = json.dumps({
+                    "id": vote_id,
+                    "temperature": temperature,
+                    "timestamp": timestamp.isoformat() if timestamp else None,
+                    "username": username,
+                }, ensure_ascii=False, separators=(",", ":"))
+                f.write(line.encode() + b"\n")
+                count += 1
+                first_id = vote_id if first_id is None else first_id
+                last_id = vote_id
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    return count, first_id, last_id
+
+
+def read_rows(path: str) -> Iterator[tuple]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            vote = json.loads(line)
+            timestamp = vote["timestamp"]
+            yield (vote["id"], vote["temperature"],
+                   datetime.fromisoformat(timestamp) if timestamp else None, vote["username"])
+
+
+def _month_rows(db: Session, month: datetime, after_id: int) -> Iterator[tuple]:
+    query = db.query(Vote.id, Vote.temperature, Vote.timestamp, Vote.username).filter(
+        Vote.timestamp >= month,
+        Vote.timestamp < next_month(month),
+        Vote.id > after_id,
+    ).order_by(Vote.id).yield_per(READ_CHUNK)
+    for row in query:
+        yield tuple(row)
+
+
+# Delete the archived votes of one month, `batch` ids per transaction so
+# the vote writer never waits long for the write lock
+def delete_archived(db: Session, entry: VoteArchive, batch: int) -> int:
+    deleted = 0
+    low = entry.first_id
+    while low <= entry.last_id:
+        high = min(low + batch - 1, entry.last_id)
+        deleted += db.query(Vote).filter(
+            Vote.id >= low,
+            Vote.id <= high,
+            Vote.timestamp >= entry.month,
+            Vote.timestamp < next_month(entry.month),
+        ).delete(synchronize_session=False)
+        db.commit()
+        low = high + 1
+    return deleted
+
+
+# Roll up, archive and delete the votes of the month starting at `month`.
+# Re-running a month (after a crash, or for votes that arrived late) adds
+# the remaining votes to the existing file.
+def archive_month(db: Session, month: datetime, schedule: VotingSchedule, directory: Optional[str] = None,
+                  batch: Optional[int] = None) -> int:
+    directory = _directory(directory)
+    os.makedirs(directory, exist_ok=True)
+    rollups.rollup_missing(db, schedule, month, next_month(month))
+
+    entry = db.get(VoteArchive, month)
+    path = os.path.join(directory, entry.path if entry is not None else archive_name(month))
+
+    # Everything already in the file has a lower id than the votes left
+    if entry is not None:
+        rows = chain(read_rows(path), _month_rows(db, month, entry.last_id))
+    else:
+        rows = _month_rows(db, month, 0)
+    count, first_id, last_id = write_rows(path, rows)
+    if count == 0:
+        os.remove(path)
+        return 0
+
+    if entry is None:
+        entry = VoteArchive(month=month, path=os.path.basename(path))
+        db.add(entry)
+    entry.vote_count = count
+    entry.first_id = first_id
+    entry.last_id = last_id
+    entry.created_at = datetime.utcnow()
+    db.commit()
+    return delete_archived(db, entry, batch or config.ARCHIVE_DELETE_BATCH)
+
+
+# Scheduler job: archive every whole month older than `max_age`, oldest
+# first, then give the freed pages back
+def apply_retention(db: Session, schedule: VotingSchedule, max_age: timedelta, directory: Optional[str] = None,
+                    now: Optional[datetime] = None, batch: Optional[int] = None) -> dict:
+    now = now or datetime.utcnow()
+    cutoff = now - max_age
+    oldest = db.query(func.min(Vote.timestamp)).scalar()
+
+    archived = {}
+    month = month_start(oldest) if oldest is not None else None
+    while month is not None and next_month(month) <= cutoff:
+        deleted = archive_month(db, month, schedule, directory, batch)
+        if deleted:
+            archived[month.strftime("%Y-%m")] = deleted
+        month = next_month(month)
+    pages = reclaim_space(db) if archived else 0
+    return {"archived": archived, "pages_freed": pages}
+
+
+# Release up to `max_pages` free pages (needs auto_vacuum=INCREMENTAL)
+def reclaim_space(db: Session, max_pages: int = VACUUM_PAGES) -> int:
+    if db.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        return 0
+    before = db.execute(text("PRAGMA freelist_count")).scalar()
+    db.commit()
+    # Each step of the pragma frees one page and cursor.execute() only takes
+    # the first step; executescript() runs it to completion
+    db.connection().connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+    return before - db.execute(text("PRAGMA freelist_count")).scalar()
+
+
+# Start of the first month still read from votes.db (None: nothing archived)
+def archived_until(db: Session) -> Optional[datetime]:
+    last = db.query(func.max(VoteArchive.month)).scalar()
+    return next_month(last) if last is not None else None
+
+
+# Archived votes matching the /all-votes filters, in id order and in
+# chunks of `chunk_size`. Files outside the range are not opened.
+def archived_chunks(db: Session, chunk_size: int, after_id: int = 0, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, directory: Optional[str] = None) -> Iterator[List[tuple]]:
+    directory = _directory(directory)
+    query = db.query(VoteArchive).filter(VoteArchive.last_id > after_id)
+    if since is not None:
+        query = query.filter(VoteArchive.month >= month_start(since))
+    if until is not None:
+        query = query.filter(VoteArchive.month < until)
+
+    for entry in query.order_by(VoteArchive.month).all():
+        chunk = []
+        for row in read_rows(os.path.join(directory, entry.path)):
+            vote_id, _, timestamp, _ = row
+            if vote_id <= after_id:
+                continue
+            if since is not None and timestamp < since or until is not None and timestamp >= until:
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vote archive maintenance")
+    parser.add_argument("command", choices=["run", "vacuum"],
+                        help="run: archive now; vacuum: rebuild votes.db once so incremental vacuum works")
+    parser.add_argument("--days", type=float, default=config.VOTE_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine, migrate_db
+    from schedule import load_schedule
+    from backend import DEFAULT_SCHEDULE
+
+    migrate_db()
+    if args.command == "vacuum":
+        # Blocks every writer while it runs: use during a quiet period
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        print("votes.db rebuilt with incremental vacuum enabled.")
+        return
+
+    db = SessionLocal()
+    try:
+        result = apply_retention(db, load_schedule(db) or DEFAULT_SCHEDULE, timedelta(days=args.days))
+    finally:
+        db.close()
+    for month, count in result["archived"].items():
+        print(f"{month}: archived {count} votes")
+    print(f"Freed {result['pages_freed']} pages.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+import metrics
+
+
+class LoginPoolSaturated(Exception):
+    pass
+
+
+# Runs in a pool worker process
+def _verify_in_worker(plain_password: str, hashed_password: str) -> bool:
+    from database import verify_password
+    return verify_password(plain_password, hashed_password)
+
+
+class PasswordVerifier:
+    """
+    Runs bcrypt checks on a process pool so logins use every core instead
+    of holding request threads. At most `workers + max_pending` checks are
+    in flight; beyond that submit() raises LoginPoolSaturated.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 4 if max_pending is None else max_pending
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # The pool starts after uvicorn, the scheduler and the vote
+                # ingestor have threads running; forking this process could
+                # copy a lock some thread holds, so start workers clean
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def submit(self, plain_password: str, hashed_password: str) -> Future:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise LoginPoolSaturated()
+        started = time.perf_counter()
+        try:
+            future = self._get_pool().submit(_verify_in_worker, plain_password, hashed_password)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda done: self._finished(done, started))
+        return future
+
+    def _finished(self, future: Future, started: float):
+        self._slots.release()
+        if future.cancelled() or future.exception() is not None:
+            outcome = "error"
+        else:
+            outcome = "match" if future.result() else "mismatch"
+        metrics.PASSWORD_CHECKS.observe(time.perf_counter() - started, outcome)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self.submit(plain_password, hashed_password).result()
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self.submit(plain_password, hashed_password))
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SessionTokens:
+    """
+    Short-lived tokens handed out after a successful login, so repeat
+    logins from the same client skip bcrypt entirely.
+
+    Tokens live in this process only: with several workers, a token is
+    only known to the worker that issued it (see README).
+    """
+
+    def __init__(self, ttl: float = 900):
+        self.ttl = ttl
+        # token -> (email, monotonic expiry, Unix time issued), in the order
+        # issued; every token has the same ttl, so also in expiry order
+        self._tokens: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def issue(self, email: str) -> str:
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self._lock:
+            # Drop expired tokens from the oldest end while we hold the lock
+            while self._tokens and next(iter(self._tokens.values()))[1] <= now:
+                self._tokens.popitem(last=False)
+            self._tokens[token] = (email, now + self.ttl, time.time())
+        return token
+
+    # (email, Unix time issued) of the token, or None if unknown/expired
+    def session(self, token: Optional[str]) -> Optional[Tuple[str, float]]:
+        if not token:
+            return None
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._tokens[token]
+                return None
+            return entry[0], entry[2]
+
+    # Email the token was issued to, or None if unknown/expired
+    def lookup(self, token: Optional[str]) -> Optional[str]:
+        session = self.session(token)
+        return session[0] if session else None
+
+    def revoke(self, token: str):
+        with self._lock:
+            self._tokens.pop(token, None)
@@ -1,20 +1,51 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, time
-from database import SessionLocal, Vote, User, Feedback, hash_password, verify_password
-from models import VoteCreate, UserLogin, FeedbackCreate, VotingWindow, WindowUpdate
+from datetime import datetime, timedelta, time, timezone
+from database import ANONYMOUS, engine, async_engine, migrate_db, SessionLocal, AsyncSessionLocal, Vote, Feedback, VoteRollup
+from models import VoteCreate, VoteBatch, UserLogin, FeedbackCreate, VotingWindow, WindowUpdate, VotingScheduleUpdate, SensorBatch, ZoneCreate, UserZone
+from aggregator import VoteAggregator, ZoneAggregators
+from iot_dispatcher import ThermostatDispatcher, ThermostatRouter
+from ingest import VoteIngestor, PendingVote, DuplicateVote, DuplicateKey, ACK_COMMIT, purge_keys
+from admission import RateLimiter, WindowVoters
+from auth import PasswordVerifier, SessionTokens, LoginPoolSaturated
+from users import UserDirectory
+import rollups
+import vote_stats
+import export
+import serialize
+import archive
+import push
+import sensors
+import zones
+import weather
+from broadcast import BroadcastHub
+from cache import ResponseCache
+import metrics
+from shared_state import MemoryState, SqliteState, LeaderElector, ConfigWatcher
+from schedule import VotingSchedule, Window, parse_time, load_schedule, save_schedule
+import config
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-import requests
+from fastapi.responses import HTMLResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from concurrent.futures import Future, TimeoutError as FutureTimeout, wait as wait_futures
 import json
-from typing import List, Tuple
-from pywebpush import webpush, WebPushException
-from apscheduler.schedulers.background import BackgroundScheduler
+import math
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
 
 # Create FastAPI application
 app = FastAPI()
 
+# Per-route latency for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Time every SQL statement
+metrics.instrument_engine(engine)
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -22,10 +53,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by login.html and sent back as "Authorization: Bearer"
+    expose_headers=["X-Session-Token"],
 )
 
-# Templates setup
-templates = Jinja2Templates(directory="templates")
+# Templates setup, on the first /admin request (Jinja2 is slow to import)
+@lru_cache(maxsize=None)
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="templates")
 
 # Database dependency
 def get_db():
@@ -35,16 +71,153 @@ def get_db():
     finally:
         db.close()
 
+# Async database dependency (AIRVOTE_DB_MODE=async)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Running aggregate of the last hour of votes, served by /average
+vote_aggregator = VoteAggregator()
+if config.AVERAGE_METHOD not in vote_stats.METHODS:
+    raise ValueError(f"AIRVOTE_AVERAGE_METHOD must be one of {', '.join(vote_stats.METHODS)}")
+
+# The same per zone, for /average?zone_id= and the zone thermostats
+zone_aggregators = ZoneAggregators()
+
+# State shared by every worker process, the lease that picks the one
+# running singleton jobs, and the watcher applying config changed elsewhere
+shared_state = SqliteState(SessionLocal) if config.STATE_BACKEND == "sqlite" else MemoryState()
+leader = LeaderElector(shared_state, ttl=config.LEADER_TTL)
+config_watcher = ConfigWatcher(shared_state)
+SCHEDULE_KEY = "voting_schedule"
+REMINDED_KEY = "reminded_window"
+ZONES_KEY = "zones"
+USERS_KEY = "users"
+
+# Rendered /average, /votes/latest and /admin responses, dropped whenever
+# votes are committed or the schedule changes
+response_cache = ResponseCache(config.CACHE_MAX_ENTRIES)
+
+# Committed votes feed the running aggregate
+def on_votes_committed(batch):
+    if shared_state.shared:
+        # Every worker reads committed votes back from the table instead,
+        # see sync_shared_state
+        return
+    for pending in batch:
+        vote_aggregator.add(pending.temperature, pending.timestamp)
+        if pending.zone_id is not None:
+            zone_aggregators.add(pending.zone_id, pending.temperature, pending.timestamp)
+    response_cache.invalidate()
+    live_feed.publish(serialize_latest_votes((ANONYMOUS, p.timestamp, p.temperature) for p in batch))
+
+# Pushes accepted votes to admin pages over /votes/live
+live_feed = BroadcastHub(config.LIVE_FEED_BUFFER)
+
+# Users by email for /vote and /login; vote counts are flushed by a job
+user_directory = UserDirectory(SessionLocal, config.USER_CACHE_MAX_ENTRIES, config.USER_CACHE_TTL_SECONDS)
+
+# Group-commit writer for /vote
+vote_ingestor = VoteIngestor(
+    SessionLocal,
+    max_batch=config.VOTE_BATCH_MAX,
+    max_delay=config.VOTE_BATCH_DELAY_MS / 1000,
+    on_commit=on_votes_committed,
+    users=user_directory,
+)
+
+# Admission control for /vote
+vote_limiter = RateLimiter(config.VOTE_RATE_LIMIT / 60, config.VOTE_RATE_BURST, config.VOTE_RATE_MAX_KEYS)
+anonymous_limiter = RateLimiter(config.VOTE_RATE_LIMIT_ANONYMOUS / 60, config.VOTE_RATE_BURST,
+                                config.VOTE_RATE_MAX_KEYS)
+window_voters = WindowVoters()
+
+# Bulk writer for thermostat sensor readings
+sensor_store = sensors.SensorStore(SessionLocal)
+
+# Outdoor conditions for /weather, one upstream fetch per grid cell per TTL;
+# every fetch is recorded next to the votes
+def record_weather(bucket, reading, fetched_at):
+    db = SessionLocal()
+    try:
+        weather.record_reading(db, bucket, reading, fetched_at)
+    finally:
+        db.close()
+
+weather_cache = weather.WeatherCache(
+    weather.OpenMeteo(config.WEATHER_URL, config.WEATHER_TIMEOUT),
+    ttl=config.WEATHER_TTL_SECONDS,
+    step=config.WEATHER_BUCKET_DEGREES,
+    max_entries=config.WEATHER_CACHE_MAX_ENTRIES,
+    on_fetch=record_weather,
+)
+
+# Background push of the average to the thermostat
+thermostat_dispatcher = ThermostatDispatcher(
+    config.THERMOSTAT_URL,
+    timeout=config.THERMOSTAT_TIMEOUT,
+    max_retries=config.THERMOSTAT_MAX_RETRIES,
+    retry_interval=config.THERMOSTAT_RETRY_SECONDS,
+)
+
+# Each zone's average goes to the zone's own thermostat
+thermostat_router = ThermostatRouter(
+    idle_timeout=config.ZONE_DISPATCHER_IDLE_SECONDS,
+    timeout=config.THERMOSTAT_TIMEOUT,
+    max_retries=config.THERMOSTAT_MAX_RETRIES,
+    retry_interval=config.THERMOSTAT_RETRY_SECONDS,
+)
+
+# bcrypt checks run on a bounded process pool; a login hands back a
+# short-lived session token so repeat logins skip bcrypt
+password_verifier = PasswordVerifier(config.LOGIN_POOL_WORKERS, config.LOGIN_POOL_MAX_PENDING)
+session_tokens = SessionTokens(ttl=config.SESSION_TOKEN_TTL)
+SESSION_COOKIE = "airvote_session"
+
 # Push notification settings
 VAPID_PUBLIC_KEY = "your-public-key"
 VAPID_PRIVATE_KEY = "your-private-key"
-subscriptions = []  # In-memory storage; use DB in production
+VAPID_CLAIMS = {"sub": "mailto:admin@yourdomain.com"}
+push_fanout = push.PushFanout(VAPID_PRIVATE_KEY, VAPID_CLAIMS, workers=config.PUSH_WORKERS)
 
 # Voting window settings (default values)
-voting_windows: List[Tuple[time, time]] = [
+DEFAULT_SCHEDULE = VotingSchedule.daily([
     (time(9, 0), time(9, 15)),  # 9:00 AM - 9:15 AM
     (time(13, 0), time(13, 15))  # 1:00 PM - 1:15 PM
-]
+])
+
+# Active schedule. Admin updates build a new VotingSchedule and swap the
+# reference, so readers never see a half-updated schedule.
+voting_schedule = DEFAULT_SCHEDULE
+
+# Zones by id. Changes build a new dict and swap the reference, like the
+# schedule.
+zone_directory: Dict[int, dict] = {}
+
+def apply_zones(new_zones: Dict[int, dict]):
+    global zone_directory
+    for zone_id, zone in new_zones.items():
+        url = zone["thermostat_url"]
+        if url and not zones.thermostat_url_allowed(url, config.THERMOSTAT_HOSTS):
+            # Stored before the allow-list, or the list has changed since
+            print(f"Zone {zone_id}: thermostat host not allowed, not pushing to {url}")
+            url = None
+        thermostat_router.route(zone_id, url)
+    zone_directory = new_zones
+    response_cache.invalidate()
+
+def reload_zones():
+    db = SessionLocal()
+    try:
+        apply_zones(zones.load_zones(db))
+    finally:
+        db.close()
+
+def on_zones_changed(value: Optional[str]):
+    reload_zones()
+
+def unknown_zone(status_code: int = 404):
+    return HTTPException(status_code=status_code, detail="Unknown zone")
 
 # Temperature validation
 def validate_temperature(temp: float) -> bool:
@@ -52,25 +225,44 @@ def validate_temperature(temp: float) -> bool:
 
 # Check if current time is within a voting window
 def is_within_voting_window(current: datetime) -> bool:
-    now_time = current.time()
-    
-    for start, end in voting_windows:
-        if start <= now_time <= end:
-            return True
-    
-    return False
+    return voting_schedule.is_open(current)
 
-# Validate voting windows don't overlap
-def times_overlap(start1, end1, start2, end2):
-    return max(start1, start2) < min(end1, end2)
+# Swap in a schedule and move the reminder to its next opening
+def apply_voting_schedule(new_schedule: VotingSchedule):
+    global voting_schedule
+    voting_schedule = new_schedule
+    response_cache.invalidate()
+    schedule_reminder()
 
-# Endpoints
-@app.post("/vote")
-def submit_vote(vote: VoteCreate, db: Session = Depends(get_db)):
-    now = datetime.utcnow()
-    
+# Persist a new schedule and announce it to the other workers
+def replace_voting_schedule(new_schedule: VotingSchedule, db: Session):
+    save_schedule(db, new_schedule)
+    version = shared_state.set(SCHEDULE_KEY, json.dumps(new_schedule.to_dict()))
+    config_watcher.seen(SCHEDULE_KEY, version)
+    apply_voting_schedule(new_schedule)
+
+def on_schedule_changed(value: Optional[str]):
+    if value:
+        apply_voting_schedule(VotingSchedule.from_dict(json.loads(value)))
+
+# Message shown after a vote, based on the user's running vote count
+def vote_response_message(votes_count) -> str:
+    if votes_count is None:
+        return "Vote recorded!"
+    if votes_count == 1:
+        return "Thanks for your vote! Please rate us out of 5 stars."
+    elif votes_count % 10 == 0:
+        return "We hope you're enjoying your experience - rate us here"
+    elif votes_count == 15:
+        return "Thanks for being a loyal user! Here is an opportunity to complete a short 5-question survey."
+    return "Vote recorded!"
+
+# Reject votes outside a window or out of range; returns when the
+# current window opened
+def check_vote(vote: VoteCreate, now: datetime) -> datetime:
     # Validate voting window
-    if not is_within_voting_window(now):
+    window = voting_schedule.current_window(now)
+    if window is None:
         raise HTTPException(status_code=403, 
                           detail="Voting is only allowed during designated voting windows.")
     
@@ -78,89 +270,486 @@ def submit_vote(vote: VoteCreate, db: Session = Depends(get_db)):
     if not validate_temperature(vote.temperature):
         raise HTTPException(status_code=400, 
                           detail="Temperature must be between 15°C and 25°C.")
-    
-    # Create vote record
-    vote_record = Vote(temperature=vote.temperature, timestamp=now)
-    db.add(vote_record)
-    
-    # Increment user vote count if user_email provided
-    response_message = "Vote recorded!"
-    if vote.user_email:
-        user = db.query(User).filter(User.email == vote.user_email).first()
-        if user:
-            user.votes_count += 1
-            
-            # Custom messages based on vote count
-            if user.votes_count == 1:
-                response_message = "Thanks for your vote! Please rate us out of 5 stars."
-            elif user.votes_count % 10 == 0:
-                response_message = "We hope you're enjoying your experience - rate us here"
-            elif user.votes_count == 15:
-                response_message = "Thanks for being a loyal user! Here is an opportunity to complete a short 5-question survey."
-    
-    db.commit()
-    return {"message": response_message}
 
-@app.get("/average")
-def get_average(db: Session = Depends(get_db)):
-    now = datetime.utcnow()
-    one_hour_ago = now - timedelta(hours=1)
-    votes = db.query(Vote).filter(Vote.timestamp >= one_hour_ago).all()
+    if vote.zone_id is not None and vote.zone_id not in zone_directory:
+        raise unknown_zone(400)
+    return window[0]
 
-    if not votes:
-        return {"average": None}
+def already_voted():
+    return HTTPException(status_code=409, detail="You have already voted in this voting window.")
 
-    average = round(sum(v.temperature for v in votes) / len(votes), 1)
+# Take a token from the voter's rate limit bucket; returns the logged-in
+# user's email, if any
+def rate_limit_voter(request: Request) -> Optional[str]:
+    session_email = session_tokens.lookup(request_session_token(request))
+    limiter, key = voter_bucket(request, session_email)
+    wait = limiter.acquire(key)
+    if wait:
+        raise too_many_votes(wait)
+    return session_email
 
-    # Simulate pushing average to IoT device
-    try:
-        mock_iot_device_url = "http://localhost:5000/set-temperature"
-        response = requests.post(mock_iot_device_url, json={"temperature": average})
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Error sending to IoT device: {e}")
+# The limiter and key a vote is counted against. A claimed user_email is
+# not proof of identity, so anonymous clients are limited by address
+# (the forwarded one, when uvicorn trusts the proxy).
+def voter_bucket(request: Request, session_email: Optional[str]) -> Tuple[RateLimiter, str]:
+    if session_email:
+        return vote_limiter, session_email
+    return anonymous_limiter, request.client.host if request.client else ""
 
-    return {"average": average}
+def too_many_votes(wait: float):
+    return HTTPException(status_code=429, detail="Too many votes, please slow down.",
+                         headers={"Retry-After": str(math.ceil(wait))})
 
-@app.get("/all-votes")
-def get_all_votes(db: Session = Depends(get_db)):
-    return db.query(Vote).all()
+# Rate limit and deduplicate in memory, so rejected votes never reach
+# SQLite; returns the voter's email (None if anonymous) and whether the
+# vote holds the voter's claim on the window. Only a session identifies
+# the voter: a vote naming a user_email without one counts as anonymous,
+# so nobody can use up another user's vote. A vote with a key may be a
+# retry of one that timed out, so it is not refused here; the ingestor
+# checks its key before the window.
+def admit_vote(vote: VoteCreate, request: Request, window_start: datetime) -> Tuple[Optional[str], bool]:
+    email = rate_limit_voter(request)
+    if not email or window_voters.claim(email, window_start):
+        return email, True
+    if vote.key is None:
+        raise already_voted()
+    return email, False
 
-@app.get("/votes/latest")
-def get_latest_votes(db: Session = Depends(get_db)):
-    now = datetime.utcnow()
+# Queue an admitted vote; the ingestor commits it (and the user's vote
+# count) in a batch. A vote that fails to commit frees the voter's claim.
+# Returns the future and whether the vote held the claim.
+def queue_vote(vote: VoteCreate, request: Request, now: datetime) -> Tuple[Future, bool]:
+    window_start = check_vote(vote, now)
+    email, claimed = admit_vote(vote, request, window_start)
+    future = vote_ingestor.submit(vote.temperature, now, email, window_start, vote.zone_id, vote.key)
+    if email and claimed:
+        def release(done):
+            error = done.exception()
+            if error is not None and not isinstance(error, (DuplicateVote, DuplicateKey)):
+                window_voters.release(email, window_start)
+        future.add_done_callback(release)
+    return future, claimed
 
-    # Get the most recent 15-minute interval start
+# The 15-minute interval shown by /votes/latest
+def latest_interval(now: datetime):
     interval_start = now.replace(minute=(now.minute // 15) * 15, second=0, microsecond=0)
-    interval_end = interval_start + timedelta(minutes=15)
+    return interval_start, interval_start + timedelta(minutes=15)
+
+def latest_votes_query(now: datetime):
+    interval_start, interval_end = latest_interval(now)
 
-    recent_votes = db.query(Vote).filter(
+    return select(Vote.username, Vote.timestamp, Vote.temperature).where(
         Vote.timestamp >= interval_start,
         Vote.timestamp < interval_end
-    ).all()
+    )
+
+LATEST_COLUMNS = ("username", "timestamp", "temperature")
 
+def serialize_latest_votes(rows):
     return [
         {
-            "username": vote.username,
-            "timestamp": vote.timestamp.isoformat(),
-            "temperature": vote.temperature
+            "username": username,
+            "timestamp": timestamp.isoformat(),
+            "temperature": temperature
         }
-        for vote in recent_votes
+        for username, timestamp, temperature in rows
     ]
 
-@app.post("/login")
-def login_user(user: UserLogin, db: Session = Depends(get_db)):
+# The vote is still queued and may yet be stored; a retry with the same
+# key is answered as a duplicate
+def commit_timeout():
+    return HTTPException(status_code=503, detail="Vote not stored yet, please retry",
+                         headers={"Retry-After": "5"})
+
+# Endpoints
+# Without the claim the vote is most likely a repeat, so it is answered
+# once the ingestor has checked it, whatever AIRVOTE_VOTE_ACK_MODE says
+def submit_vote(vote: VoteCreate, request: Request):
+    future, claimed = queue_vote(vote, request, datetime.utcnow())
+    if claimed and config.VOTE_ACK_MODE != ACK_COMMIT:
+        return {"message": "Vote recorded!"}
+
+    try:
+        votes_count = future.result(timeout=config.VOTE_COMMIT_TIMEOUT)
+    except FutureTimeout:
+        raise commit_timeout()
+    except DuplicateVote:
+        raise already_voted()
+    except DuplicateKey:
+        # A retry of a vote that was stored
+        votes_count = None
+    return {"message": vote_response_message(votes_count)}
+
+async def submit_vote_async(vote: VoteCreate, request: Request):
+    future, claimed = queue_vote(vote, request, datetime.utcnow())
+    if claimed and config.VOTE_ACK_MODE != ACK_COMMIT:
+        return {"message": "Vote recorded!"}
+
+    try:
+        votes_count = await asyncio.wait_for(asyncio.wrap_future(future), config.VOTE_COMMIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise commit_timeout()
+    except DuplicateVote:
+        raise already_voted()
+    except DuplicateKey:
+        votes_count = None
+    return {"message": vote_response_message(votes_count)}
+
+# Check one replayed vote against the window open when it was cast; returns
+# the PendingVote, or an error message. A session may replay votes for any
+# window that closed after it signed in; without one, only the window open
+# now can be voted in, as with /vote.
+def replayed_vote(vote, session: Optional[Tuple[str, float]], now: datetime):
+    if not 0 < len(vote.key) <= 64:
+        return "Key must be 1 to 64 characters."
+    timestamp = vote.timestamp
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    # Clock skew can put a vote slightly in the future
+    timestamp = min(timestamp, now)
+    if timestamp < now - timedelta(hours=config.VOTE_REPLAY_MAX_AGE_HOURS):
+        return "Vote is too old to replay."
+    try:
+        window_start = check_vote(vote, timestamp)
+    except HTTPException as e:
+        return e.detail
+    window_end = voting_schedule.current_window(timestamp)[1]
+    if session is None:
+        if window_end <= now:
+            return "Log in to send votes for a closed voting window."
+    elif window_end <= datetime.utcfromtimestamp(session[1]):
+        return "Vote is from a voting window before this session logged in."
+    email = session[0] if session else None
+    return PendingVote(vote.temperature, timestamp, email, window_start, vote.zone_id, vote.key)
+
+# Votes queued offline (by sw.js) and sent together. Each has a client
+# key: a key already stored reports "duplicate", so resending a batch is
+# harmless. Each vote takes a rate limit token; votes beyond what the
+# voter's bucket holds come back "deferred" for the client to resend
+# later. The batch is committed in one transaction and answered once
+# committed, whatever AIRVOTE_VOTE_ACK_MODE says.
+@app.post("/votes/batch")
+def submit_vote_batch(batch: VoteBatch, request: Request):
+    if len(batch.votes) > config.VOTE_BATCH_REQUEST_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {config.VOTE_BATCH_REQUEST_MAX} votes per batch.")
+    session = session_tokens.session(request_session_token(request))
+    limiter, key = voter_bucket(request, session and session[0])
+    granted, wait = limiter.acquire_many(key, len(batch.votes))
+    if batch.votes and not granted:
+        raise too_many_votes(wait)
+    now = datetime.utcnow()
+
+    results, queued = [], []
+    for index, vote in enumerate(batch.votes):
+        if index >= granted:
+            results.append({"key": vote.key, "status": "deferred"})
+            continue
+        checked = replayed_vote(vote, session, now)
+        if isinstance(checked, str):
+            results.append({"key": vote.key, "status": "rejected", "detail": checked})
+        else:
+            # Queued even without the claim: the vote may be a resend of
+            # one that timed out, and the ingestor checks its key first
+            claimed = not checked.user_email or window_voters.claim(checked.user_email, checked.window_start)
+            result = {"key": vote.key, "status": "stored"}
+            results.append(result)
+            queued.append((result, checked, claimed))
+
+    futures = vote_ingestor.submit_many([vote for _, vote, _ in queued])
+    # Committed in one transaction, so they finish together
+    wait_futures(futures, timeout=config.VOTE_COMMIT_TIMEOUT)
+    stored, failed = [], False
+    for (result, vote, claimed), future in zip(queued, futures):
+        error = future.exception() if future.done() else FutureTimeout()
+        if error is None:
+            stored.append(vote)
+            continue
+        if isinstance(error, DuplicateKey):
+            result["status"] = "duplicate"
+        elif isinstance(error, DuplicateVote):
+            result.update(status="rejected", detail=already_voted().detail)
+        else:
+            failed = True
+            # A vote that timed out may still be stored, so keeps its claim
+            if vote.user_email and claimed and future.done():
+                window_voters.release(vote.user_email, vote.window_start)
+    if failed:
+        # Nothing was committed (yet); the client keeps the batch and
+        # retries, and keys stored meanwhile come back as duplicates
+        raise HTTPException(status_code=503, detail="Votes could not be stored, please retry",
+                            headers={"Retry-After": "5"})
+
+    refresh_closed_rollups(stored, now)
+    return {"stored": len(stored), "results": results}
+
+# A late vote for a window that has closed updates the window's rollup
+def refresh_closed_rollups(votes, now: datetime):
+    windows = {voting_schedule.current_window(vote.timestamp) for vote in votes}
+    closed = sorted(window for window in windows if window is not None and window[1] <= now)
+    if not closed:
+        return
+    db = SessionLocal()
+    try:
+        for start, end in closed:
+            rollups.rollup_window(db, start, end)
+    except Exception as e:
+        print("Rollup failed: ", e)
+    finally:
+        db.close()
+
+# Statistics of the votes cast in the `minutes` before `now`, in one zone
+# or the whole office
+def summarize_votes(now: datetime, minutes: float = 60, zone_id: Optional[int] = None) -> dict:
+    db = SessionLocal()
+    try:
+        temperatures, ages = vote_stats.fetch_window(db, now - timedelta(minutes=minutes), now, zone_id)
+    finally:
+        db.close()
+    return vote_stats.summarize(temperatures, ages, trim=config.AVERAGE_TRIM,
+                                half_life=config.AVERAGE_HALF_LIFE_MINUTES * 60)
+
+# The last hour's average by AIRVOTE_AVERAGE_METHOD, for one zone or
+# the whole office
+def current_average(now: datetime, zone_id: Optional[int] = None) -> Optional[float]:
+    if config.AVERAGE_METHOD == "mean":
+        if zone_id is None:
+            return vote_aggregator.average(now)
+        return zone_aggregators.average(zone_id, now)
+    minutes = vote_aggregator.window.total_seconds() / 60
+    value = summarize_votes(now, minutes, zone_id)[config.AVERAGE_METHOD]
+    return round(value, 1) if value is not None else None
+
+# The average last computed for /average, by zone (None for the office)
+served_averages: Dict[Optional[int], float] = {}
+
+def compute_average(zone_id: Optional[int] = None):
+    now = datetime.utcnow()
+    average = current_average(now, zone_id)
+    if average is None:
+        served_averages.pop(zone_id, None)
+        return {"average": None}, None
+    served_averages[zone_id] = average
+
+    # Valid until a vote arrives or the oldest one leaves the hour; a
+    # weighted mean also drifts as votes age, so refresh it every minute
+    if zone_id is None:
+        expires_at = vote_aggregator.expires_at(now)
+    else:
+        expires_at = zone_aggregators.expires_at(zone_id, now)
+    if config.AVERAGE_METHOD == "weighted_mean":
+        refresh = now + timedelta(minutes=1)
+        expires_at = refresh if expires_at is None else min(expires_at, refresh)
+    return {"average": average}, expires_at
+
+# /average?zone_id= is the zone's average; the cache keys on the query
+def get_average(request: Request, zone_id: Optional[int] = None):
+    if zone_id is not None and zone_id not in zone_directory:
+        raise unknown_zone()
+    response = response_cache.respond(request, lambda: compute_average(zone_id))
+    push_served_average(zone_id)
+    return response
+
+# Hand the average /average serves to the IoT dispatcher on every request,
+# cached or not, so a device that failed earlier catches up; submit()
+# skips values already delivered
+def push_served_average(zone_id: Optional[int]):
+    average = served_averages.get(zone_id)
+    if average is None:
+        return
+    if zone_id is None:
+        thermostat_dispatcher.submit(average)
+    else:
+        thermostat_router.submit(zone_id, average)
+
+async def get_average_async(request: Request, zone_id: Optional[int] = None):
+    if config.AVERAGE_METHOD == "mean":
+        return get_average(request, zone_id)
+    # The other methods read the window from the database
+    return await run_in_threadpool(get_average, request, zone_id)
+
+# Mean, median, trimmed and weighted means, spread and histogram of the
+# votes cast in the last `minutes`
+@app.get("/stats/summary")
+def get_vote_summary(minutes: float = 60, zone_id: Optional[int] = None):
+    if not 0 < minutes <= 7 * 24 * 60:
+        raise HTTPException(status_code=400, detail="minutes must be between 0 and 10080")
+    if zone_id is not None and zone_id not in zone_directory:
+        raise unknown_zone()
+    return summarize_votes(datetime.utcnow(), minutes, zone_id)
+
+@app.get("/zones")
+def get_zones():
+    now = datetime.utcnow()
+    return [{**zone, "average": current_average(now, zone_id)} for zone_id, zone in zone_directory.items()]
+
+# Create a zone, or repoint an existing one (by name) at another thermostat
+@app.post("/zones")
+def update_zone(update: ZoneCreate, db: Session = Depends(get_db)):
+    if update.thermostat_url and not zones.thermostat_url_allowed(update.thermostat_url, config.THERMOSTAT_HOSTS):
+        raise HTTPException(status_code=400, detail="thermostat_url must be http(s) on a host in AIRVOTE_THERMOSTAT_HOSTS")
+    zone = zones.save_zone(db, update.name, update.thermostat_url)
+    version = shared_state.set(ZONES_KEY, json.dumps(zone))
+    config_watcher.seen(ZONES_KEY, version)
+    apply_zones(zones.load_zones(db))
+    return zone
+
+# The zone a user's votes count towards when a vote names none
+@app.post("/users/zone")
+def set_user_zone(update: UserZone, db: Session = Depends(get_db)):
+    if update.zone_id is not None and update.zone_id not in zone_directory:
+        raise unknown_zone()
+    if not zones.assign_user(db, update.email, update.zone_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    user_changed(update.email)
+    return {"message": "Zone updated"}
+
+# Drop a changed user from this worker's directory and every other one's
+def user_changed(email: str):
+    user_directory.invalidate(email)
+    version = shared_state.set(USERS_KEY, email)
+    config_watcher.seen(USERS_KEY, version)
+
+def on_users_changed(value: Optional[str]):
+    user_directory.invalidate(value)
+
+# Without `limit` the whole table is streamed as one JSON array; with it,
+# one keyset page is returned and `next_cursor` is passed back as after_id.
+# Pages can be sent as MessagePack (Accept: application/msgpack) and in
+# the columnar layout.
+@app.get("/all-votes")
+def get_all_votes(request: Request, limit: Optional[int] = Query(None, ge=1, le=export.MAX_PAGE_SIZE), after_id: int = 0,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  layout: str = "rows", db: Session = Depends(get_db)):
+    serialize.check_layout(layout)
+    if limit is None:
+        if layout != "rows":
+            raise HTTPException(status_code=400, detail="layout=columns needs a limit")
+        chunks = export.vote_chunks(SessionLocal, after_id=after_id, since=since, until=until)
+        return StreamingResponse(export.iter_json_array(chunks), media_type="application/json")
+    page = export.vote_page(db, after_id, limit, layout, since=since, until=until)
+    return serialize.render(page, serialize.negotiate(request))
+
+EXPORT_FORMATS = {
+    "ndjson": (export.iter_ndjson, "application/x-ndjson"),
+    "csv": (export.iter_csv, "text/csv"),
+}
+
+@app.get("/all-votes/export")
+def export_votes(format: str = "ndjson", since: Optional[datetime] = None, until: Optional[datetime] = None):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be one of: ndjson, csv")
+
+    encode, media_type = EXPORT_FORMATS[format]
+    chunks = export.vote_chunks(SessionLocal, since=since, until=until)
+    return StreamingResponse(encode(chunks), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=votes.{format}"})
+
+# JSON or MessagePack by Accept, as objects or (layout=columns) one list
+# per field, encoded straight from the row tuples
+def get_latest_votes(request: Request, layout: str = "rows", db: Session = Depends(get_db)):
+    serialize.check_layout(layout)
+    media_type = serialize.negotiate(request)
+
+    def build():
+        now = datetime.utcnow()
+        rows = db.execute(latest_votes_query(now)).all()
+        payload = serialize.layout_rows(rows, LATEST_COLUMNS, layout)
+        return serialize.render(payload, media_type), latest_interval(now)[1]
+    return response_cache.respond(request, build, media_type)
+
+async def get_latest_votes_async(request: Request, layout: str = "rows", db=Depends(get_async_db)):
+    serialize.check_layout(layout)
+    media_type = serialize.negotiate(request)
+
+    async def build():
+        now = datetime.utcnow()
+        rows = (await db.execute(latest_votes_query(now))).all()
+        payload = serialize.layout_rows(rows, LATEST_COLUMNS, layout)
+        return serialize.render(payload, media_type), latest_interval(now)[1]
+    return await response_cache.respond_async(request, build, media_type)
+
+# Session token sent back by the client, as a cookie or bearer header
+def request_session_token(request: Request):
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        return auth_header[len("Bearer "):]
+    return request.cookies.get(SESSION_COOKIE)
+
+def issue_session(response: Response, email: str):
+    token = session_tokens.issue(email)
+    response.headers["X-Session-Token"] = token
+    response.set_cookie(SESSION_COOKIE, token, max_age=int(session_tokens.ttl), httponly=True, samesite="lax")
+
+def login_busy():
+    return HTTPException(status_code=503, detail="Login service busy, please retry",
+                         headers={"Retry-After": "1"})
+
+def login_user(user: UserLogin, request: Request, response: Response, db: Session = Depends(get_db)):
+    # A valid session token for this user skips the password check
+    if session_tokens.lookup(request_session_token(request)) == user.email:
+        return {"message": "Login successful"}
+
     # Check if user exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user is None:
+    db_user = user_directory.get(db, user.email)
+    if not db_user.exists:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Verify the password
-    if not verify_password(user.password, db_user.password_hash):
+    # Verify the password on the bcrypt pool
+    try:
+        valid = password_verifier.verify(user.password, db_user.password_hash)
+    except LoginPoolSaturated:
+        raise login_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    issue_session(response, user.email)
+    return {"message": "Login successful"}
+
+async def login_user_async(user: UserLogin, request: Request, response: Response, db=Depends(get_async_db)):
+    if session_tokens.lookup(request_session_token(request)) == user.email:
+        return {"message": "Login successful"}
+
+    db_user = user_directory.cached(user.email)
+    if db_user is None:
+        row = (await db.execute(UserDirectory.query([user.email]))).first()
+        db_user = user_directory.put(user.email, row)
+    if not db_user.exists:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    try:
+        valid = await password_verifier.verify_async(user.password, db_user.password_hash)
+    except LoginPoolSaturated:
+        raise login_busy()
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    issue_session(response, user.email)
     return {"message": "Login successful"}
 
+# The hot endpoints run either as sync handlers on the threadpool or as
+# coroutines on an AsyncSession, selected by AIRVOTE_DB_MODE
+if config.DB_MODE == "async":
+    app.post("/vote")(submit_vote_async)
+    app.get("/average")(get_average_async)
+    app.get("/votes/latest")(get_latest_votes_async)
+    app.post("/login")(login_user_async)
+else:
+    app.post("/vote")(submit_vote)
+    app.get("/average")(get_average)
+    app.get("/votes/latest")(get_latest_votes)
+    app.post("/login")(login_user)
+
+# Server-sent events: a snapshot of the current interval, then one
+# event per accepted vote
+@app.get("/votes/live")
+async def live_votes():
+    client = live_feed.subscribe()
+    return StreamingResponse(
+        live_feed.stream(client),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/submit-feedback")
 def submit_feedback(feedback: FeedbackCreate, db: Session = Depends(get_db)):
     new_feedback = Feedback(**feedback.dict())
@@ -176,30 +765,85 @@ def get_admin_page(request: Request, db: Session = Depends(get_db)):
     if not user_is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    # Get votes from the last hour
-    now = datetime.utcnow()
-    start_time = now - timedelta(hours=1)
-    votes = db.query(Vote).filter(Vote.timestamp >= start_time).all()
+    def build():
+        # Get votes from the last hour
+        now = datetime.utcnow()
+        start_time = now - timedelta(hours=1)
+        votes = db.query(Vote).filter(Vote.timestamp >= start_time).all()
+
+        # Render the admin page with the data
+        page = get_templates().TemplateResponse("admin.html", {"request": request, "votes": votes})
+        return page, vote_aggregator.expires_at(now)
+    return response_cache.respond(request, build)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return response_cache.stats()
 
-    # Render the admin page with the data
-    return templates.TemplateResponse("admin.html", {"request": request, "votes": votes})
+# Values owned by other components, read at scrape time
+metrics.Gauge("airvote_vote_queue_depth", "Votes waiting for the writer", lambda: vote_ingestor.stats()["queued"])
+metrics.Gauge("airvote_vote_lock_wait_seconds_total", "Time the vote writer waited for SQLite's write lock",
+              lambda: vote_ingestor.lock_wait, kind="counter")
+metrics.Gauge("airvote_live_feed_clients", "Connected /votes/live clients", lambda: live_feed.client_count)
+metrics.Gauge("airvote_cache_hits_total", "Read cache hits", lambda: response_cache.hits, kind="counter")
+metrics.Gauge("airvote_cache_misses_total", "Read cache misses", lambda: response_cache.misses, kind="counter")
+metrics.Gauge("airvote_login_rejected_total", "Logins turned away by a full bcrypt pool",
+              lambda: password_verifier.rejected, kind="counter")
+metrics.Gauge("airvote_thermostat_pushes_total", "Temperatures delivered to the thermostat",
+              lambda: thermostat_dispatcher.pushes, kind="counter")
+metrics.Gauge("airvote_zone_thermostat_pushes_total", "Temperatures delivered to zone thermostats",
+              lambda: thermostat_router.pushes, kind="counter")
+metrics.Gauge("airvote_zone_dispatchers_active", "Zone thermostat dispatchers with a running thread",
+              lambda: thermostat_router.active)
+metrics.Gauge("airvote_votes_rate_limited_total", "Votes turned away by the per-voter rate limit",
+              lambda: vote_limiter.rejected + anonymous_limiter.rejected, kind="counter")
+metrics.Gauge("airvote_votes_duplicate_total", "Repeat votes in the same window, in memory or by the database",
+              lambda: window_voters.rejected + vote_ingestor.duplicates, kind="counter")
+metrics.Gauge("airvote_user_cache_hits_total", "User directory lookups served from memory",
+              lambda: user_directory.hits, kind="counter")
+metrics.Gauge("airvote_user_cache_misses_total", "User directory lookups that read the users table",
+              lambda: user_directory.misses, kind="counter")
+metrics.Gauge("airvote_user_cache_entries", "Users held in the user directory", lambda: len(user_directory))
+metrics.Gauge("airvote_user_votes_unflushed", "Users with vote counts not yet written to the users table",
+              lambda: user_directory.stats()["pending_users"])
+metrics.Gauge("airvote_weather_upstream_fetches_total", "Weather readings fetched from the upstream API",
+              lambda: weather_cache.fetches, kind="counter")
+metrics.Gauge("airvote_weather_cache_hits_total", "/weather requests served from the cache",
+              lambda: weather_cache.hits, kind="counter")
+metrics.Gauge("airvote_is_leader", "1 if this process runs reminders and rollups", lambda: int(leader.leading))
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# Counters for load tests: vote writer batching and lock waits, cache, login pool
+@app.get("/stats/server")
+def get_server_stats():
+    return {
+        "ingest": vote_ingestor.stats(),
+        "cache": response_cache.stats(),
+        "login_rejected": password_verifier.rejected,
+        "votes_rate_limited": vote_limiter.rejected + anonymous_limiter.rejected,
+        "votes_duplicate": window_voters.rejected + vote_ingestor.duplicates,
+        "live_clients": live_feed.client_count,
+        "users": user_directory.stats(),
+        "weather": weather_cache.stats(),
+    }
 
 @app.post("/update-voting-window")
-def update_voting_window(update: WindowUpdate):
+def update_voting_window(update: WindowUpdate, db: Session = Depends(get_db)):
     try:
         hour, minute = map(int, update.start_time.split(":"))
         start = time(hour, minute)
         end = (datetime.combine(datetime.today(), start) + timedelta(minutes=15)).time()
-
-        global voting_windows
-        voting_windows = [(start, end)]
-
-        return {"message": f"Voting window set to {start.strftime('%H:%M')} - {end.strftime('%H:%M')}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid time format")
 
+    replace_voting_schedule(VotingSchedule.daily([(start, end)]), db)
+    return {"message": f"Voting window set to {start.strftime('%H:%M')} - {end.strftime('%H:%M')}"}
+
 @app.post("/update_custom_voting_windows")
-def update_custom_voting_windows(windows: VotingWindow):
+def update_custom_voting_windows(windows: VotingWindow, db: Session = Depends(get_db)):
     try:
         s1 = datetime.strptime(windows.start_1, "%H:%M").time()
         e1 = datetime.strptime(windows.end_1, "%H:%M").time()
@@ -208,44 +852,302 @@ def update_custom_voting_windows(windows: VotingWindow):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid time format. Use HH:MM")
 
-    if times_overlap(s1, e1, s2, e2):
-        raise HTTPException(status_code=400, detail="Voting windows must not overlap.")
-
-    global voting_windows
-    voting_windows = [(s1, e1), (s2, e2)]
+    try:
+        new_schedule = VotingSchedule.daily([(s1, e1), (s2, e2)])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    replace_voting_schedule(new_schedule, db)
     return {"message": "Voting windows updated successfully."}
 
+@app.get("/voting-windows")
+def get_voting_windows():
+    now = datetime.utcnow()
+    schedule = voting_schedule
+    current = schedule.current_window(now)
+    next_opening = schedule.next_opening(now)
+    return {
+        **schedule.to_dict(),
+        "is_open": current is not None,
+        "current_window": {"opens": current[0].isoformat(), "closes": current[1].isoformat()} if current else None,
+        "next_opening": next_opening.isoformat() if next_opening else None,
+    }
+
+@app.post("/voting-windows")
+def update_voting_windows(update: VotingScheduleUpdate, db: Session = Depends(get_db)):
+    try:
+        new_schedule = VotingSchedule(
+            [Window(parse_time(w.start), parse_time(w.end), w.weekdays) for w in update.windows],
+            update.holidays,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    replace_voting_schedule(new_schedule, db)
+    return get_voting_windows()
+
+@app.get("/stats/trends")
+def get_vote_trends(period: str = "day", days: int = 30, db: Session = Depends(get_db)):
+    if period not in rollups.PERIODS:
+        raise HTTPException(status_code=400, detail="Period must be one of: day, week, month")
+
+    since = datetime.combine(datetime.utcnow().date() - timedelta(days=days), time())
+    return rollups.trends(db, period, since)
+
+@app.post("/sensors/readings")
+def ingest_sensor_readings(batch: SensorBatch):
+    if len(batch.readings) > config.SENSOR_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {config.SENSOR_BATCH_MAX} readings per batch.")
+    accepted = sensor_store.ingest(batch.readings)
+    return {"accepted": accepted, "rejected": len(batch.readings) - accepted}
+
+@app.get("/sensors/readings")
+def get_sensor_readings(resolution: str = "1m", hours: float = 1, sensor: Optional[str] = None,
+                        db: Session = Depends(get_db)):
+    if resolution not in sensors.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="resolution must be raw, 1m or 1h")
+    until = int(datetime.now(timezone.utc).timestamp()) + 1
+    return sensors.series(db, resolution, until - int(hours * 3600), until, sensor)
+
+# Current outdoor conditions for the caller's location, from the weather
+# cache (sync: a miss blocks on the upstream in the threadpool)
+@app.get("/weather")
+def get_weather(lat: float, lon: float, response: Response):
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="lat must be within ±90 and lon within ±180")
+    try:
+        reading = weather_cache.get(lat, lon)
+    except weather.WeatherUnavailable:
+        raise HTTPException(status_code=503, detail="Weather is unavailable")
+    response.headers["Cache-Control"] = f"public, max-age={reading.pop('max_age')}"
+    return reading
+
+@app.get("/stats/windows")
+def get_window_rollups(days: int = 7, db: Session = Depends(get_db)):
+    since = datetime.combine(datetime.utcnow().date() - timedelta(days=days), time())
+    rows = db.query(VoteRollup).filter(VoteRollup.window_start >= since).order_by(VoteRollup.window_start).all()
+    outdoor = weather.outdoor_means(db, [(rollup.window_start, rollup.window_end) for rollup in rows])
+    return [
+        {
+            "window_start": rollup.window_start.isoformat(),
+            "window_end": rollup.window_end.isoformat(),
+            "count": rollup.vote_count,
+            "average": round(rollup.temperature_sum / rollup.vote_count, 1) if rollup.vote_count else None,
+            "min": rollup.min_temperature,
+            "max": rollup.max_temperature,
+            "histogram": json.loads(rollup.histogram),
+            "outdoor_average": outdoor_temperature,
+        }
+        for rollup, outdoor_temperature in zip(rows, outdoor)
+    ]
+
 @app.post("/subscribe")
-async def subscribe(request: Request):
-    subscription_info = await request.json()
-    subscriptions.append(subscription_info)
+def subscribe(subscription_info: dict, db: Session = Depends(get_db)):
+    if not subscription_info.get("endpoint"):
+        raise HTTPException(status_code=400, detail="Subscription endpoint is required")
+    push.save_subscription(db, subscription_info)
     return {"message": "Subscription saved"}
 
-# Push notification function
+REMINDER_PAYLOAD = json.dumps({
+    "title": "AirVote - It's Time To Vote!",
+    "body": "Click here to cast your temperature vote.",
+    "url": "https://yourdomain.com/index.html"
+})
+
+# Push notification function: runs when a window opens (see
+# schedule_reminder) and, on the leader only, reminds every subscriber
+# once per window
 def notify_users():
-    now = datetime.utcnow().time()
-    for start, _ in voting_windows:
-        if now.hour == start.hour and now.minute == start.minute:
-            for sub in subscriptions:
-                try:
-                    webpush(
-                        subscription_info=sub,
-                        data=json.dumps({
-                            "title": "AirVote - It's Time To Vote!",
-                            "body": "Click here to cast your temperature vote.",
-                            "url": "https://yourdomain.com/index.html"
-                        }),
-                        vapid_private_key=VAPID_PRIVATE_KEY,
-                        vapid_claims={"sub": "mailto:admin@yourdomain.com"}
-                    )
-                except WebPushException as e:
-                    print("Push failed: ", e)
-
-# Initialize the scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(notify_users, "interval", minutes=1)
+    try:
+        if not leader.is_leader():
+            return
+        window = voting_schedule.current_window(datetime.utcnow())
+        if window is None:
+            return
+        opened = window[0].isoformat()
+        if shared_state.get(REMINDED_KEY)[0] == opened:
+            return
+        shared_state.set(REMINDED_KEY, opened)
+
+        db = SessionLocal()
+        try:
+            result = push_fanout.send_all(push.load_subscriptions(db), REMINDER_PAYLOAD)
+            if result.expired:
+                push.remove_subscriptions(db, result.expired)
+        finally:
+            db.close()
+        print(f"Voting reminder sent: {result}")
+    finally:
+        schedule_reminder()
+
+# One-off job at the next window opening instead of polling every minute
+def schedule_reminder():
+    if scheduler is None:
+        # Not started yet; startup schedules it
+        return
+    next_opening = voting_schedule.next_opening(datetime.utcnow())
+    if next_opening is None:
+        if scheduler.get_job("voting-reminder"):
+            scheduler.remove_job("voting-reminder")
+        return
+    scheduler.add_job(notify_users, "date", run_date=next_opening, id="voting-reminder",
+                      replace_existing=True, misfire_grace_time=None)
+
+# Summarize voting windows as they close
+def run_rollups():
+    if not leader.is_leader():
+        return
+    db = SessionLocal()
+    try:
+        rollups.rollup_closed_windows(db, voting_schedule)
+    except Exception as e:
+        print("Rollup failed: ", e)
+    finally:
+        db.close()
+
+# Runs in every worker: keep or take the leader lease, apply config
+# changed by other workers and, with a shared backend, read back votes
+# committed by any worker
+def sync_shared_state():
+    was_leader = leader.leading
+    if leader.renew() and not was_leader:
+        # A new leader sends the reminder the old one may have missed
+        notify_users()
+    config_watcher.poll()
+
+    if shared_state.shared:
+        db = SessionLocal()
+        try:
+            rows = vote_aggregator.catch_up(db, zone_aggregators)
+        except Exception as e:
+            print("Error reading new votes: ", e)
+            rows = []
+        finally:
+            db.close()
+        if rows:
+            response_cache.invalidate()
+            live_feed.publish(serialize_latest_votes((ANONYMOUS, timestamp, temperature) for timestamp, temperature in rows))
+
+    push_zone_averages(zone_aggregators.take_touched())
+
+# Send zones' averages to their thermostats. Only the leader pushes, so
+# workers don't race each other to the same device.
+def push_zone_averages(zone_ids: Iterable[int]):
+    if not leader.is_leader():
+        return
+    now = datetime.utcnow()
+    for zone_id in zone_ids:
+        if thermostat_router.get(zone_id) is None:
+            continue
+        try:
+            average = current_average(now, zone_id)
+        except Exception as e:
+            print(f"Error computing the average for zone {zone_id}: ", e)
+            continue
+        if average is not None:
+            thermostat_router.submit(zone_id, average)
+
+# Averages also move as votes leave the hour; dispatchers skip unchanged values
+def refresh_zone_thermostats():
+    push_zone_averages(zone_aggregators.zone_ids())
+
+# Downsample sensor readings and drop expired ones
+def compact_sensor_readings():
+    if not leader.is_leader():
+        return
+    db = SessionLocal()
+    try:
+        sensors.compact(db)
+        sensors.apply_retention(
+            db,
+            raw=int(config.SENSOR_RAW_RETENTION_HOURS * 3600),
+            minute=int(config.SENSOR_MINUTE_RETENTION_DAYS * 86400),
+            hour=int(config.SENSOR_HOUR_RETENTION_DAYS * 86400),
+        )
+    except Exception as e:
+        print("Sensor compaction failed: ", e)
+    finally:
+        db.close()
+
+# Move votes older than AIRVOTE_VOTE_RETENTION_DAYS to monthly archives
+def archive_old_votes():
+    if not leader.is_leader():
+        return
+    db = SessionLocal()
+    try:
+        result = archive.apply_retention(db, voting_schedule, timedelta(days=config.VOTE_RETENTION_DAYS))
+        for month, count in result["archived"].items():
+            print(f"Archived {count} votes from {month}")
+    except Exception as e:
+        print("Vote archival failed: ", e)
+    finally:
+        db.close()
+
+# Write this worker's vote count increments to the users table
+def flush_user_counts():
+    try:
+        user_directory.flush()
+    except Exception as e:
+        print("Flushing vote counts failed: ", e)
+
+# Drop idempotency keys older than any vote that may still be replayed
+def purge_vote_keys():
+    if not leader.is_leader():
+        return
+    db = SessionLocal()
+    try:
+        purge_keys(db, datetime.utcnow() - timedelta(hours=config.VOTE_REPLAY_MAX_AGE_HOURS))
+    except Exception as e:
+        print("Purging vote keys failed: ", e)
+    finally:
+        db.close()
+
+# Background jobs (schedule times are UTC), created at startup
+scheduler = None
+
+def create_scheduler():
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    jobs = BackgroundScheduler(timezone="UTC")
+    jobs.add_job(run_rollups, "interval", minutes=1)
+    jobs.add_job(compact_sensor_readings, "interval", minutes=1)
+    jobs.add_job(archive_old_votes, "interval", hours=1)
+    jobs.add_job(purge_vote_keys, "interval", hours=1)
+    jobs.add_job(flush_user_counts, "interval", seconds=config.USER_COUNT_FLUSH_SECONDS, coalesce=True)
+    jobs.add_job(refresh_zone_thermostats, "interval", minutes=1)
+    jobs.add_job(sync_shared_state, "interval", seconds=config.STATE_POLL_SECONDS, coalesce=True)
+    return jobs
 
 @app.on_event("startup")
 def startup_event():
-    scheduler.start()
\ No newline at end of file
+    global voting_schedule, scheduler
+    # Create or upgrade the schema; importing the app never touches the disk
+    migrate_db()
+    scheduler = create_scheduler()
+    db = SessionLocal()
+    try:
+        vote_aggregator.rebuild(db)
+        zone_aggregators.rebuild(db)
+        apply_zones(zones.load_zones(db))
+        now = datetime.utcnow()
+        live_feed.seed(serialize_latest_votes(db.execute(latest_votes_query(now)).all()), now)
+        voting_schedule = load_schedule(db) or DEFAULT_SCHEDULE
+    finally:
+        db.close()
+    config_watcher.watch(SCHEDULE_KEY, on_schedule_changed)
+    config_watcher.watch(ZONES_KEY, on_zones_changed)
+    config_watcher.watch(USERS_KEY, on_users_changed)
+    leader.renew(force=True)
+    schedule_reminder()
+    vote_ingestor.start()
+    thermostat_dispatcher.start()
+    scheduler.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    vote_ingestor.stop()
+    flush_user_counts()
+    password_verifier.shutdown()
+    thermostat_dispatcher.stop()
+    thermostat_router.stop()
+    leader.resign()
\ No newline at end of file
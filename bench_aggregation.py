@@ -0,0 +1,105 @@
+"""
+Time to summarize the last hour of votes, NumPy against Python loops.
+
+    python bench_aggregation.py --votes 10000 100000 1000000
+
+Each size is seeded into a throwaway SQLite file with every vote inside
+the last hour, then timed three ways:
+  orm loop     db.query(Vote).all() and a generator mean (the original /average)
+  python       Core rows, statistics.mean/median/pstdev and a trimmed mean
+  numpy        vote_stats.fetch_window + vote_stats.summarize (every statistic)
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote, apply_sqlite_pragmas
+import vote_stats
+
+
+def seed(engine, votes: int, now: datetime, chunk: int = 100_000):
+    step = 3600 / votes
+    with engine.begin() as conn:
+        for offset in range(0, votes, chunk):
+            conn.execute(
+                text("INSERT INTO votes (temperature, timestamp, username) VALUES (:t, :ts, 'Anonymous')"),
+                [
+                    {"t": round(random.uniform(15, 25), 1), "ts": now - timedelta(seconds=i * step)}
+                    for i in range(offset, min(offset + chunk, votes))
+                ],
+            )
+
+
+def orm_loop(db, since, now):
+    votes = db.query(Vote).filter(Vote.timestamp >= since).all()
+    return round(sum(v.temperature for v in votes) / len(votes), 1)
+
+
+def python_stats(db, since, now):
+    temps = [t for (t,) in db.execute(select(Vote.temperature).where(Vote.timestamp >= since))]
+    ordered = sorted(temps)
+    cut = len(ordered) // 10
+    return {
+        "mean": statistics.fmean(temps),
+        "median": statistics.median(ordered),
+        "trimmed_mean": statistics.fmean(ordered[cut:len(ordered) - cut]),
+        "stddev": statistics.pstdev(temps),
+    }
+
+
+def numpy_stats(db, since, now):
+    return vote_stats.summarize(*vote_stats.fetch_window(db, since, now))
+
+
+def best_of(fn, db, since, now, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        db.expunge_all()
+        started = time.perf_counter()
+        fn(db, since, now)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def run(votes: int, repeat: int):
+    now = datetime.utcnow()
+    since = now - timedelta(hours=1, seconds=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+        Base.metadata.create_all(bind=engine)
+        seed(engine, votes, now)
+        db = sessionmaker(bind=engine)()
+        try:
+            # Warm the page cache once
+            numpy_stats(db, since, now)
+            orm = best_of(orm_loop, db, since, now, repeat)
+            python = best_of(python_stats, db, since, now, repeat)
+            numpy = best_of(numpy_stats, db, since, now, repeat)
+            temperatures, ages = vote_stats.fetch_window(db, since, now)
+            started = time.perf_counter()
+            vote_stats.summarize(temperatures, ages)
+            compute = (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+            engine.dispose()
+
+    print(f"{votes:>10,} votes   orm loop {orm:9.1f} ms   python {python:9.1f} ms   "
+          f"numpy {numpy:8.1f} ms ({compute:.1f} ms of it computing)   {orm / numpy:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vote aggregation benchmark")
+    parser.add_argument("--votes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for votes in args.votes:
+        run(votes, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Load test comparing AIRVOTE_DB_MODE=sync and AIRVOTE_DB_MODE=async.
+
+    python bench_async.py --concurrency 200 --duration 15
+
+For each mode a uvicorn server is started on a seeded throwaway votes.db,
+the voting window is opened around the current time, and a fixed number
+of concurrent clients send a mix of /vote, /average, /votes/latest and
+/login. Requests/sec and p50/p99 latency are printed per mode.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote, User, hash_password
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Relative weight of each request type
+DEFAULT_MIX = {"vote": 20, "average": 40, "latest": 35, "login": 5}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(directory: str, votes: int, spread: timedelta = timedelta(minutes=10)):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'votes.db')}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    step = spread / max(votes, 1)
+    for start in range(0, votes, 50000):
+        db.execute(insert(Vote), [
+            {"temperature": round(random.uniform(15, 25), 1), "timestamp": now - step * i}
+            for i in range(start, min(start + 50000, votes))
+        ])
+    db.add(User(email="bench@example.com", password_hash=hash_password("password")))
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def start_server(directory: str, mode: str, port: int, thermostat_url: str) -> subprocess.Popen:
+    env = dict(os.environ, AIRVOTE_DB_MODE=mode, PYTHONPATH=HERE, AIRVOTE_THERMOSTAT_URL=thermostat_url)
+    # Every simulated client shares 127.0.0.1, i.e. one rate limit bucket
+    env.setdefault("AIRVOTE_VOTE_RATE_LIMIT", "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--port", str(port), "--log-level", "warning"],
+        cwd=directory, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/average", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def open_voting_window(base_url: str):
+    now = datetime.utcnow()
+    fmt = lambda t: t.strftime("%H:%M")
+    httpx.post(f"{base_url}/update_custom_voting_windows", json={
+        "start_1": fmt(now - timedelta(minutes=1)),
+        "end_1": fmt(now + timedelta(hours=1)),
+        "start_2": fmt(now + timedelta(hours=2)),
+        "end_2": fmt(now + timedelta(hours=2, minutes=15)),
+    }).raise_for_status()
+
+
+async def drive(base_url: str, concurrency: int, duration: float, mix: dict) -> dict:
+    kinds, weights = zip(*mix.items())
+    latencies = {kind: [] for kind in kinds}
+    errors = 0
+
+    async def worker(client: httpx.AsyncClient, stop_at: float):
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            kind = random.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                if kind == "vote":
+                    response = await client.post("/vote", json={"temperature": round(random.uniform(15, 25), 1)})
+                elif kind == "average":
+                    response = await client.get("/average")
+                elif kind == "latest":
+                    response = await client.get("/votes/latest")
+                else:
+                    response = await client.post("/login", json={"email": "bench@example.com", "password": "password"})
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies[kind].append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+        await asyncio.gather(*(worker(client, stop_at) for _ in range(concurrency)))
+
+    return {"latencies": latencies, "errors": errors}
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(mode: str, result: dict, duration: float):
+    all_latencies = [l for values in result["latencies"].values() for l in values]
+    print(f"\n{mode}: {len(all_latencies) / duration:8.1f} req/s   "
+          f"p50 {percentile(all_latencies, 50) * 1000:7.1f} ms   "
+          f"p99 {percentile(all_latencies, 99) * 1000:7.1f} ms   errors {result['errors']}")
+    for kind, values in result["latencies"].items():
+        if values:
+            print(f"  {kind:8} n={len(values):6}   p50 {statistics.median(values) * 1000:7.1f} ms   "
+                  f"p99 {percentile(values, 99) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async DB mode load test")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--seed-votes", type=int, default=2000)
+    args = parser.parse_args()
+
+    from mock_thermostat import MockThermostat
+    device = MockThermostat(port=0).start()
+
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as directory:
+            seed(directory, args.seed_votes)
+            port = free_port()
+            server = start_server(directory, mode, port, device.url)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                open_voting_window(base_url)
+                result = asyncio.run(drive(base_url, args.concurrency, args.duration, DEFAULT_MIX))
+                report(mode, result, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+    device.stop()
+
+if __name__ == "__main__":
+    main()
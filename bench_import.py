@@ -0,0 +1,85 @@
+"""
+Cold-start cost of importing the app, from `python -X importtime`.
+
+    python bench_import.py --runs 5 --budget-ms 1300
+
+Each run imports the module in a fresh interpreter from an empty working
+directory, which also checks that importing creates no votes.db. Reports
+the median cumulative import time and the slowest direct imports, and
+exits with status 1 when the median exceeds --budget-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# (level, module, cumulative µs) per line of -X importtime output
+def parse(stderr: str):
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((level, name.strip(), int(cumulative)))
+    return entries
+
+
+def measure(module: str) -> tuple:
+    with tempfile.TemporaryDirectory() as directory:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {module}"],
+            cwd=directory, env=dict(os.environ, PYTHONPATH=HERE), capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr[-2000:])
+        touched = os.path.exists(os.path.join(directory, "votes.db"))
+
+    entries = parse(result.stderr)
+    index = max(i for i, (level, name, _) in enumerate(entries) if level == 0 and name == module)
+    total = entries[index][2]
+    # Direct imports are the level-1 lines since the previous top-level import
+    start = max((i for i, (level, _, _) in enumerate(entries[:index]) if level == 0), default=-1) + 1
+    children = {name: cumulative for level, name, cumulative in entries[start:index] if level == 1}
+    return total, children, touched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument("--module", default="backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1300)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals = []
+    children = defaultdict(list)
+    touched = False
+    for _ in range(args.runs):
+        total, imports, wrote_db = measure(args.module)
+        totals.append(total / 1000)
+        for name, cumulative in imports.items():
+            children[name].append(cumulative / 1000)
+        touched = touched or wrote_db
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}), budget {args.budget_ms:.0f} ms")
+    print("slowest direct imports:")
+    ranked = sorted(children.items(), key=lambda item: -statistics.median(item[1]))
+    for name, values in ranked[:args.top]:
+        print(f"  {name:28} {statistics.median(values):7.1f} ms")
+    if touched:
+        print("importing created votes.db: schema work should run at startup, not on import")
+
+    if median > args.budget_ms or touched:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
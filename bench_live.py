@@ -0,0 +1,121 @@
+"""
+Cost of keeping admin pages current: 30-second polling of /votes/latest
+vs the /votes/live server-sent event feed.
+
+    python bench_live.py --clients 1000 --votes 200
+
+A uvicorn server is started on a seeded throwaway votes.db (see
+bench_async.py). The polling side measures one round of every client
+fetching /votes/latest, which is what the server pays every 30 s. The
+live side connects every client to /votes/live, then sends votes and
+measures how long each one takes to reach all clients.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import httpx
+from bench_async import free_port, open_voting_window, percentile, seed, start_server
+from mock_thermostat import MockThermostat
+
+
+async def polling_round(base_url: str, clients: int) -> float:
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.get("/votes/latest") for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    assert all(r.status_code == 200 for r in responses)
+    return elapsed
+
+
+async def live_feed(base_url: str, clients: int, votes: int, rate: float) -> dict:
+    sent_at = {}
+    latencies = []
+    connected = asyncio.Semaphore(0)
+    done = asyncio.Event()
+    remaining = clients * votes
+
+    async def listener(client: httpx.AsyncClient):
+        nonlocal remaining
+        async with client.stream("GET", "/votes/live") as response:
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if event == "snapshot":
+                        connected.release()
+                elif line.startswith("data: ") and event == "vote":
+                    temperature = float(line.split('"temperature":')[1].rstrip("}"))
+                    if temperature in sent_at:
+                        latencies.append(time.perf_counter() - sent_at[temperature])
+                        remaining -= 1
+                        if remaining == 0:
+                            done.set()
+
+    limits = httpx.Limits(max_connections=clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(listener(client)) for _ in range(clients)]
+        for _ in range(clients):
+            await connected.acquire()
+        connect_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(votes):
+            # Unique temperatures identify each vote on the receiving side
+            temperature = round(15 + (i % 1000) / 100, 2)
+            sent_at[temperature] = time.perf_counter()
+            response = await client.post("/vote", json={"temperature": temperature})
+            response.raise_for_status()
+            await asyncio.sleep(1 / rate)
+        try:
+            await asyncio.wait_for(done.wait(), 60)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {"connect": connect_time, "latencies": latencies, "elapsed": elapsed,
+            "expected": clients * votes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polling vs live feed benchmark")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--votes", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20, help="votes per second")
+    parser.add_argument("--seed-votes", type=int, default=2000)
+    args = parser.parse_args()
+    args.votes = min(args.votes, 1000)
+
+    device = MockThermostat(port=0).start()
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory, args.seed_votes)
+        port = free_port()
+        server = start_server(directory, "sync", port, device.url)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            open_voting_window(base_url)
+
+            poll = asyncio.run(polling_round(base_url, args.clients))
+            print(f"{args.clients} clients")
+            print(f"  polling: one round of /votes/latest takes {poll:.2f} s, repeated every 30 s, "
+                  f"data up to 30 s stale")
+
+            live = asyncio.run(live_feed(base_url, args.clients, args.votes, args.rate))
+            latencies = live["latencies"]
+            print(f"  live:    {args.clients} connected in {live['connect']:.2f} s, "
+                  f"{len(latencies)}/{live['expected']} vote events delivered")
+            print(f"           vote -> client latency p50 {percentile(latencies, 50) * 1000:.1f} ms   "
+                  f"p99 {percentile(latencies, 99) * 1000:.1f} ms")
+        finally:
+            server.terminate()
+            server.wait()
+    device.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+bcrypt logins per second against the size of the verification pool.
+
+    python bench_login.py --logins 200 --workers 1 2 4 8
+
+The first row is the old inline path (one thread, no pool) for reference.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from auth import PasswordVerifier
+from database import hash_password, verify_password
+
+
+def inline(logins: int, hashed: str) -> float:
+    started = time.perf_counter()
+    for _ in range(logins):
+        verify_password("password", hashed)
+    return logins / (time.perf_counter() - started)
+
+
+def pooled(logins: int, hashed: str, workers: int) -> float:
+    verifier = PasswordVerifier(workers=workers, max_pending=logins)
+    verifier.verify("password", hashed)  # warm the worker processes
+    try:
+        started = time.perf_counter()
+        # Request threads submitting concurrently, as the API would
+        with ThreadPoolExecutor(max_workers=40) as threads:
+            list(threads.map(lambda _: verifier.verify("password", hashed), range(logins)))
+        return logins / (time.perf_counter() - started)
+    finally:
+        verifier.shutdown()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Login throughput benchmark")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cores}))
+    args = parser.parse_args()
+
+    hashed = hash_password("password")
+    print(f"{cores} cores, {args.logins} logins per run")
+    print(f"  inline      {inline(args.logins, hashed):8.1f} logins/s")
+    for workers in args.workers:
+        print(f"  {workers:2} workers  {pooled(args.logins, hashed, workers):8.1f} logins/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Time to notify every subscriber, old serial loop vs PushFanout.
+
+    python bench_push.py --subscribers 2000 --latency 0.05
+
+Subscriptions point at a local mock push service (mock_push.py) that
+answers after `latency` seconds, standing in for a remote push service.
+"""
+import argparse
+import json
+import time
+from py_vapid import Vapid
+from pywebpush import webpush, WebPushException
+from mock_push import MockPushService
+from push import PushFanout
+
+PAYLOAD = json.dumps({"title": "AirVote - It's Time To Vote!", "body": "Benchmark"})
+CLAIMS = {"sub": "mailto:admin@yourdomain.com"}
+
+
+def serial(subscriptions, vapid_key: str) -> float:
+    started = time.perf_counter()
+    for sub in subscriptions:
+        try:
+            webpush(subscription_info=sub, data=PAYLOAD,
+                    vapid_private_key=vapid_key, vapid_claims=dict(CLAIMS))
+        except WebPushException as e:
+            print("Push failed: ", e)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push fan-out benchmark")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--skip-serial", action="store_true")
+    args = parser.parse_args()
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    vapid_key = vapid.private_pem().decode()
+    vapid_key = "".join(line for line in vapid_key.splitlines() if "-----" not in line)
+
+    service = MockPushService(port=0, latency=args.latency).start()
+    subscriptions = [service.subscription(i) for i in range(args.subscribers)]
+    print(f"{args.subscribers} subscribers, {args.latency * 1000:.0f} ms push service latency")
+
+    if not args.skip_serial:
+        print(f"  serial webpush loop   {serial(subscriptions, vapid_key):8.2f} s")
+    for workers in args.workers:
+        before = service.connections
+        result = PushFanout(vapid_key, CLAIMS, workers=workers).send_all(subscriptions, PAYLOAD)
+        print(f"  fan-out {workers:3} workers   {result.elapsed:8.2f} s   "
+              f"sent {result.sent}, connections opened {service.connections - before}")
+    service.stop()
+
+if __name__ == "__main__":
+    main()
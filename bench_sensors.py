@@ -0,0 +1,102 @@
+"""
+Sustained sensor ingest: many simulated DHT sensors reporting at 1 Hz.
+
+    python bench_sensors.py --sensors 10000 --duration 30
+
+A uvicorn server is started on a throwaway votes.db (see bench_async.py).
+Every tick each sensor produces one reading; readings are posted to
+/sensors/readings in batches by `--senders` concurrent clients. The
+benchmark reports accepted readings/s, batch latency and how far the
+senders fell behind the 1 Hz schedule.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import httpx
+from bench_async import free_port, percentile, seed, start_server
+from mock_dht import SimulatedSensor
+from mock_thermostat import MockThermostat
+
+
+async def drive(base_url: str, sensors, senders: int, batch_size: int, duration: float, rate: float) -> dict:
+    latencies = []
+    accepted = 0
+    errors = 0
+    late_ticks = 0
+    ticks = 0
+
+    async def send(client: httpx.AsyncClient, batch):
+        nonlocal accepted, errors
+        started = time.perf_counter()
+        try:
+            response = await client.post("/sensors/readings", json={"readings": batch})
+            response.raise_for_status()
+            accepted += response.json()["accepted"]
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=senders, max_keepalive_connections=senders)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        semaphore = asyncio.Semaphore(senders)
+
+        async def limited(batch):
+            async with semaphore:
+                await send(client, batch)
+
+        started = time.perf_counter()
+        next_tick = started
+        while next_tick - started < duration:
+            now = time.time()
+            readings = [[sensor.name, now, sensor.read()] for sensor in sensors]
+            batches = [readings[i:i + batch_size] for i in range(0, len(readings), batch_size)]
+            await asyncio.gather(*(limited(batch) for batch in batches))
+            ticks += 1
+
+            next_tick += 1 / rate
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                late_ticks += 1
+        elapsed = time.perf_counter() - started
+
+    return {"accepted": accepted, "errors": errors, "elapsed": elapsed, "latencies": latencies,
+            "ticks": ticks, "late_ticks": late_ticks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor ingest load generator")
+    parser.add_argument("--sensors", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=1.0, help="readings per sensor per second")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--senders", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    sensors = [SimulatedSensor(f"dht-{i}") for i in range(args.sensors)]
+    device = MockThermostat(port=0).start()
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory, 0)
+        port = free_port()
+        server = start_server(directory, "sync", port, device.url)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            result = asyncio.run(drive(base_url, sensors, args.senders, args.batch_size, args.duration, args.rate))
+        finally:
+            server.terminate()
+            server.wait()
+    device.stop()
+
+    offered = args.sensors * args.rate
+    print(f"{args.sensors} sensors at {args.rate:g} Hz ({offered:,.0f} readings/s offered), "
+          f"{args.senders} senders, batches of {args.batch_size}")
+    print(f"  accepted {result['accepted'] / result['elapsed']:10,.0f} readings/s sustained "
+          f"over {result['elapsed']:.1f} s, errors {result['errors']}")
+    print(f"  batch latency p50 {percentile(result['latencies'], 50) * 1000:.1f} ms   "
+          f"p99 {percentile(result['latencies'], 99) * 1000:.1f} ms")
+    print(f"  {result['late_ticks']}/{result['ticks']} ticks fell behind the schedule")
+
+if __name__ == "__main__":
+    main()
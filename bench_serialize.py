@@ -0,0 +1,77 @@
+"""
+Time and size of encoding a vote listing, per serializer and layout.
+
+    python bench_serialize.py --rows 100000
+
+Rows are (username, timestamp, temperature) tuples as /votes/latest reads
+them. The encoders timed are:
+  fastapi        isoformat dicts, jsonable_encoder + JSONResponse (the old /votes/latest)
+  json           isoformat dicts, json.dumps (the old export path)
+  orjson rows    serialize.dumps of row objects
+  orjson columns serialize.dumps of {"usernames", "timestamps", "temperatures"}
+  msgpack rows / msgpack columns, the same as MessagePack
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import serialize
+
+NAMES = ("username", "timestamp", "temperature")
+
+
+def make_rows(count: int):
+    start = datetime(2025, 1, 6, 9, 0)
+    return [
+        (random.choice(["Anonymous", f"user{i % 500}@example.com"]),
+         start + timedelta(microseconds=random.randrange(900_000_000)),
+         round(random.uniform(15, 25), 1))
+        for i in range(count)
+    ]
+
+
+def isoformat_dicts(rows):
+    return [{"username": u, "timestamp": t.isoformat(), "temperature": v} for u, t, v in rows]
+
+
+def encoders():
+    return {
+        "fastapi": lambda rows: JSONResponse(jsonable_encoder(isoformat_dicts(rows))).body,
+        "json": lambda rows: json.dumps(isoformat_dicts(rows), ensure_ascii=False, separators=(",", ":")).encode(),
+        "orjson rows": lambda rows: serialize.dumps(serialize.as_rows(rows, NAMES)),
+        "orjson columns": lambda rows: serialize.dumps(serialize.as_columns(rows, NAMES)),
+        "msgpack rows": lambda rows: serialize.dumps(serialize.as_rows(rows, NAMES), serialize.MSGPACK),
+        "msgpack columns": lambda rows: serialize.dumps(serialize.as_columns(rows, NAMES), serialize.MSGPACK),
+    }
+
+
+def best_of(encode, rows, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(rows)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vote listing serialization benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"{args.rows:,} rows")
+    baseline = None
+    for name, encode in encoders().items():
+        elapsed, body = best_of(encode, rows, args.repeat)
+        baseline = baseline or elapsed
+        print(f"  {name:16} {elapsed:8.1f} ms  {baseline / elapsed:5.1f}x   "
+              f"{len(body) / 1e6:6.2f} MB  ({len(gzip.compress(body, 6)) / 1e6:5.2f} MB gzipped)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Reproduces the 9:00 / 13:00 voting stampede against a local server.
+
+    python bench_stampede.py --seed-votes 10000 100000 --concurrency 200 --duration 20 --json run.json
+    python bench_stampede.py ... --compare run.json
+
+For each database size a uvicorn server is started on a freshly seeded
+throwaway votes.db (see bench_async.py). The voting schedule is shifted
+so a window opens now, then all clients start at once (or over --ramp
+seconds) with a mix of /vote, /average, /votes/latest and /login.
+Reported per run: throughput, p50/p95/p99 latency per endpoint, status
+codes, and the server's SQLite write-lock waits and vote batching from
+/stats/server. --json writes everything for later --compare.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import httpx
+from bench_async import DEFAULT_MIX, HERE, free_port, percentile, seed, start_server
+from mock_thermostat import MockThermostat
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        kind, weight = part.split("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown request type {kind!r}")
+        mix[kind] = float(weight)
+    return mix
+
+
+# Shift the schedule so a window is open for the whole run
+def open_window(base_url: str, minutes: int):
+    now = datetime.utcnow()
+    fmt = lambda moment: moment.strftime("%H:%M")
+    httpx.post(f"{base_url}/voting-windows", json={"windows": [
+        {"start": fmt(now - timedelta(minutes=1)), "end": fmt(now + timedelta(minutes=minutes + 1))},
+    ]}).raise_for_status()
+
+
+async def stampede(base_url: str, concurrency: int, duration: float, ramp: float, mix: dict) -> dict:
+    kinds, weights = zip(*mix.items())
+    latencies = {kind: [] for kind in kinds}
+    statuses = Counter()
+
+    async def request(client: httpx.AsyncClient, kind: str):
+        if kind == "vote":
+            return await client.post("/vote", json={"temperature": round(random.uniform(15, 25), 1)})
+        if kind == "average":
+            return await client.get("/average")
+        if kind == "latest":
+            return await client.get("/votes/latest")
+        return await client.post("/login", json={"email": "bench@example.com", "password": "password"})
+
+    async def worker(client: httpx.AsyncClient, delay: float, stop_at: float):
+        await asyncio.sleep(delay)
+        while time.perf_counter() < stop_at:
+            kind = random.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await request(client, kind)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies[kind].append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(*(
+            worker(client, ramp * i / concurrency, stop_at) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    return {"latencies": latencies, "statuses": statuses, "elapsed": elapsed}
+
+
+def summarize(values) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def run(args, size: int, thermostat_url: str) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory, size)
+        port = free_port()
+        server = start_server(directory, args.mode, port, thermostat_url)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            open_window(base_url, int(args.duration // 60) + 2)
+            before = httpx.get(f"{base_url}/stats/server").json()
+            result = asyncio.run(stampede(base_url, args.concurrency, args.duration, args.ramp, args.mix))
+            after = httpx.get(f"{base_url}/stats/server").json()
+        finally:
+            server.terminate()
+            server.wait()
+
+    everything = [value for values in result["latencies"].values() for value in values]
+    ingest_before, ingest_after = before["ingest"], after["ingest"]
+    batches = ingest_after["batches"] - ingest_before["batches"]
+    return {
+        "seed_votes": size,
+        "elapsed_s": round(result["elapsed"], 3),
+        "requests": len(everything),
+        "throughput_rps": round(len(everything) / result["elapsed"], 1),
+        "statuses": {str(status): count for status, count in sorted(result["statuses"].items(), key=str)},
+        "latency": summarize(everything),
+        "endpoints": {kind: summarize(values) for kind, values in result["latencies"].items() if values},
+        "sqlite": {
+            "vote_batches": batches,
+            "votes_written": ingest_after["votes"] - ingest_before["votes"],
+            "lock_wait_s": round(ingest_after["lock_wait_seconds"] - ingest_before["lock_wait_seconds"], 4),
+            "lock_wait_max_s": ingest_after["lock_wait_max_seconds"],
+        },
+        "login_rejected": after["login_rejected"] - before["login_rejected"],
+    }
+
+
+def report(result: dict, baseline: dict = None):
+    latency = result["latency"]
+    print(f"\n{result['seed_votes']:,} seeded votes: {result['throughput_rps']:8.1f} req/s   "
+          f"p50 {latency['p50_ms']:.1f} ms   p95 {latency['p95_ms']:.1f} ms   p99 {latency['p99_ms']:.1f} ms")
+    if baseline:
+        old = baseline["latency"]
+        print(f"  vs baseline: {result['throughput_rps'] - baseline['throughput_rps']:+8.1f} req/s   "
+              f"p99 {latency['p99_ms'] - old['p99_ms']:+.1f} ms")
+    for kind, stats in result["endpoints"].items():
+        print(f"  {kind:8} n={stats['count']:6}   p50 {stats['p50_ms']:7.1f} ms   "
+              f"p95 {stats['p95_ms']:7.1f} ms   p99 {stats['p99_ms']:7.1f} ms")
+    sqlite = result["sqlite"]
+    print(f"  statuses {result['statuses']}")
+    print(f"  sqlite: {sqlite['votes_written']} votes in {sqlite['vote_batches']} batches, "
+          f"write-lock wait {sqlite['lock_wait_s']:.3f} s total, {sqlite['lock_wait_max_s'] * 1000:.1f} ms max")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voting stampede load test")
+    parser.add_argument("--seed-votes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--ramp", type=float, default=0, help="seconds over which clients join")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="e.g. vote=20,average=40,latest=35,login=5")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {run["seed_votes"]: run for run in json.load(f)["runs"]}
+
+    device = MockThermostat(port=0).start()
+    runs = []
+    try:
+        for size in args.seed_votes:
+            result = run(args, size, device.url)
+            report(result, baseline.get(size))
+            runs.append(result)
+    finally:
+        device.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "started_at": datetime.utcnow().isoformat(),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "settings": {"concurrency": args.concurrency, "duration": args.duration,
+                             "ramp": args.ramp, "mix": args.mix, "mode": args.mode},
+                "runs": runs,
+            }, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
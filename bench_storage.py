@@ -0,0 +1,90 @@
+"""
+Range-query latency on the votes table, with and without the
+(timestamp, temperature) index.
+
+    python bench_storage.py --rows 1000000 10000000
+
+Each run seeds a throwaway SQLite file with one vote per second going
+back from now, then times the queries behind /average (last hour) and
+/votes/latest (current 15 minutes).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, text
+from database import Base, apply_sqlite_pragmas
+
+QUERIES = {
+    "average (last hour)": "SELECT count(*), avg(temperature) FROM votes WHERE timestamp >= :start",
+    "latest (15 minutes)": "SELECT username, timestamp, temperature FROM votes WHERE timestamp >= :interval_start AND timestamp < :end",
+}
+
+
+def seed(engine, rows: int, now: datetime, chunk: int = 100_000):
+    start = now - timedelta(seconds=rows)
+    with engine.begin() as conn:
+        for offset in range(0, rows, chunk):
+            conn.execute(
+                text("INSERT INTO votes (temperature, timestamp, username) VALUES (:t, :ts, 'Anonymous')"),
+                [
+                    {"t": round(random.uniform(15, 25), 1), "ts": start + timedelta(seconds=i)}
+                    for i in range(offset, min(offset + chunk, rows))
+                ],
+            )
+
+
+def time_query(engine, sql: str, params: dict, repeat: int) -> list:
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def run(rows: int, repeat: int):
+    now = datetime.utcnow()
+    params = {
+        "start": now - timedelta(hours=1),
+        "interval_start": now - timedelta(minutes=15),
+        "end": now + timedelta(minutes=15),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+
+        # Seed without the index, then time both variants on the same data
+        index = next(i for i in Base.metadata.tables["votes"].indexes if i.name == "ix_votes_timestamp_temperature")
+        Base.metadata.create_all(bind=engine)
+        index.drop(bind=engine)
+
+        started = time.perf_counter()
+        seed(engine, rows, now)
+        print(f"\n{rows:,} rows seeded in {time.perf_counter() - started:.1f}s")
+
+        for label in ("no index", "indexed"):
+            if label == "indexed":
+                started = time.perf_counter()
+                index.create(bind=engine)
+                print(f"index built in {time.perf_counter() - started:.1f}s")
+            for name, sql in QUERIES.items():
+                timings = time_query(engine, sql, params, repeat)
+                print(f"  {label:9} {name:22} median {statistics.median(timings):9.2f} ms   max {max(timings):9.2f} ms")
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vote range-query benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+if __name__ == "__main__":
+    main()
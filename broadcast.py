@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+# Seconds between SSE comments sent to idle clients, so proxies and
+# browsers keep the connection and dead clients are noticed
+KEEPALIVE_INTERVAL = 15.0
+
+
+def _sse(event: str, payload) -> bytes:
+    data = json.dumps(payload, separators=(",", ":"))
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+class LiveClient:
+    """One connected feed client: a bounded buffer of encoded events."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_buffer: int):
+        self.loop = loop
+        self.max_buffer = max_buffer
+        self.closed = False
+        self._buffer: deque = deque()
+        self._ready = asyncio.Event()
+
+    # Called on the client's loop only; False if the client had to be dropped
+    def _push(self, events: List[bytes]) -> bool:
+        if len(self._buffer) + len(events) > self.max_buffer:
+            self.close()
+            return False
+        self._buffer.extend(events)
+        self._ready.set()
+        return True
+
+    def close(self):
+        self.closed = True
+        self._buffer.clear()
+        self._ready.set()
+
+    # Everything buffered so far as one chunk, or None once closed
+    async def next(self) -> Optional[bytes]:
+        while not self._buffer:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        chunk = b"".join(self._buffer)
+        self._buffer.clear()
+        return chunk
+
+
+class BroadcastHub:
+    """
+    In-process fan-out of accepted votes to live feed clients.
+
+    `publish` may be called from any thread (the vote ingestor calls it
+    after each commit). Each batch is encoded once and handed to every
+    client's event loop with one call_soon_threadsafe per loop, so
+    publishing never waits on a client. A client whose buffer would grow
+    past `max_buffer` events is disconnected; its browser reconnects and
+    starts again from a fresh snapshot.
+
+    The hub also keeps the votes of the current interval, which is what
+    a new client gets as its snapshot.
+    """
+
+    def __init__(self, max_buffer: int = 1024, interval: timedelta = timedelta(minutes=15)):
+        self.max_buffer = max_buffer
+        self.interval = interval
+
+        self.published = 0
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._clients: Dict[asyncio.AbstractEventLoop, Set[LiveClient]] = {}
+        self._interval_start: Optional[datetime] = None
+        self._recent: List[dict] = []
+
+    @property
+    def client_count(self) -> int:
+        with self._lock:
+            return sum(len(clients) for clients in self._clients.values())
+
+    def interval_start(self, moment: datetime) -> datetime:
+        midnight = datetime.combine(moment.date(), datetime.min.time())
+        step = self.interval.total_seconds()
+        return midnight + timedelta(seconds=(moment - midnight).total_seconds() // step * step)
+
+    def _snapshot_event(self) -> bytes:
+        start = self._interval_start
+        return _sse("snapshot", {
+            "interval_start": start.isoformat() if start else None,
+            "interval_end": (start + self.interval).isoformat() if start else None,
+            "votes": self._recent,
+        })
+
+    # Replace the current interval's votes, e.g. from the database at startup
+    def seed(self, votes: Iterable[dict], now: datetime):
+        with self._lock:
+            self._interval_start = self.interval_start(now)
+            self._recent = list(votes)
+
+    def subscribe(self, now: Optional[datetime] = None) -> LiveClient:
+        client = LiveClient(asyncio.get_running_loop(), self.max_buffer)
+        current = self.interval_start(now or datetime.utcnow())
+        with self._lock:
+            if self._interval_start is None or self._interval_start < current:
+                # No votes since the last interval ended
+                self._interval_start = current
+                self._recent = []
+            client._push([self._snapshot_event()])
+            self._clients.setdefault(client.loop, set()).add(client)
+        return client
+
+    def unsubscribe(self, client: LiveClient):
+        client.close()
+        with self._lock:
+            clients = self._clients.get(client.loop)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del self._clients[client.loop]
+
+    def publish(self, votes: List[dict]):
+        if not votes:
+            return
+        events = []
+        with self._lock:
+            for vote in votes:
+                timestamp = datetime.fromisoformat(vote["timestamp"])
+                if self._interval_start is not None and timestamp < self._interval_start:
+                    # A late vote (e.g. replayed by /votes/batch) is not
+                    # part of the interval clients are showing
+                    continue
+                if self._interval_start is None or timestamp >= self._interval_start + self.interval:
+                    # A new interval: clients start over from an empty table
+                    self._interval_start = self.interval_start(timestamp)
+                    self._recent = []
+                    events.append(self._snapshot_event())
+                self._recent.append(vote)
+                events.append(_sse("vote", vote))
+                self.published += 1
+            if not events:
+                return
+            targets = [(loop, list(clients)) for loop, clients in self._clients.items()]
+
+        for loop, clients in targets:
+            try:
+                loop.call_soon_threadsafe(self._deliver, clients, events)
+            except RuntimeError:
+                # The loop has been closed; its clients are gone
+                with self._lock:
+                    self._clients.pop(loop, None)
+
+    def _deliver(self, clients: List[LiveClient], events: List[bytes]):
+        for client in clients:
+            if not client.closed and not client._push(events):
+                self.dropped += 1
+
+    # SSE body for one client: the snapshot, then events as they arrive
+    async def stream(self, client: LiveClient, keepalive: float = KEEPALIVE_INTERVAL):
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(client.next(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.unsubscribe(client)
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+
+class CachedResponse:
+    __slots__ = ("body", "media_type", "etag", "expires_at")
+
+    def __init__(self, body: bytes, media_type: str, expires_at: Optional[datetime]):
+        self.body = body
+        self.media_type = media_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    Read-through cache of rendered responses with LRU eviction.
+
+    Entries live until `invalidate()` (called when votes are committed or
+    the voting schedule changes), until their own `expires_at` (data that
+    changes with the clock, like the sliding hour behind /average), or
+    until evicted. A response computed while an invalidation happened is
+    not stored, so a stale body never outlives the invalidation.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def lookup(self, key: str, now: datetime) -> Tuple[Optional[CachedResponse], int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and now >= entry.expires_at:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry, self._generation
+
+    def store(self, key: str, entry: CachedResponse, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # The cached or freshly built response for `request`. `build` returns
+    # (content, expires_at) on a miss; JSON content is rendered exactly as
+    # FastAPI renders a returned dict. Matching If-None-Match gets a 304.
+    # A `variant` (e.g. the media type picked from Accept) is cached
+    # separately and the response says it varies by Accept.
+    def respond(self, request: Request, build: Callable[[], Tuple[object, Optional[datetime]]],
+                variant: Optional[str] = None) -> Response:
+        key = _key(request, variant)
+        entry, generation = self.lookup(key, datetime.utcnow())
+        if entry is None:
+            entry = self._render(key, generation, *build())
+        return self._reply(request, entry, variant is not None)
+
+    # Same, with a coroutine function as `build`
+    async def respond_async(self, request: Request, build: Callable[[], Awaitable[Tuple[object, Optional[datetime]]]],
+                            variant: Optional[str] = None) -> Response:
+        key = _key(request, variant)
+        entry, generation = self.lookup(key, datetime.utcnow())
+        if entry is None:
+            entry = self._render(key, generation, *(await build()))
+        return self._reply(request, entry, variant is not None)
+
+    def _render(self, key: str, generation: int, content, expires_at: Optional[datetime]) -> CachedResponse:
+        rendered = content if isinstance(content, Response) else JSONResponse(content)
+        entry = CachedResponse(bytes(rendered.body), rendered.media_type, expires_at)
+        self.store(key, entry, generation)
+        return entry
+
+    def _reply(self, request: Request, entry: CachedResponse, vary: bool = False) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if vary:
+            headers["Vary"] = "Accept"
+        if entry.etag in request.headers.get("if-none-match", ""):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+
+def _key(request: Request, variant: Optional[str] = None) -> str:
+    query = request.url.query
+    key = request.url.path + ("?" + query if query else "")
+    return key if variant is None else key + " " + variant
@@ -0,0 +1,116 @@
+import os
+from urllib.parse import urlsplit
+
+# Deployment settings, overridable through AIRVOTE_* environment variables
+
+# Thermostat that receives the rounded average
+THERMOSTAT_URL = os.getenv("AIRVOTE_THERMOSTAT_URL", "http://localhost:5000/set-temperature")
+THERMOSTAT_TIMEOUT = float(os.getenv("AIRVOTE_THERMOSTAT_TIMEOUT", "2.0"))
+THERMOSTAT_MAX_RETRIES = int(os.getenv("AIRVOTE_THERMOSTAT_MAX_RETRIES", "5"))
+# A value still undelivered after the retries is tried again this often
+THERMOSTAT_RETRY_SECONDS = float(os.getenv("AIRVOTE_THERMOSTAT_RETRY_SECONDS", "30"))
+
+# Vote ingestion: batches are committed every VOTE_BATCH_DELAY_MS or
+# VOTE_BATCH_MAX votes. VOTE_ACK_MODE is "commit" (reply after the group
+# commit) or "enqueue" (reply as soon as the vote is queued). A vote not
+# committed within VOTE_COMMIT_TIMEOUT seconds is answered 503.
+VOTE_BATCH_MAX = int(os.getenv("AIRVOTE_VOTE_BATCH_MAX", "500"))
+VOTE_BATCH_DELAY_MS = float(os.getenv("AIRVOTE_VOTE_BATCH_DELAY_MS", "10"))
+VOTE_ACK_MODE = os.getenv("AIRVOTE_VOTE_ACK_MODE", "commit")
+VOTE_COMMIT_TIMEOUT = float(os.getenv("AIRVOTE_VOTE_COMMIT_TIMEOUT", "10"))
+
+# SQLite page cache (negative = KiB) and memory-mapped I/O size in bytes
+SQLITE_CACHE_SIZE = int(os.getenv("AIRVOTE_SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("AIRVOTE_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# "sync" runs the vote/average/latest/login handlers on the threadpool with
+# a blocking Session; "async" runs them as coroutines on an AsyncSession
+# (requires aiosqlite)
+DB_MODE = os.getenv("AIRVOTE_DB_MODE", "sync")
+
+# bcrypt process pool for /login and how many checks may queue behind it
+# before /login answers 503 (0 = core count / 4 per worker)
+LOGIN_POOL_WORKERS = int(os.getenv("AIRVOTE_LOGIN_POOL_WORKERS", "0")) or None
+LOGIN_POOL_MAX_PENDING = int(os.getenv("AIRVOTE_LOGIN_POOL_MAX_PENDING", "0")) or None
+SESSION_TOKEN_TTL = float(os.getenv("AIRVOTE_SESSION_TOKEN_TTL", "900"))
+
+# Concurrent web push requests when reminding subscribers
+PUSH_WORKERS = int(os.getenv("AIRVOTE_PUSH_WORKERS", "32"))
+
+# Events a live feed client may fall behind by before it is disconnected
+LIVE_FEED_BUFFER = int(os.getenv("AIRVOTE_LIVE_FEED_BUFFER", "1024"))
+
+# Where worker processes share config and elect the process that runs
+# reminders and rollups: "memory" (one process) or "sqlite" (every
+# process using the same database, e.g. uvicorn --workers 4)
+STATE_BACKEND = os.getenv("AIRVOTE_STATE_BACKEND", "memory")
+LEADER_TTL = float(os.getenv("AIRVOTE_LEADER_TTL", "15"))
+STATE_POLL_SECONDS = float(os.getenv("AIRVOTE_STATE_POLL_SECONDS", "1"))
+
+# Sensor readings per POST /sensors/readings, and how long each tier is kept
+SENSOR_BATCH_MAX = int(os.getenv("AIRVOTE_SENSOR_BATCH_MAX", "10000"))
+SENSOR_RAW_RETENTION_HOURS = float(os.getenv("AIRVOTE_SENSOR_RAW_RETENTION_HOURS", "24"))
+SENSOR_MINUTE_RETENTION_DAYS = float(os.getenv("AIRVOTE_SENSOR_MINUTE_RETENTION_DAYS", "30"))
+SENSOR_HOUR_RETENTION_DAYS = float(os.getenv("AIRVOTE_SENSOR_HOUR_RETENTION_DAYS", "730"))
+
+# Rendered responses kept by the read cache (/average, /votes/latest, /admin)
+CACHE_MAX_ENTRIES = int(os.getenv("AIRVOTE_CACHE_MAX_ENTRIES", "256"))
+
+# Votes older than VOTE_RETENTION_DAYS are rolled up, written to one
+# gzipped NDJSON file per month in ARCHIVE_DIR and deleted from votes.db,
+# ARCHIVE_DELETE_BATCH rows per transaction
+VOTE_RETENTION_DAYS = float(os.getenv("AIRVOTE_VOTE_RETENTION_DAYS", "365"))
+ARCHIVE_DIR = os.getenv("AIRVOTE_ARCHIVE_DIR", "archive")
+ARCHIVE_DELETE_BATCH = int(os.getenv("AIRVOTE_ARCHIVE_DELETE_BATCH", "2000"))
+
+# /vote admission: each logged-in user may cast VOTE_RATE_LIMIT votes a
+# minute in bursts of up to VOTE_RATE_BURST; 0 disables the limit.
+# Anonymous votes are limited per client address to
+# VOTE_RATE_LIMIT_ANONYMOUS a minute, off by default since everyone behind
+# one NAT or proxy shares that address. VOTE_RATE_MAX_KEYS bounds the
+# buckets kept in memory.
+VOTE_RATE_LIMIT = float(os.getenv("AIRVOTE_VOTE_RATE_LIMIT", "30"))
+VOTE_RATE_LIMIT_ANONYMOUS = float(os.getenv("AIRVOTE_VOTE_RATE_LIMIT_ANONYMOUS", "0"))
+VOTE_RATE_BURST = int(os.getenv("AIRVOTE_VOTE_RATE_BURST", "10"))
+VOTE_RATE_MAX_KEYS = int(os.getenv("AIRVOTE_VOTE_RATE_MAX_KEYS", "200000"))
+
+# What /average reports for the last hour: "mean" (served from the running
+# aggregate), or "median", "trimmed_mean" (AVERAGE_TRIM cut from each end)
+# or "weighted_mean" (a vote's weight halves every AVERAGE_HALF_LIFE_MINUTES),
+# computed from the window's votes with NumPy
+AVERAGE_METHOD = os.getenv("AIRVOTE_AVERAGE_METHOD", "mean")
+AVERAGE_TRIM = float(os.getenv("AIRVOTE_AVERAGE_TRIM", "0.1"))
+AVERAGE_HALF_LIFE_MINUTES = float(os.getenv("AIRVOTE_AVERAGE_HALF_LIFE_MINUTES", "15"))
+
+# A zone thermostat's dispatcher thread exits after this many seconds
+# without a new value and starts again on the next one
+ZONE_DISPATCHER_IDLE_SECONDS = float(os.getenv("AIRVOTE_ZONE_DISPATCHER_IDLE_SECONDS", "60"))
+
+# Hosts a zone's thermostat_url may point at, comma-separated (by default
+# only THERMOSTAT_URL's host); the server POSTs to it on every vote batch
+THERMOSTAT_HOSTS = {
+    host.strip().lower()
+    for host in os.getenv("AIRVOTE_THERMOSTAT_HOSTS", urlsplit(THERMOSTAT_URL).hostname or "").split(",")
+    if host.strip()
+}
+
+# POST /votes/batch: votes per request, and how long after it was cast a
+# vote queued offline may still be sent (idempotency keys are kept as long)
+VOTE_BATCH_REQUEST_MAX = int(os.getenv("AIRVOTE_VOTE_BATCH_REQUEST_MAX", "100"))
+VOTE_REPLAY_MAX_AGE_HOURS = float(os.getenv("AIRVOTE_VOTE_REPLAY_MAX_AGE_HOURS", "24"))
+
+# Users cached by email for /vote and /login, each reloaded after
+# USER_CACHE_TTL_SECONDS; vote counts kept in memory are written to the
+# users table every USER_COUNT_FLUSH_SECONDS and at shutdown
+USER_CACHE_MAX_ENTRIES = int(os.getenv("AIRVOTE_USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("AIRVOTE_USER_CACHE_TTL_SECONDS", "60"))
+USER_COUNT_FLUSH_SECONDS = float(os.getenv("AIRVOTE_USER_COUNT_FLUSH_SECONDS", "5"))
+
+# GET /weather proxies WEATHER_URL (Open-Meteo's forecast API), caching
+# current conditions for WEATHER_TTL_SECONDS per WEATHER_BUCKET_DEGREES
+# grid cell (0.1° is about 11 km) in at most WEATHER_CACHE_MAX_ENTRIES cells
+WEATHER_URL = os.getenv("AIRVOTE_WEATHER_URL", "https://api.open-meteo.com/v1/forecast")
+WEATHER_TTL_SECONDS = float(os.getenv("AIRVOTE_WEATHER_TTL_SECONDS", "600"))
+WEATHER_BUCKET_DEGREES = float(os.getenv("AIRVOTE_WEATHER_BUCKET_DEGREES", "0.1"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("AIRVOTE_WEATHER_CACHE_MAX_ENTRIES", "1024"))
+WEATHER_TIMEOUT = float(os.getenv("AIRVOTE_WEATHER_TIMEOUT", "5"))
@@ -1,6 +1,6 @@
-from database import Base, engine
+from database import migrate_db
 
 # Create all tables
 if __name__ == "__main__":
-    Base.metadata.create_all(bind=engine)
+    migrate_db()
     print("Database tables created successfully.")
\ No newline at end of file
@@ -1,22 +1,75 @@
-from sqlalchemy import create_engine, Column, Integer, Float, DateTime, String
+from sqlalchemy import create_engine, event, inspect, Column, Integer, Float, DateTime, String, Index, UniqueConstraint
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from passlib.context import CryptContext
 from datetime import datetime
+from functools import lru_cache
+import config
 
 # Database setup
 DATABASE_URL = "sqlite:///./votes.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+# SQLite storage profile, applied to every new connection
+SQLITE_PRAGMAS = {
+    # Lets archive.py hand pages freed by deleted votes back a few at a
+    # time. Must precede journal_mode: it only applies to a database that
+    # has not been written yet (or after `python archive.py vacuum`).
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",  # readers no longer block the vote writer
+    "synchronous": "NORMAL",  # fsync on checkpoint instead of every commit (safe with WAL)
+    "mmap_size": config.SQLITE_MMAP_SIZE,
+    "cache_size": config.SQLITE_CACHE_SIZE,  # negative means KiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+event.listen(engine, "connect", apply_sqlite_pragmas)
+
+# Async engine and sessions, only built for AIRVOTE_DB_MODE=async since
+# they need the optional aiosqlite driver
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+async_engine = None
+AsyncSessionLocal = None
+if config.DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Name stored with every vote; /votes/latest and /votes/live show it
+ANONYMOUS = "Anonymous"
+
 # Models
 class Vote(Base):
     __tablename__ = "votes"
     id = Column(Integer, primary_key=True, index=True)
     temperature = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    username = Column(String, default="Anonymous")
+    username = Column(String, default=ANONYMOUS)
+    # Set for votes from known users: one vote per user per voting window
+    user_id = Column(Integer, nullable=True)
+    window_start = Column(DateTime, nullable=True)
+    # Room or floor the vote is for; None counts towards the office only
+    zone_id = Column(Integer, nullable=True)
+
+    # Time-range scans (/average, /admin, /votes/latest) read only this
+    # index, per-zone scans the zone one
+    __table_args__ = (
+        Index("ix_votes_timestamp_temperature", "timestamp", "temperature"),
+        Index("ix_votes_zone_timestamp", "zone_id", "timestamp", "temperature"),
+        Index("uq_votes_user_window", "user_id", "window_start", unique=True),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -24,6 +77,22 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     password_hash = Column(String)
     votes_count = Column(Integer, default=0)
+    # Zone the user's votes count towards unless a vote names another
+    zone_id = Column(Integer, nullable=True)
+
+# Client-generated keys of stored votes, so a replayed vote is stored once
+class VoteKey(Base):
+    __tablename__ = "vote_keys"
+    key = Column(String, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# A room or floor, and the thermostat its average is pushed to
+class Zone(Base):
+    __tablename__ = "zones"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    thermostat_url = Column(String, nullable=True)  # None: no device of its own
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 class Feedback(Base):
     __tablename__ = "feedback"
@@ -33,14 +102,146 @@ class Feedback(Base):
     survey_answers = Column(String, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# One row per closed voting window, written by rollups.py
+class VoteRollup(Base):
+    __tablename__ = "vote_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    vote_count = Column(Integer, nullable=False, default=0)
+    temperature_sum = Column(Float, nullable=False, default=0.0)
+    min_temperature = Column(Float, nullable=True)
+    max_temperature = Column(Float, nullable=True)
+    histogram = Column(String, nullable=False)  # JSON list of counts per 1°C bin
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("window_start", "window_end", name="uq_vote_rollups_window"),
+    )
+
+# One row per month of votes moved to an archive file by archive.py
+class VoteArchive(Base):
+    __tablename__ = "vote_archives"
+    month = Column(DateTime, primary_key=True)  # first day of the month
+    path = Column(String, nullable=False)  # file name in AIRVOTE_ARCHIVE_DIR
+    vote_count = Column(Integer, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Web push subscriptions saved by /subscribe
+class PushSubscription(Base):
+    __tablename__ = "push_subscriptions"
+    id = Column(Integer, primary_key=True, index=True)
+    endpoint = Column(String, unique=True, nullable=False)
+    subscription_info = Column(String, nullable=False)  # JSON from PushManager.subscribe()
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Voting schedule history; the newest row is the active schedule
+class VotingScheduleConfig(Base):
+    __tablename__ = "voting_schedules"
+    id = Column(Integer, primary_key=True, index=True)
+    definition = Column(String, nullable=False)  # JSON from VotingSchedule.to_dict()
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Shared state for multi-worker deployments (see shared_state.py)
+class SharedConfig(Base):
+    __tablename__ = "shared_config"
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class Lease(Base):
+    __tablename__ = "leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(Float, nullable=False)  # Unix time
+
+# Outdoor conditions fetched by /weather (see weather.py), one row per
+# upstream fetch, for comparing with the votes cast at the time
+class WeatherReading(Base):
+    __tablename__ = "weather_readings"
+    id = Column(Integer, primary_key=True)
+    latitude = Column(Float, nullable=False)  # bucket centre
+    longitude = Column(Float, nullable=False)
+    temperature = Column(Float, nullable=True)
+    weathercode = Column(Integer, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+    # Outdoor averages per window (weather.outdoor_means) read only this
+    __table_args__ = (
+        Index("ix_weather_readings_fetched_temperature", "fetched_at", "temperature"),
+    )
+
+# Thermostat sensors (see sensors.py). Readings are keyed by time first
+# so inserts append and range scans/deletes by time stay cheap.
+class Sensor(Base):
+    __tablename__ = "sensors"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+class SensorReading(Base):
+    __tablename__ = "sensor_readings"
+    ts = Column(Integer, primary_key=True)  # Unix seconds
+    sensor_id = Column(Integer, primary_key=True)
+    temperature = Column(Float, nullable=False)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+# Downsampled readings; resolution is the bucket size in seconds (60, 3600)
+class SensorRollup(Base):
+    __tablename__ = "sensor_rollups"
+    resolution = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # Unix seconds at bucket start
+    sensor_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    min_temperature = Column(Float, nullable=False)
+    max_temperature = Column(Float, nullable=False)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+# Password hashing setup, built once on first use (passlib and its
+# bcrypt backend are slow to load and most imports never hash)
+@lru_cache(maxsize=None)
+def password_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
+
+# Create missing tables, then any columns and indexes added since an
+# existing votes.db was created (create_all skips existing tables).
+# Not run on import: the app runs it at startup, `python create_db.py`
+# runs it by hand.
+def migrate_db(bind=engine):
+    try:
+        _create_schema(bind)
+    except OperationalError:
+        # Another worker created the same table first; the second pass
+        # sees it and skips it
+        _create_schema(bind)
+
+def _create_schema(bind):
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# New columns must be nullable or have a server default for ADD COLUMN;
+# Python-side defaults only apply to rows inserted afterwards
+def _add_missing_columns(bind):
+    existing = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            present = {column["name"] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    kind = column.type.compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {kind}')
@@ -0,0 +1,108 @@
+import csv
+import io
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import Vote
+import archive
+import serialize
+
+# Rows fetched from SQLite per round trip while streaming
+CHUNK_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+VOTE_COLUMNS = ("id", "temperature", "timestamp", "username")
+
+
+def votes_query(after_id: int = 0, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    query = select(Vote.id, Vote.temperature, Vote.timestamp, Vote.username).where(Vote.id > after_id)
+    if since is not None:
+        query = query.where(Vote.timestamp >= since)
+    if until is not None:
+        query = query.where(Vote.timestamp < until)
+    return query.order_by(Vote.id)
+
+
+# Months moved out of votes.db by archive.py are read from their files;
+# votes.db is then only read from the end of the last archived month
+def _live_filters(cutoff: datetime, filters: dict) -> dict:
+    since = filters.get("since")
+    return {**filters, "since": cutoff if since is None else max(since, cutoff)}
+
+
+# Plain rows in chunks of `chunk_size`, from a session owned by the
+# generator (the request's session is closed before streaming starts),
+# archived votes first
+def vote_chunks(session_factory, chunk_size: int = CHUNK_SIZE, **filters) -> Iterator[List[tuple]]:
+    db = session_factory()
+    try:
+        cutoff = archive.archived_until(db)
+        if cutoff is not None:
+            yield from archive.archived_chunks(db, chunk_size, **filters)
+            filters = _live_filters(cutoff, filters)
+        result = db.execute(votes_query(**filters).execution_options(yield_per=chunk_size))
+        for chunk in result.partitions(chunk_size):
+            yield chunk
+    finally:
+        db.close()
+
+
+# A chunk of rows as one JSON array, encoded by orjson straight from the
+# tuples (timestamps come out as datetime.isoformat() would write them)
+def _dumps_chunk(chunk: List[tuple]) -> bytes:
+    return serialize.dumps(serialize.as_rows(chunk, VOTE_COLUMNS))
+
+
+def iter_json_array(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    yield b"["
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = _dumps_chunk(chunk)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def iter_ndjson(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield b"".join(serialize.dumps(vote) + b"\n" for vote in serialize.as_rows(chunk, VOTE_COLUMNS))
+
+
+def iter_csv(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(VOTE_COLUMNS)
+    for chunk in chunks:
+        for vote_id, temperature, timestamp, username in chunk:
+            writer.writerow((vote_id, temperature, timestamp.isoformat() if timestamp else "", username))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+# One keyset page: votes with id > after_id, in `layout` (see
+# serialize.LAYOUTS), plus the cursor for the next one
+def vote_page(db: Session, after_id: int = 0, limit: int = MAX_PAGE_SIZE, layout: str = "rows",
+              **filters) -> dict:
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    rows = []
+    cutoff = archive.archived_until(db)
+    if cutoff is not None:
+        for chunk in archive.archived_chunks(db, limit, after_id, **filters):
+            rows.extend(chunk[:limit - len(rows)])
+            if len(rows) == limit:
+                break
+        filters = _live_filters(cutoff, filters)
+    if len(rows) < limit:
+        last_id = rows[-1][0] if rows else after_id
+        rows.extend(db.execute(votes_query(last_id, **filters).limit(limit - len(rows))).all())
+    return {
+        "votes": serialize.layout_rows(rows, VOTE_COLUMNS, layout),
+        "next_cursor": rows[-1][0] if len(rows) == limit else None,
+    }
@@ -0,0 +1,278 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, List, Optional
+from sqlalchemy import bindparam, delete, insert, text, update
+from database import Vote, VoteKey, User
+import metrics
+
+if TYPE_CHECKING:
+    from users import UserDirectory
+
+# Acknowledge a vote once its batch is committed, or as soon as it is queued
+ACK_COMMIT = "commit"
+ACK_ENQUEUE = "enqueue"
+
+
+class DuplicateVote(Exception):
+    """The user already has a vote stored for this voting window."""
+
+
+class DuplicateKey(Exception):
+    """A vote with the same idempotency key is already stored."""
+
+
+class PendingVote:
+    __slots__ = ("temperature", "timestamp", "user_email", "window_start", "zone_id", "key", "future")
+
+    def __init__(self, temperature: float, timestamp: datetime, user_email: Optional[str],
+                 window_start: Optional[datetime] = None, zone_id: Optional[int] = None,
+                 key: Optional[str] = None):
+        self.temperature = temperature
+        self.timestamp = timestamp
+        self.user_email = user_email
+        self.window_start = window_start
+        # Filled in from the user's zone at commit when the vote names none
+        self.zone_id = zone_id
+        # Client idempotency key, recorded in vote_keys
+        self.key = key
+        # Resolves to the user's new votes_count (None for anonymous votes)
+        self.future: Future = Future()
+
+
+class VoteIngestor:
+    """
+    Group-commit writer for votes.
+
+    Votes are queued by the request handlers and written by a single
+    worker thread, one transaction per batch. A batch is flushed when it
+    reaches `max_batch` votes or `max_delay` seconds after its first vote.
+    A vote from a known user for a window they already have a vote in is
+    dropped and its future fails with DuplicateVote; so is a vote whose key
+    is already stored, with DuplicateKey. Votes passed to submit_many()
+    are written in the same transaction. A vote without a zone is stored
+    under the user's zone, if they have one.
+
+    With a UserDirectory, users are looked up in it and votes_count
+    increments are left for it to flush instead of updated per batch.
+    """
+
+    def __init__(self, session_factory, max_batch: int = 500, max_delay: float = 0.01,
+                 on_commit: Optional[Callable[[List[PendingVote]], None]] = None,
+                 users: Optional["UserDirectory"] = None):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.on_commit = on_commit
+        self.users = users
+
+        self.batches = 0
+        self.votes = 0
+        self.duplicates = 0
+        self.replayed = 0
+        # Time spent waiting for SQLite's write lock (other writers/workers)
+        self.lock_wait = 0.0
+        self.lock_wait_max = 0.0
+
+        # Each item is a group of votes committed together
+        self._queue: "queue.Queue[Optional[List[PendingVote]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="vote-ingestor", daemon=True)
+            self._thread.start()
+
+    # Flush whatever is queued and stop the worker
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "votes": self.votes,
+            "duplicates": self.duplicates,
+            "replayed": self.replayed,
+            "queued": self._queue.qsize(),
+            "lock_wait_seconds": round(self.lock_wait, 6),
+            "lock_wait_max_seconds": round(self.lock_wait_max, 6),
+        }
+
+    def submit(self, temperature: float, timestamp: datetime, user_email: Optional[str] = None,
+               window_start: Optional[datetime] = None, zone_id: Optional[int] = None,
+               key: Optional[str] = None) -> Future:
+        pending = PendingVote(temperature, timestamp, user_email, window_start, zone_id, key)
+        return self.submit_many([pending])[0]
+
+    def submit_many(self, votes: List[PendingVote]) -> List[Future]:
+        # Also restarts a worker that died
+        self.start()
+        self._queue.put(votes)
+        return [pending.future for pending in votes]
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = list(first)
+            deadline = time.monotonic() + self.max_delay
+            stopping = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.extend(item)
+
+            self._write(batch)
+            if stopping:
+                # Drain anything that raced in behind the stop marker
+                rest = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        rest.extend(item)
+                if rest:
+                    self._write(rest)
+                return
+
+    def _write(self, batch: List[PendingVote]):
+        try:
+            with metrics.VOTE_BATCHES.time():
+                outcomes = self._commit(batch)
+        except Exception as e:
+            print(f"Error writing vote batch: {e}")
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+
+        accepted = []
+        for pending, outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                pending.future.set_exception(outcome)
+            else:
+                accepted.append(pending)
+                pending.future.set_result(outcome)
+        self.batches += 1
+        self.votes += len(accepted)
+        self.replayed += sum(1 for outcome in outcomes if isinstance(outcome, DuplicateKey))
+        self.duplicates += sum(1 for outcome in outcomes if isinstance(outcome, DuplicateVote))
+        if self.on_commit is not None and accepted:
+            # The votes are stored either way; keep the worker alive
+            try:
+                self.on_commit(accepted)
+            except Exception as e:
+                print(f"Error in vote commit callback: {e}")
+
+    # One transaction: bulk insert the votes and bump votes_count per user.
+    # Each vote's outcome is the user's new votes_count, None for anonymous
+    # votes, or a DuplicateVote or DuplicateKey.
+    def _commit(self, batch: List[PendingVote]) -> list:
+        db = self.session_factory()
+        try:
+            # Take the write lock up front so the wait for it can be timed
+            started = time.perf_counter()
+            db.execute(text("BEGIN IMMEDIATE"))
+            waited = time.perf_counter() - started
+            self.lock_wait += waited
+            self.lock_wait_max = max(self.lock_wait_max, waited)
+
+            emails = {p.user_email for p in batch if p.user_email}
+            current = {}
+            if emails and self.users is not None:
+                current = {email: (user.id, self.users.votes_count(user), user.zone_id)
+                           for email, user in self.users.get_many(db, emails).items() if user.exists}
+            elif emails:
+                rows = db.query(User.id, User.email, User.votes_count, User.zone_id).filter(
+                    User.email.in_(emails)).all()
+                current = {email: (user_id, votes_count or 0, zone_id)
+                           for user_id, email, votes_count, zone_id in rows}
+
+            # The unique (user_id, window_start) index backs up the in-memory
+            # check; look the pairs up first so one repeat doesn't fail the batch
+            taken = set()
+            windows = {p.window_start for p in batch if p.user_email in current and p.window_start}
+            if windows:
+                user_ids = {user_id for user_id, _, _ in current.values()}
+                taken = set(db.query(Vote.user_id, Vote.window_start).filter(
+                    Vote.user_id.in_(user_ids), Vote.window_start.in_(windows),
+                ).all())
+
+            keys = {p.key for p in batch if p.key}
+            stored_keys = set()
+            if keys:
+                stored_keys = {key for (key,) in db.query(VoteKey.key).filter(VoteKey.key.in_(keys))}
+
+            # Each vote sees the count as it would have after its own increment
+            seen = Counter()
+            outcomes, rows, key_rows = [], [], []
+            for p in batch:
+                # A replayed vote: its key is checked before the window
+                if p.key and p.key in stored_keys:
+                    outcomes.append(DuplicateKey())
+                    continue
+                user_id = current[p.user_email][0] if p.user_email in current else None
+                if user_id is not None and p.window_start is not None:
+                    if (user_id, p.window_start) in taken:
+                        outcomes.append(DuplicateVote())
+                        continue
+                    taken.add((user_id, p.window_start))
+                if p.key:
+                    stored_keys.add(p.key)
+                    key_rows.append({"key": p.key, "created_at": datetime.utcnow()})
+                if p.zone_id is None and user_id is not None:
+                    p.zone_id = current[p.user_email][2]
+                rows.append({"temperature": p.temperature, "timestamp": p.timestamp,
+                             "user_id": user_id, "window_start": p.window_start, "zone_id": p.zone_id})
+                if user_id is not None:
+                    seen[p.user_email] += 1
+                    outcomes.append(current[p.user_email][1] + seen[p.user_email])
+                else:
+                    outcomes.append(None)
+
+            if rows:
+                db.execute(insert(Vote), rows)
+            if key_rows:
+                db.execute(insert(VoteKey), key_rows)
+
+            if seen and self.users is None:
+                users = User.__table__
+                db.execute(
+                    update(users).where(users.c.id == bindparam("user_id")).values(votes_count=bindparam("new_count")),
+                    [{"user_id": current[email][0], "new_count": current[email][1] + n} for email, n in seen.items()],
+                )
+            db.commit()
+            if self.users is not None:
+                for email, n in seen.items():
+                    self.users.add_votes(current[email][0], n)
+            return outcomes
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Forget idempotency keys of votes stored before `before`; a vote that old
+# can no longer be replayed
+def purge_keys(db, before: datetime) -> int:
+    deleted = db.execute(delete(VoteKey).where(VoteKey.created_at < before)).rowcount
+    db.commit()
+    return deleted
@@ -0,0 +1,245 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+
+class ThermostatDispatcher:
+    """
+    Pushes the rounded average to the thermostat from a background thread.
+
+    Request handlers only call submit(), which never blocks. Values that
+    arrive while a push is in flight collapse into the latest one, and a
+    value equal to the last one delivered is not sent again. With an
+    `idle_timeout` the thread exits after that many seconds without a
+    value and the next submit() starts a new one.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0, max_retries: int = 5,
+                 backoff: float = 0.25, max_backoff: float = 8.0,
+                 session: Optional["requests.Session"] = None,
+                 idle_timeout: Optional[float] = None, retry_interval: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+        self.retry_interval = retry_interval
+
+        # One pooled keep-alive connection to the device, opened by the
+        # first push (requests is imported there, not at start-up)
+        self.session = session
+
+        self.last_sent: Optional[float] = None
+        self.pushes = 0
+        self.failures = 0
+        self.coalesced = 0
+        # Times the retries ran out
+        self.gave_up = 0
+
+        self._pending: Optional[float] = None
+        self._inflight: Optional[float] = None
+        # Latest value whose retries ran out, waiting for retry_interval
+        self._undelivered: Optional[float] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="thermostat-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    # True while a push is on its way to the device
+    @property
+    def busy(self) -> bool:
+        with self._cond:
+            return self._inflight is not None
+
+    # Queue a value for delivery; returns immediately
+    def submit(self, temperature: float):
+        with self._cond:
+            # Compare against the newest value already on its way; an
+            # undelivered value is sent again straight away
+            target = self._pending
+            if target is None:
+                target = self._inflight if self._inflight is not None else self.last_sent
+            if self._undelivered is not None and self._inflight is None:
+                target = None
+            if temperature == target:
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = temperature
+            self._cond.notify()
+        if self._thread is None:
+            self.start()
+
+    # Latest value the device has not received after every retry, if any
+    @property
+    def undelivered(self) -> Optional[float]:
+        with self._cond:
+            return self._undelivered
+
+    # Block until nothing is pending (used by tests and benchmarks)
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and self._inflight is None, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                timeout = self.retry_interval if self._undelivered is not None else self.idle_timeout
+                if self._cond.wait_for(lambda: self._pending is not None or self._stopping, timeout):
+                    if self._stopping:
+                        return
+                    # A newer value replaces any undelivered one
+                    value, self._pending = self._pending, None
+                elif self._undelivered is not None:
+                    value = self._undelivered
+                else:
+                    # Idle; submit() sees no thread and starts another
+                    self._thread = None
+                    return
+                self._undelivered = None
+                self._inflight = value
+            try:
+                self._deliver(value)
+            finally:
+                with self._cond:
+                    self._inflight = None
+                    self._cond.notify_all()
+
+    def _open_session(self) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return session
+
+    def _deliver(self, value: float):
+        import requests
+
+        if self.session is None:
+            self.session = self._open_session()
+        attempt = 0
+        while True:
+            if value == self.last_sent:
+                return
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url, json={"temperature": value}, timeout=self.timeout)
+                response.raise_for_status()
+                metrics.OUTBOUND.observe(time.perf_counter() - started, "thermostat", "ok")
+                self.last_sent = value
+                self.pushes += 1
+                return
+            except requests.RequestException as e:
+                metrics.OUTBOUND.observe(time.perf_counter() - started, "thermostat", "error")
+                self.failures += 1
+                attempt += 1
+                if attempt > self.max_retries:
+                    with self._cond:
+                        if self._pending is None:
+                            self._undelivered = value
+                    self.gave_up += 1
+                    metrics.THERMOSTAT_GAVE_UP.inc()
+                    print(f"Thermostat push failed, retrying in {self.retry_interval:g}s: ", e)
+                    return
+
+            # Bounded exponential backoff; a newer value or shutdown cuts it short
+            delay = min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+            with self._cond:
+                if self._cond.wait_for(lambda: self._pending is not None or self._stopping, delay):
+                    if self._stopping:
+                        return
+                    value, self._pending = self._pending, None
+                    self._inflight = value
+                    attempt = 0
+
+
+class ThermostatRouter:
+    """
+    Routes each zone's average to that zone's thermostat, through one
+    ThermostatDispatcher per zone. Dispatcher threads exit when idle, so
+    hundreds of zones only hold threads for the devices being updated.
+    """
+
+    def __init__(self, idle_timeout: float = 60.0, **dispatcher_options):
+        self.idle_timeout = idle_timeout
+        self.dispatcher_options = dispatcher_options
+        self._dispatchers: Dict[int, ThermostatDispatcher] = {}
+        # Replaced dispatchers still finishing a push, and the pushes of
+        # those that have finished, so `pushes` never goes down
+        self._retired: List[ThermostatDispatcher] = []
+        self._retired_pushes = 0
+        self._lock = threading.Lock()
+
+    # Point a zone at a device, or at none with url=None
+    def route(self, zone_id: int, url: Optional[str]):
+        with self._lock:
+            current = self._dispatchers.get(zone_id)
+            if current is not None and current.url == url:
+                return
+            if url:
+                self._dispatchers[zone_id] = ThermostatDispatcher(
+                    url, idle_timeout=self.idle_timeout, **self.dispatcher_options)
+            else:
+                self._dispatchers.pop(zone_id, None)
+            if current is not None:
+                self._retired.append(current)
+        if current is not None:
+            current.stop(timeout=0)
+
+    # Queue a zone's average; False if the zone has no thermostat
+    def submit(self, zone_id: int, temperature: float) -> bool:
+        dispatcher = self._dispatchers.get(zone_id)
+        if dispatcher is None:
+            return False
+        dispatcher.submit(temperature)
+        return True
+
+    def get(self, zone_id: int) -> Optional[ThermostatDispatcher]:
+        return self._dispatchers.get(zone_id)
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            dispatchers = list(self._dispatchers.values())
+        for dispatcher in dispatchers:
+            dispatcher.stop(timeout)
+
+    # Deliveries by every dispatcher the router has had, including replaced ones
+    @property
+    def pushes(self) -> int:
+        with self._lock:
+            for dispatcher in [d for d in self._retired if not d.busy]:
+                self._retired.remove(dispatcher)
+                self._retired_pushes += dispatcher.pushes
+            dispatchers = self._retired + list(self._dispatchers.values())
+            return self._retired_pushes + sum(dispatcher.pushes for dispatcher in dispatchers)
+
+    @property
+    def active(self) -> int:
+        return sum(1 for dispatcher in list(self._dispatchers.values()) if dispatcher.running)
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, time
-from database import SessionLocal, Vote, User, hash_password, verify_password
+from database import SessionLocal, Vote, User, hash_password, verify_password, migrate_db
 from fastapi.middleware.cors import CORSMiddleware
 import requests
 from pydantic import BaseModel
@@ -20,6 +20,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def startup_event():
+    migrate_db()
+
 # Initialize Jinja2Templates for rendering HTML templates
 templates = Jinja2Templates(directory="templates")
 
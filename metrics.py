@@ -0,0 +1,221 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+from sqlalchemy import event
+
+# Prometheus text format 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond cache hits up to slow bcrypt/push calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+
+class Gauge(_Metric):
+    """
+    A value read when /metrics is scraped. Pass kind="counter" for totals
+    kept elsewhere (e.g. the cache's hit count).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, read: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, documentation)
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        try:
+            return [f"{self.name} {_number(self.read())}"]
+        except Exception:
+            return []
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        samples = metric.render()
+        if samples:
+            lines.extend(metric.header())
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+# Metrics recorded across modules
+
+HTTP_REQUESTS = Histogram("airvote_http_request_duration_seconds",
+                          "Time to serve a request, by route template", ["method", "route", "status"])
+DB_QUERIES = Histogram("airvote_db_query_duration_seconds", "Time spent in SQL statements", ["operation"])
+DB_ROWS = Counter("airvote_db_rows_written_total", "Rows inserted, updated or deleted", ["operation"])
+OUTBOUND = Histogram("airvote_outbound_request_duration_seconds",
+                     "Calls to the thermostat, web push and weather services", ["target", "outcome"])
+THERMOSTAT_GAVE_UP = Counter("airvote_thermostat_retries_exhausted_total",
+                             "Thermostat pushes whose retries ran out; the value is retried later")
+PASSWORD_CHECKS = Histogram("airvote_password_verify_duration_seconds",
+                            "bcrypt checks on the login pool, including queueing", ["outcome"],
+                            buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+VOTE_BATCHES = Histogram("airvote_vote_batch_commit_duration_seconds",
+                         "Time to write and commit one batch of votes")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Routes are labelled by
+    their path template (e.g. /sensors/readings), unmatched paths as
+    "unmatched", so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUESTS.observe(
+                time.perf_counter() - started,
+                scope.get("method", ""),
+                getattr(route, "path", "unmatched"),
+                status,
+            )
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+# Time every statement run through `engine` (pass async_engine.sync_engine
+# for an AsyncEngine) and count the rows written
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = _operation(statement)
+        DB_QUERIES.observe(time.perf_counter() - started, operation)
+        if operation in ("INSERT", "UPDATE", "DELETE") and cursor.rowcount and cursor.rowcount > 0:
+            DB_ROWS.inc(operation, amount=cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
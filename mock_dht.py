@@ -1,5 +1,10 @@
+import argparse
 import random
+import threading
 import time
+from collections import deque
+from typing import Deque, Tuple
+import requests
 
 try:
     import Adafruit_DHT
@@ -16,19 +21,102 @@ def mock_sensor_data():
     temperature = round(random.uniform(20.0, 30.0), 2)  # Random temperature between 20°C and 30°C
     return temperature
 
+
+class SimulatedSensor:
+    """A sensor drifting around its own base temperature."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.temperature = mock_sensor_data()
+
+    def read(self) -> float:
+        self.temperature = min(30.0, max(20.0, self.temperature + random.uniform(-0.1, 0.1)))
+        return round(self.temperature, 2)
+
+
+class SensorClient:
+    """
+    Buffers readings and POSTs them to /sensors/readings in bulk: when
+    `batch_size` readings are waiting or `flush_interval` seconds after
+    the oldest one. A failed batch is kept and retried on the next flush
+    (the server ignores readings it already has).
+    """
+
+    def __init__(self, url: str, batch_size: int = 1000, flush_interval: float = 1.0,
+                 max_buffer: int = 100000, timeout: float = 10.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+
+        self.sent = 0
+        self.failures = 0
+        self.dropped = 0
+
+        self._buffer: Deque[Tuple[str, float, float]] = deque()
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+
+    def add(self, name: str, temperature: float, ts: float = None):
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                # Offline for too long: drop the oldest readings
+                self._buffer.popleft()
+                self.dropped += 1
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append((name, ts if ts is not None else time.time(), temperature))
+            due = len(self._buffer) >= self.batch_size or time.monotonic() - self._oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = list(self._buffer), deque()
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                response = self._session.post(self.url, json={"readings": chunk}, timeout=self.timeout)
+                response.raise_for_status()
+                self.sent += len(chunk)
+            except requests.RequestException as e:
+                print(f"Error sending sensor readings: {e}")
+                self.failures += 1
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch[start:]))
+                    self._oldest = time.monotonic()
+                return
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Mock DHT sensor(s)")
+    parser.add_argument("--url", help="send readings to this /sensors/readings URL instead of printing them")
+    parser.add_argument("--sensors", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between readings")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
     # Using a mock function for data simulation
     print("Starting mock IoT data simulation...")
+    sensors = [SimulatedSensor(f"dht-{i}") for i in range(args.sensors)]
+    client = SensorClient(args.url, batch_size=args.batch_size, flush_interval=args.interval) if args.url else None
 
     while True:
-        # Simulate sensor data
-        temperature = mock_sensor_data()
-
-        # Display the simulated values
-        print(f"Temperature: {temperature}°C")
+        for sensor in sensors:
+            # Simulate sensor data
+            temperature = sensor.read()
+            if client is not None:
+                client.add(sensor.name, temperature)
+            else:
+                # Display the simulated values
+                print(f"{sensor.name} Temperature: {temperature}°C")
+        if client is not None:
+            client.flush()
 
         # Simulate data transmission delay
-        time.sleep(2)
+        time.sleep(args.interval)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+import argparse
+import base64
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def make_subscription(endpoint: str) -> dict:
+    """
+    A browser-style PushSubscription with real encryption keys, so
+    pywebpush can encrypt payloads for it.
+    """
+    key = ec.generate_private_key(ec.SECP256R1())
+    p256dh = key.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return {"endpoint": endpoint, "keys": {"p256dh": _b64(p256dh), "auth": _b64(os.urandom(16))}}
+
+
+class MockPushService:
+    """
+    Local stand-in for a browser push service (FCM, Mozilla autopush...).
+
+    POST /push/<id> answers 201, or 410 Gone for ids in `expired`.
+    `latency` delays each response to mimic a remote service.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8090, latency: float = 0.0):
+        self.latency = latency
+        self.expired = set()
+        self.received = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def subscription(self, sub_id) -> dict:
+        return make_subscription(f"{self.base_url}/push/{sub_id}")
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with service._lock:
+                    service.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if service.latency:
+                    time.sleep(service.latency)
+
+                sub_id = self.path.rsplit("/", 1)[-1]
+                with service._lock:
+                    service.received += 1
+                status = 410 if sub_id in service.expired else 201
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock web push service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay each response")
+    args = parser.parse_args()
+
+    service = MockPushService(args.host, args.port, args.latency)
+    print(f"Mock push service listening on {service.base_url}/push/<id>")
+    service._server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockThermostat:
+    """
+    Local stand-in for the thermostat on port 5000.
+
+    Records every POST /set-temperature it receives. `latency` delays each
+    response and `fail_next` makes the next N requests return 503, so the
+    dispatcher's coalescing and retry behaviour can be measured.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 5000, latency: float = 0.0):
+        self.latency = latency
+        self.fail_next = 0
+        self.received = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/set-temperature"
+
+    @property
+    def temperature(self):
+        with self._lock:
+            return self.received[-1] if self.received else None
+
+    def _handler(self):
+        device = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if device.latency:
+                    time.sleep(device.latency)
+
+                if self.path != "/set-temperature":
+                    return self._reply(404, {"detail": "Not Found"})
+
+                with device._lock:
+                    if device.fail_next > 0:
+                        device.fail_next -= 1
+                        return self._reply(503, {"detail": "Device busy"})
+                    device.received.append(json.loads(body)["temperature"])
+                self._reply(200, {"status": "ok"})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock IoT thermostat")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay each response")
+    args = parser.parse_args()
+
+    device = MockThermostat(args.host, args.port, args.latency)
+    print(f"Mock thermostat listening on {device.url}")
+    device._server.serve_forever()
+
+if __name__ == "__main__":
+    main()
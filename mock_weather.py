@@ -0,0 +1,97 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockWeather:
+    """
+    Local stand-in for the Open-Meteo forecast API.
+
+    Answers GET /v1/forecast with fixed current conditions and records the
+    (latitude, longitude) of every request. `latency` delays each response
+    and `fail_next` makes the next N requests return 503, so the weather
+    cache's single-flight and fallback behaviour can be measured.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 5001, latency: float = 0.0,
+                 temperature: float = 12.5, weathercode: int = 3):
+        self.latency = latency
+        self.temperature = temperature
+        self.weathercode = weathercode
+        self.fail_next = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/forecast"
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if api.latency:
+                    time.sleep(api.latency)
+
+                if url.path != "/v1/forecast":
+                    return self._reply(404, {"detail": "Not Found"})
+
+                query = parse_qs(url.query)
+                with api._lock:
+                    api.requests.append((float(query["latitude"][0]), float(query["longitude"][0])))
+                    if api.fail_next > 0:
+                        api.fail_next -= 1
+                        return self._reply(503, {"reason": "Too many requests"})
+                self._reply(200, {
+                    "latitude": float(query["latitude"][0]),
+                    "longitude": float(query["longitude"][0]),
+                    "current": {"temperature_2m": api.temperature, "weathercode": api.weathercode},
+                })
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Open-Meteo forecast API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay each response")
+    args = parser.parse_args()
+
+    api = MockWeather(args.host, args.port, args.latency)
+    print(f"Mock weather API listening on {api.url} (set AIRVOTE_WEATHER_URL to it)")
+    api._server.serve_forever()
+
+if __name__ == "__main__":
+    main()
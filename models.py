@@ -1,10 +1,23 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import List, Tuple
 
 # Input models
 class VoteCreate(BaseModel):
     temperature: float
     user_email: str = None
+    zone_id: int = None  # defaults to the user's zone
+    key: str = Field(None, min_length=1, max_length=64)  # idempotency key, see BatchVote
+
+class BatchVote(BaseModel):
+    key: str  # generated by the client, e.g. crypto.randomUUID()
+    temperature: float
+    timestamp: datetime  # when the vote was cast, by the client's clock
+    user_email: str = None
+    zone_id: int = None
+
+class VoteBatch(BaseModel):
+    votes: List[BatchVote]
 
 class UserLogin(BaseModel):
     email: str
@@ -24,6 +37,26 @@ class VotingWindow(BaseModel):
 class WindowUpdate(BaseModel):
     start_time: str  # e.g., "08:30"
 
+class ScheduleWindow(BaseModel):
+    start: str  # e.g. "09:00"
+    end: str    # e.g. "09:15"; earlier than start means it closes the next day
+    weekdays: List[int] = [0, 1, 2, 3, 4, 5, 6]  # Monday = 0
+
+class VotingScheduleUpdate(BaseModel):
+    windows: List[ScheduleWindow]
+    holidays: List[date] = []
+
+class ZoneCreate(BaseModel):
+    name: str
+    thermostat_url: str = None  # e.g. "http://floor-3-pi:5000/set-temperature"
+
+class UserZone(BaseModel):
+    email: str
+    zone_id: int = None  # None: the user's votes count towards no zone
+
+class SensorBatch(BaseModel):
+    readings: List[Tuple[str, float, float]]  # (sensor name, unix time, temperature)
+
 # Response models
 class VoteResponse(BaseModel):
     id: int
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from sqlalchemy.orm import Session
+from database import PushSubscription
+import metrics
+
+# pywebpush (which pulls in aiohttp) and requests are imported on first
+# use, so worker start-up doesn't pay for them
+if TYPE_CHECKING:
+    import requests
+    from py_vapid import Vapid
+
+# Push services answer 404/410 for subscriptions that no longer exist
+EXPIRED_STATUSES = (404, 410)
+
+# Signed VAPID tokens are valid for 12 hours; re-sign an hour before that
+VAPID_TOKEN_LIFETIME = 12 * 60 * 60
+VAPID_TOKEN_REFRESH = 60 * 60
+
+
+class FanoutResult:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.expired: List[str] = []
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (f"FanoutResult(sent={self.sent}, failed={self.failed}, "
+                f"expired={len(self.expired)}, elapsed={self.elapsed:.2f}s)")
+
+
+class PushFanout:
+    """
+    Sends one web push payload to many subscriptions concurrently.
+
+    Each worker thread keeps its own keep-alive session, and the VAPID
+    Authorization header is signed once per push-service origin rather
+    than once per subscriber.
+    """
+
+    def __init__(self, vapid_private_key, vapid_claims: dict, workers: int = 32,
+                 timeout: float = 10.0, ttl: int = 900):
+        self.vapid_private_key = vapid_private_key
+        self.vapid_claims = dict(vapid_claims)
+        self.workers = workers
+        self.timeout = timeout
+        self.ttl = ttl
+
+        self._vapid: Optional["Vapid"] = None
+        self._signed: Dict[str, Tuple[dict, float]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _signer(self) -> "Vapid":
+        if self._vapid is None:
+            from py_vapid import Vapid
+
+            key = self.vapid_private_key
+            self._vapid = key if isinstance(key, Vapid) else Vapid.from_string(key)
+        return self._vapid
+
+    # VAPID headers for a push service, cached until shortly before expiry
+    def vapid_headers(self, endpoint: str) -> dict:
+        url = urlparse(endpoint)
+        origin = f"{url.scheme}://{url.netloc}"
+        now = time.time()
+        with self._lock:
+            cached = self._signed.get(origin)
+            if cached is not None and cached[1] - VAPID_TOKEN_REFRESH > now:
+                return cached[0]
+            expires = int(now) + VAPID_TOKEN_LIFETIME
+            claims = dict(self.vapid_claims, aud=origin, exp=expires)
+            headers = self._signer().sign(claims)
+            self._signed[origin] = (headers, expires)
+            return headers
+
+    def _session(self) -> "requests.Session":
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = self._local.session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_maxsize=4))
+            session.mount("http://", HTTPAdapter(pool_maxsize=4))
+        return session
+
+    # Returns the HTTP status, or None if the request itself failed
+    def send_one(self, subscription: dict, data: str) -> Optional[int]:
+        from pywebpush import WebPusher
+
+        started = time.perf_counter()
+        try:
+            headers = dict(self.vapid_headers(subscription["endpoint"]))
+            response = WebPusher(subscription, requests_session=self._session()).send(
+                data, headers, ttl=self.ttl, timeout=self.timeout,
+            )
+        except Exception as e:
+            metrics.OUTBOUND.observe(time.perf_counter() - started, "push", "error")
+            print("Push failed: ", e)
+            return None
+        status = response.status_code
+        outcome = "ok" if status <= 202 else "expired" if status in EXPIRED_STATUSES else "error"
+        metrics.OUTBOUND.observe(time.perf_counter() - started, "push", outcome)
+        return status
+
+    def send_all(self, subscriptions: List[dict], data: str) -> FanoutResult:
+        result = FanoutResult()
+        if not subscriptions:
+            return result
+
+        started = time.perf_counter()
+        try:
+            self._signer()
+        except Exception as e:
+            print("Invalid VAPID private key: ", e)
+            result.failed = len(subscriptions)
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(subscriptions))) as pool:
+            statuses = pool.map(lambda sub: self.send_one(sub, data), subscriptions)
+            for subscription, status in zip(subscriptions, statuses):
+                if status is not None and status <= 202:
+                    result.sent += 1
+                elif status in EXPIRED_STATUSES:
+                    result.expired.append(subscription["endpoint"])
+                else:
+                    result.failed += 1
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+# Subscription storage
+
+def save_subscription(db: Session, subscription_info: dict):
+    endpoint = subscription_info["endpoint"]
+    row = db.query(PushSubscription).filter(PushSubscription.endpoint == endpoint).first()
+    if row is None:
+        row = PushSubscription(endpoint=endpoint)
+        db.add(row)
+    row.subscription_info = json.dumps(subscription_info)
+    db.commit()
+
+
+def load_subscriptions(db: Session) -> List[dict]:
+    return [json.loads(info) for (info,) in db.query(PushSubscription.subscription_info)]
+
+
+def remove_subscriptions(db: Session, endpoints: List[str]) -> int:
+    removed = db.query(PushSubscription).filter(
+        PushSubscription.endpoint.in_(endpoints)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
@@ -0,0 +1,166 @@
+import argparse
+import json
+import math
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy.orm import Session
+from database import Vote, VoteRollup
+from schedule import VotingSchedule
+
+# Histogram bins: one per whole degree of the accepted 15-25°C range
+HISTOGRAM_MIN = 15
+HISTOGRAM_MAX = 25
+HISTOGRAM_BINS = HISTOGRAM_MAX - HISTOGRAM_MIN + 1
+
+PERIODS = ("day", "week", "month")
+
+
+def summarize(temperatures: Iterable[float]) -> dict:
+    histogram = [0] * HISTOGRAM_BINS
+    count, total = 0, 0.0
+    low, high = None, None
+    for temp in temperatures:
+        count += 1
+        total += temp
+        low = temp if low is None else min(low, temp)
+        high = temp if high is None else max(high, temp)
+        index = min(max(math.floor(temp) - HISTOGRAM_MIN, 0), HISTOGRAM_BINS - 1)
+        histogram[index] += 1
+    return {"count": count, "sum": total, "min": low, "max": high, "histogram": histogram}
+
+
+# Summarize the votes cast in one window and store (or refresh) its rollup
+def rollup_window(db: Session, start: datetime, end: datetime) -> VoteRollup:
+    temps = (t for (t,) in db.query(Vote.temperature).filter(
+        Vote.timestamp >= start,
+        Vote.timestamp <= end,
+    ))
+    summary = summarize(temps)
+
+    rollup = db.query(VoteRollup).filter(
+        VoteRollup.window_start == start,
+        VoteRollup.window_end == end,
+    ).first()
+    if rollup is None:
+        rollup = VoteRollup(window_start=start, window_end=end)
+        db.add(rollup)
+    rollup.vote_count = summary["count"]
+    rollup.temperature_sum = summary["sum"]
+    rollup.min_temperature = summary["min"]
+    rollup.max_temperature = summary["max"]
+    rollup.histogram = json.dumps(summary["histogram"])
+    rollup.created_at = datetime.utcnow()
+    db.commit()
+    return rollup
+
+
+# Scheduler job: roll up every window that opened since yesterday, has
+# closed and has no summary yet. Safe to run every minute.
+def rollup_closed_windows(db: Session, schedule: VotingSchedule, now: Optional[datetime] = None) -> int:
+    now = now or datetime.utcnow()
+    since = datetime.combine(now.date() - timedelta(days=1), datetime.min.time())
+    return rollup_missing(db, schedule, since, now)
+
+
+# Roll up the windows that opened and closed between `since` and `until`
+# and have no summary yet
+def rollup_missing(db: Session, schedule: VotingSchedule, since: datetime, until: datetime) -> int:
+    spans = schedule.occurrences(since, until)
+
+    if not spans:
+        return 0
+
+    done = {
+        (start, end) for start, end in db.query(VoteRollup.window_start, VoteRollup.window_end).filter(
+            VoteRollup.window_start >= min(start for start, _ in spans)
+        )
+    }
+
+    written = 0
+    for start, end in spans:
+        if end <= until and (start, end) not in done:
+            rollup_window(db, start, end)
+            written += 1
+    return written
+
+
+# Build rollups for every window since the first vote, using the given schedule
+def backfill(db: Session, schedule: VotingSchedule, now: Optional[datetime] = None) -> int:
+    now = now or datetime.utcnow()
+    first = db.query(Vote.timestamp).order_by(Vote.timestamp).first()
+    if first is None:
+        return 0
+
+    written = 0
+    since = datetime.combine(first[0].date() - timedelta(days=1), datetime.min.time())
+    for start, end in schedule.occurrences(since, now):
+        if end <= now:
+            rollup_window(db, start, end)
+            written += 1
+    return written
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+# Merge rollups into one row per (period, window) pair
+def trends(db: Session, period: str, since: datetime, until: Optional[datetime] = None) -> List[dict]:
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+    query = db.query(VoteRollup).filter(VoteRollup.window_start >= since)
+    if until is not None:
+        query = query.filter(VoteRollup.window_start < until)
+
+    groups = {}
+    for rollup in query.order_by(VoteRollup.window_start):
+        label = f"{rollup.window_start.strftime('%H:%M')}-{rollup.window_end.strftime('%H:%M')}"
+        key = (period_start(rollup.window_start.date(), period), label)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "period": key[0].isoformat(), "window": label, "windows": 0,
+                "count": 0, "sum": 0.0, "min": None, "max": None,
+                "histogram": [0] * HISTOGRAM_BINS,
+            }
+        group["windows"] += 1
+        group["count"] += rollup.vote_count
+        group["sum"] += rollup.temperature_sum
+        for bound, pick in (("min", min), ("max", max)):
+            value = getattr(rollup, f"{bound}_temperature")
+            if value is not None:
+                group[bound] = value if group[bound] is None else pick(group[bound], value)
+        group["histogram"] = [a + b for a, b in zip(group["histogram"], json.loads(rollup.histogram))]
+
+    results = []
+    for group in groups.values():
+        total = group.pop("sum")
+        group["average"] = round(total / group["count"], 1) if group["count"] else None
+        results.append(group)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vote rollup maintenance")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+
+    from database import SessionLocal, migrate_db
+    from schedule import load_schedule
+    from backend import DEFAULT_SCHEDULE
+
+    migrate_db()
+    db = SessionLocal()
+    try:
+        written = backfill(db, load_schedule(db) or DEFAULT_SCHEDULE)
+    finally:
+        db.close()
+    print(f"Backfilled {written} window rollups.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from database import VotingScheduleConfig
+
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+ALL_WEEKDAYS = tuple(range(7))  # Monday = 0
+
+
+def _seconds(t: time) -> float:
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+
+
+def _format(t: time) -> str:
+    return t.strftime("%H:%M:%S" if t.second else "%H:%M")
+
+
+def parse_time(value: str) -> time:
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time {value!r}. Use HH:MM")
+
+
+class Window:
+    """A daily voting window, optionally limited to some weekdays."""
+
+    __slots__ = ("start", "end", "weekdays")
+
+    def __init__(self, start: time, end: time, weekdays: Iterable[int] = ALL_WEEKDAYS):
+        if start == end:
+            raise ValueError("Voting window must not be empty.")
+        self.start = start
+        self.end = end
+        self.weekdays = tuple(sorted(set(weekdays)))
+        if not self.weekdays or any(day not in ALL_WEEKDAYS for day in self.weekdays):
+            raise ValueError("Weekdays must be between 0 (Monday) and 6 (Sunday).")
+
+    # Windows that end before they start close on the following day
+    @property
+    def crosses_midnight(self) -> bool:
+        return self.end < self.start
+
+    @property
+    def length(self) -> float:
+        return (_seconds(self.end) - _seconds(self.start)) % DAY
+
+    def to_dict(self) -> dict:
+        return {"start": _format(self.start), "end": _format(self.end), "weekdays": list(self.weekdays)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Window":
+        return cls(parse_time(data["start"]), parse_time(data["end"]), data.get("weekdays", ALL_WEEKDAYS))
+
+
+class VotingSchedule:
+    """
+    Compiled, immutable voting schedule.
+
+    Every (window, weekday) pair becomes an interval in seconds from
+    Monday 00:00, kept sorted so a lookup is one bisect. Windows that run
+    past Sunday midnight are split in two. Holidays close every window
+    that opens on that date. Replace the whole object to change it.
+    """
+
+    def __init__(self, windows: Iterable[Window], holidays: Iterable[date] = ()):
+        self.windows: Tuple[Window, ...] = tuple(windows)
+        self.holidays = frozenset(holidays)
+
+        # (opens, closes, opened_at, length): opened_at differs from opens
+        # only for the part of a window carried over into the next week
+        intervals = []
+        for window in self.windows:
+            for weekday in window.weekdays:
+                opens = weekday * DAY + _seconds(window.start)
+                closes = opens + window.length
+                if closes < WEEK:
+                    intervals.append((opens, closes, opens, window.length))
+                else:
+                    intervals.append((opens, WEEK, opens, window.length))
+                    intervals.append((0.0, closes - WEEK, opens - WEEK, window.length))
+        intervals.sort()
+
+        for previous, current in zip(intervals, intervals[1:]):
+            if current[0] < previous[1]:
+                raise ValueError("Voting windows must not overlap.")
+
+        self._intervals = intervals
+        self._starts = [interval[0] for interval in intervals]
+
+    @classmethod
+    def daily(cls, pairs: Iterable[Tuple[time, time]], holidays: Iterable[date] = ()) -> "VotingSchedule":
+        return cls([Window(start, end) for start, end in pairs], holidays)
+
+    @staticmethod
+    def _week_start(moment: datetime) -> datetime:
+        return datetime.combine(moment.date() - timedelta(days=moment.weekday()), time())
+
+    # (opened, closes) of the window containing `moment`, or None
+    def current_window(self, moment: datetime) -> Optional[Tuple[datetime, datetime]]:
+        offset = moment.weekday() * DAY + _seconds(moment.time())
+        index = bisect_right(self._starts, offset) - 1
+        if index < 0:
+            return None
+        _, closes, opened_at, length = self._intervals[index]
+        if offset > closes:
+            return None
+        opened = self._week_start(moment) + timedelta(seconds=opened_at)
+        if opened.date() in self.holidays:
+            return None
+        return opened, opened + timedelta(seconds=length)
+
+    def is_open(self, moment: datetime) -> bool:
+        return self.current_window(moment) is not None
+
+    # Every window opening in [since, until), skipping holidays
+    def occurrences(self, since: datetime, until: datetime) -> List[Tuple[datetime, datetime]]:
+        spans = []
+        week = self._week_start(since)
+        while week < until:
+            for opens, _, opened_at, length in self._intervals:
+                if opens != opened_at:
+                    continue
+                opened = week + timedelta(seconds=opened_at)
+                if since <= opened < until and opened.date() not in self.holidays:
+                    spans.append((opened, opened + timedelta(seconds=length)))
+            week += timedelta(days=7)
+        return spans
+
+    # When the next window opens after `moment` (None if there are none)
+    def next_opening(self, moment: datetime, horizon_days: int = 366) -> Optional[datetime]:
+        offset = moment.weekday() * DAY + _seconds(moment.time())
+        index = bisect_right(self._starts, offset)
+        week = self._week_start(moment)
+        for _ in range(horizon_days // 7 + 2):
+            for opens, _, opened_at, _ in self._intervals[index:]:
+                if opens != opened_at:
+                    continue
+                opened = week + timedelta(seconds=opened_at)
+                if opened > moment and opened.date() not in self.holidays:
+                    return opened
+            index = 0
+            week += timedelta(days=7)
+        return None
+
+    # (start, end) times of day, for code that ignores weekdays/holidays
+    @property
+    def daily_windows(self) -> List[Tuple[time, time]]:
+        return [(window.start, window.end) for window in self.windows]
+
+    def to_dict(self) -> dict:
+        return {
+            "windows": [window.to_dict() for window in self.windows],
+            "holidays": sorted(day.isoformat() for day in self.holidays),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VotingSchedule":
+        return cls(
+            [Window.from_dict(window) for window in data.get("windows", [])],
+            [date.fromisoformat(day) for day in data.get("holidays", [])],
+        )
+
+
+# Persistence: every saved schedule is kept, the newest one is active
+
+def load_schedule(db: Session) -> Optional[VotingSchedule]:
+    row = db.query(VotingScheduleConfig).order_by(VotingScheduleConfig.id.desc()).first()
+    if row is None:
+        return None
+    return VotingSchedule.from_dict(json.loads(row.definition))
+
+
+def save_schedule(db: Session, schedule: VotingSchedule):
+    db.add(VotingScheduleConfig(definition=json.dumps(schedule.to_dict())))
+    db.commit()
@@ -41,6 +41,13 @@ document.addEventListener("DOMContentLoaded", () => {
         submitButton.addEventListener("click", submitVote);
     }
 
+    // Have the service worker send votes queued while offline
+    window.addEventListener("online", () => {
+        if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage({ type: "flush-votes" });
+        }
+    });
+
     // Initialize the page
     initPage();
 
@@ -64,10 +71,11 @@ document.addEventListener("DOMContentLoaded", () => {
             return;
         }
 
-        // Send vote to backend
+        // Send vote to backend. Offline, the service worker queues it and
+        // answers 202 with `queued: true`.
         fetch(`${API_URL}/vote`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: voteHeaders(),
             body: JSON.stringify({ temperature: parseFloat(selectedTemperature) })
         })
         .then(response => {
@@ -77,7 +85,7 @@ document.addEventListener("DOMContentLoaded", () => {
             return response.json();
         })
         .then(data => {
-            showMessage(data.message || `Vote submitted: ${selectedTemperature}°C`, "green");
+            showMessage(data.message || `Vote submitted: ${selectedTemperature}°C`, data.queued ? "orange" : "green");
             saveVoteLocally(selectedTemperature);
             displayPastVotes();
         })
@@ -87,6 +95,17 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
 
+    // The session token from login.html identifies the voter; without it
+    // the vote is anonymous
+    function voteHeaders() {
+        const headers = { "Content-Type": "application/json" };
+        const token = localStorage.getItem("airvote_session_token");
+        if (token) {
+            headers["Authorization"] = `Bearer ${token}`;
+        }
+        return headers;
+    }
+
     function isVotingWindowOpen() {
         const currentDate = new Date();
         const currentHour = currentDate.getHours();
@@ -151,13 +170,17 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     function fetchWeather(lat, lon) {
-        const url = `https://api.open-meteo.com/v1/forecast?latitude=${lat}&longitude=${lon}&current=temperature_2m,weathercode&timezone=auto`;
+        // Proxied and cached by the backend, see GET /weather
+        const url = `${API_URL}/weather?lat=${lat.toFixed(4)}&lon=${lon.toFixed(4)}`;
 
         fetch(url)
-            .then(response => response.json())
+            .then(response => {
+                if (!response.ok) throw new Error(`Weather request failed: ${response.status}`);
+                return response.json();
+            })
             .then(data => {
-                const temp = data.current.temperature_2m;
-                const weatherCode = data.current.weathercode;
+                const temp = data.temperature;
+                const weatherCode = data.weathercode;
                 
                 if (outsideTemp) outsideTemp.textContent = `${temp}°C`;
                 if (weatherCondition) weatherCondition.textContent = weatherDescriptions[weatherCode] || "Unknown Weather";
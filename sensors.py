@@ -0,0 +1,181 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+from database import Sensor, SensorReading, SensorRollup
+
+# Downsampled tiers, finest first: (resolution in seconds, name)
+MINUTE = 60
+HOUR = 3600
+RESOLUTIONS = {"raw": 1, "1m": MINUTE, "1h": HOUR}
+
+# How long after a bucket ends before it is rolled up, for late readings
+COMPACT_GRACE = 60
+
+# Readings outside this range are sensor faults, not temperatures
+MIN_TEMPERATURE = -40.0
+MAX_TEMPERATURE = 85.0
+
+
+class SensorStore:
+    """
+    Bulk writer for sensor readings.
+
+    Sensor names are mapped to small integer ids (cached in memory) and
+    each batch is written in one transaction with INSERT OR IGNORE, so a
+    client retrying a batch does not duplicate readings. Writers in this
+    process take turns on a lock instead of spinning on SQLite's.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.readings = 0
+        self.batches = 0
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _sensor_ids(self, db: Session, names: Iterable[str]) -> Dict[str, int]:
+        missing = [name for name in set(names) if name not in self._ids]
+        if missing:
+            db.execute(insert(Sensor).prefix_with("OR IGNORE"), [{"name": name} for name in missing])
+            for sensor_id, name in db.execute(select(Sensor.id, Sensor.name).where(Sensor.name.in_(missing))):
+                self._ids[name] = sensor_id
+        return self._ids
+
+    # readings: (sensor name, unix time, temperature); returns rows stored,
+    # not counting faulty readings or ones already stored
+    def ingest(self, readings: Sequence[Tuple[str, float, float]]) -> int:
+        rows = [
+            (name, int(ts), temperature) for name, ts, temperature in readings
+            if MIN_TEMPERATURE <= temperature <= MAX_TEMPERATURE
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            db = self.session_factory()
+            try:
+                ids = self._sensor_ids(db, (name for name, _, _ in rows))
+                # Bulk inserts report no rowcount; SQLite counts the rows
+                # this connection changed, ignored duplicates excluded
+                before = db.execute(text("SELECT total_changes()")).scalar()
+                db.execute(insert(SensorReading).prefix_with("OR IGNORE"), [
+                    {"ts": ts, "sensor_id": ids[name], "temperature": temperature}
+                    for name, ts, temperature in rows
+                ])
+                stored = db.execute(text("SELECT total_changes()")).scalar() - before
+                db.commit()
+            except Exception:
+                db.rollback()
+                # The id cache may hold ids from the rolled back transaction
+                self._ids.clear()
+                raise
+            finally:
+                db.close()
+            self.readings += stored
+            self.batches += 1
+        return stored
+
+
+# Downsampling: closed buckets are recomputed from the tier below with
+# INSERT OR REPLACE, starting again at the newest bucket already written,
+# so a compaction pass is idempotent and picks up stragglers.
+
+_ROLLUP_FROM_RAW = text("""
+    INSERT OR REPLACE INTO sensor_rollups
+        (resolution, bucket, sensor_id, count, total, min_temperature, max_temperature)
+    SELECT :resolution, ts / :resolution * :resolution, sensor_id,
+           count(*), sum(temperature), min(temperature), max(temperature)
+    FROM sensor_readings
+    WHERE ts >= :start AND ts < :end
+    GROUP BY ts / :resolution, sensor_id
+""")
+
+_ROLLUP_FROM_TIER = text("""
+    INSERT OR REPLACE INTO sensor_rollups
+        (resolution, bucket, sensor_id, count, total, min_temperature, max_temperature)
+    SELECT :resolution, bucket / :resolution * :resolution, sensor_id,
+           sum(count), sum(total), min(min_temperature), max(max_temperature)
+    FROM sensor_rollups
+    WHERE resolution = :source AND bucket >= :start AND bucket < :end
+    GROUP BY bucket / :resolution, sensor_id
+""")
+
+
+def _tier_start(db: Session, resolution: int, source: int) -> Optional[int]:
+    newest = db.query(func.max(SensorRollup.bucket)).filter(SensorRollup.resolution == resolution).scalar()
+    if newest is not None:
+        return newest
+    if source == 1:
+        oldest = db.query(func.min(SensorReading.ts)).scalar()
+    else:
+        oldest = db.query(func.min(SensorRollup.bucket)).filter(SensorRollup.resolution == source).scalar()
+    return None if oldest is None else oldest // resolution * resolution
+
+
+def compact(db: Session, now: Optional[float] = None, grace: int = COMPACT_GRACE) -> Dict[str, int]:
+    now = int(now if now is not None else time.time())
+    written = {}
+    for name, resolution, source, statement in (
+        ("1m", MINUTE, 1, _ROLLUP_FROM_RAW),
+        ("1h", HOUR, MINUTE, _ROLLUP_FROM_TIER),
+    ):
+        start = _tier_start(db, resolution, source)
+        end = (now - grace) // resolution * resolution
+        if start is None or start >= end:
+            written[name] = 0
+            continue
+        result = db.execute(statement, {"resolution": resolution, "source": source, "start": start, "end": end})
+        written[name] = result.rowcount
+    db.commit()
+    return written
+
+
+# Drop raw readings and tiers older than their retention (in seconds)
+def apply_retention(db: Session, raw: int, minute: int, hour: int, now: Optional[float] = None) -> Dict[str, int]:
+    now = int(now if now is not None else time.time())
+    deleted = {
+        "raw": db.query(SensorReading).filter(SensorReading.ts < now - raw).delete(synchronize_session=False),
+    }
+    for name, resolution, keep in (("1m", MINUTE, minute), ("1h", HOUR, hour)):
+        deleted[name] = db.query(SensorRollup).filter(
+            SensorRollup.resolution == resolution,
+            SensorRollup.bucket < now - keep,
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+# Time series at one resolution, for one sensor or averaged over all of them
+def series(db: Session, resolution: str, since: int, until: int, sensor: Optional[str] = None) -> List[dict]:
+    sensor_id = None
+    if sensor is not None:
+        sensor_id = db.query(Sensor.id).filter(Sensor.name == sensor).scalar()
+        if sensor_id is None:
+            return []
+
+    if resolution == "raw":
+        query = db.query(
+            SensorReading.ts, func.count(), func.sum(SensorReading.temperature),
+            func.min(SensorReading.temperature), func.max(SensorReading.temperature),
+        ).filter(SensorReading.ts >= since, SensorReading.ts < until)
+        if sensor_id is not None:
+            query = query.filter(SensorReading.sensor_id == sensor_id)
+        rows = query.group_by(SensorReading.ts).order_by(SensorReading.ts).all()
+    else:
+        query = db.query(
+            SensorRollup.bucket, func.sum(SensorRollup.count), func.sum(SensorRollup.total),
+            func.min(SensorRollup.min_temperature), func.max(SensorRollup.max_temperature),
+        ).filter(
+            SensorRollup.resolution == RESOLUTIONS[resolution],
+            SensorRollup.bucket >= since,
+            SensorRollup.bucket < until,
+        )
+        if sensor_id is not None:
+            query = query.filter(SensorRollup.sensor_id == sensor_id)
+        rows = query.group_by(SensorRollup.bucket).order_by(SensorRollup.bucket).all()
+
+    return [
+        {"ts": ts, "count": count, "average": round(total / count, 2), "min": low, "max": high}
+        for ts, count, total, low, high in rows
+    ]
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import List, Sequence, Tuple
+from fastapi import HTTPException, Request, Response
+
+# orjson and msgpack are imported on first use, like the other heavy
+# libraries (see bench_import.py)
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Names clients use for MessagePack in Accept
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+
+# "rows" is a list of objects, "columns" one list per field
+LAYOUTS = ("rows", "columns")
+
+
+# MessagePack when Accept names it (and not JSON ahead of it), else JSON
+def negotiate(request: Request) -> str:
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in MSGPACK_TYPES:
+            return MSGPACK
+        if media_type == JSON:
+            return JSON
+    return JSON
+
+
+def check_layout(layout: str):
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail="layout must be rows or columns")
+
+
+# Rows of `names` fields as a list of objects
+def as_rows(rows: Sequence[tuple], names: Tuple[str, ...]) -> List[dict]:
+    return [dict(zip(names, row)) for row in rows]
+
+
+# Rows of `names` fields as {"<name>s": [...]} lists, e.g. timestamps and
+# temperatures; smaller than objects and cheaper to encode
+def as_columns(rows: Sequence[tuple], names: Tuple[str, ...]) -> dict:
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {name + "s": list(values) for name, values in zip(names, columns)}
+
+
+def layout_rows(rows: Sequence[tuple], names: Tuple[str, ...], layout: str = "rows"):
+    return as_columns(rows, names) if layout == "columns" else as_rows(rows, names)
+
+
+# MessagePack has no datetime type without a timezone; send the same ISO
+# text as JSON
+def _msgpack_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+# Encode a payload of plain values and naive datetimes (written as ISO
+# 8601, like datetime.isoformat())
+def dumps(payload, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        import msgpack
+        return msgpack.packb(payload, default=_msgpack_default)
+    import orjson
+    return orjson.dumps(payload)
+
+
+def render(payload, media_type: str = JSON) -> Response:
+    return Response(dumps(payload, media_type), media_type=media_type)
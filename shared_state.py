@@ -0,0 +1,199 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+from database import SharedConfig, Lease
+
+
+def process_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class SharedState:
+    """
+    State every worker process must agree on: versioned config values and
+    named leases for leader election.
+
+    `shared` is False for backends that only live inside one process;
+    the app then keeps doing per-process work (like counting its own
+    votes) directly instead of going through the database.
+    """
+
+    shared = False
+
+    # (value, version) of a config key, or (None, 0) if it was never set
+    def get(self, key: str) -> Tuple[Optional[str], int]:
+        raise NotImplementedError
+
+    # Store a value and return its new version
+    def set(self, key: str, value: Optional[str]) -> int:
+        raise NotImplementedError
+
+    # Take or renew the lease; True while `holder` owns it
+    def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    def release(self, name: str, holder: str):
+        raise NotImplementedError
+
+
+class MemoryState(SharedState):
+    """Single-process backend, for tests and one-worker deployments."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._config: Dict[str, Tuple[Optional[str], int]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[Optional[str], int]:
+        with self._lock:
+            return self._config.get(key, (None, 0))
+
+    def set(self, key: str, value: Optional[str]) -> int:
+        with self._lock:
+            version = self._config.get(key, (None, 0))[1] + 1
+            self._config[key] = (value, version)
+            return version
+
+    def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        now = self.clock()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current[0] == holder or current[1] < now:
+                self._leases[name] = (holder, now + ttl)
+                return True
+            return False
+
+    def release(self, name: str, holder: str):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == holder:
+                del self._leases[name]
+
+
+class SqliteState(SharedState):
+    """
+    Backend on the shared_config and leases tables, for several workers
+    (or nodes on a shared volume) using the same database file.
+    """
+
+    shared = True
+
+    def __init__(self, session_factory, clock: Callable[[], float] = time.time):
+        self.session_factory = session_factory
+        self.clock = clock
+
+    def get(self, key: str) -> Tuple[Optional[str], int]:
+        db = self.session_factory()
+        try:
+            row = db.execute(select(SharedConfig.value, SharedConfig.version).where(SharedConfig.key == key)).first()
+            return (row[0], row[1]) if row else (None, 0)
+        finally:
+            db.close()
+
+    def set(self, key: str, value: Optional[str]) -> int:
+        db = self.session_factory()
+        try:
+            stmt = insert(SharedConfig).values(key=key, value=value, version=1, updated_at=datetime.utcnow())
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[SharedConfig.key],
+                set_={"value": value, "version": SharedConfig.version + 1, "updated_at": datetime.utcnow()},
+            ))
+            version = db.execute(select(SharedConfig.version).where(SharedConfig.key == key)).scalar_one()
+            db.commit()
+            return version
+        finally:
+            db.close()
+
+    def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        now = self.clock()
+        db = self.session_factory()
+        try:
+            # Take the lease if it is free, expired or already ours
+            stmt = insert(Lease).values(name=name, holder=holder, expires_at=now + ttl)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[Lease.name],
+                set_={"holder": holder, "expires_at": now + ttl},
+                where=(Lease.holder == holder) | (Lease.expires_at < now),
+            ))
+            owner = db.execute(select(Lease.holder).where(Lease.name == name)).scalar_one()
+            db.commit()
+            return owner == holder
+        finally:
+            db.close()
+
+    def release(self, name: str, holder: str):
+        db = self.session_factory()
+        try:
+            db.execute(update(Lease).where(Lease.name == name, Lease.holder == holder).values(expires_at=0))
+            db.commit()
+        finally:
+            db.close()
+
+
+class LeaderElector:
+    """
+    Holds a lease so exactly one process runs singleton jobs (reminders,
+    rollups). The lease is renewed every ttl/3; if the leader dies another
+    process takes over once it expires.
+    """
+
+    def __init__(self, state: SharedState, name: str = "leader", holder: Optional[str] = None,
+                 ttl: float = 15.0, clock: Callable[[], float] = time.time):
+        self.state = state
+        self.name = name
+        self.holder = holder or process_id()
+        self.ttl = ttl
+        self.clock = clock
+        self.leading = False
+        self._checked = 0.0
+
+    def renew(self, force: bool = False) -> bool:
+        now = self.clock()
+        if force or now - self._checked >= self.ttl / 3:
+            try:
+                self.leading = self.state.acquire(self.name, self.holder, self.ttl)
+            except Exception as e:
+                print(f"Leader election failed: {e}")
+                self.leading = False
+            self._checked = now
+        return self.leading
+
+    def is_leader(self) -> bool:
+        return self.renew()
+
+    def resign(self):
+        if self.leading:
+            self.state.release(self.name, self.holder)
+        self.leading = False
+
+
+class ConfigWatcher:
+    """Calls back when another worker changes a shared config value."""
+
+    def __init__(self, state: SharedState):
+        self.state = state
+        self._watched: Dict[str, Tuple[Callable[[Optional[str]], None], int]] = {}
+
+    def watch(self, key: str, callback: Callable[[Optional[str]], None]):
+        self._watched[key] = (callback, self.state.get(key)[1])
+
+    # Record our own change so it is not applied twice
+    def seen(self, key: str, version: int):
+        if key in self._watched:
+            self._watched[key] = (self._watched[key][0], version)
+
+    def poll(self):
+        for key, (callback, version) in list(self._watched.items()):
+            value, current = self.state.get(key)
+            if current != version:
+                self._watched[key] = (callback, current)
+                try:
+                    callback(value)
+                except Exception as e:
+                    print(f"Error applying shared config {key}: {e}")
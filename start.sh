@@ -17,10 +17,12 @@ pip install -r requirements.txt
 # Set default host and port if not provided
 HOST=${HOST:-"127.0.0.1"}
 PORT=${PORT:-"8000"}
+# Proxies whose X-Forwarded-For is trusted for the client address
+FORWARDED_ALLOW_IPS=${FORWARDED_ALLOW_IPS:-"127.0.0.1"}
 
 # Run the FastAPI app with Uvicorn
 echo "Starting FastAPI app on $HOST:$PORT..."
-uvicorn main:app --host $HOST --port $PORT --reload
+uvicorn main:app --host $HOST --port $PORT --proxy-headers --forwarded-allow-ips "$FORWARDED_ALLOW_IPS" --reload
 
 # Usage instructions
 echo "To execute this script, ensure it has execute permissions:"
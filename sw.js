@@ -88,10 +88,180 @@ self.addEventListener('install', (event) => {
 });
 
 self.addEventListener('fetch', (event) => {
+    const url = new URL(event.request.url);
+    if (event.request.method === 'POST' && url.pathname === '/vote') {
+        event.respondWith(sendVote(event.request));
+        return;
+    }
+
     event.respondWith(
         caches.match(event.request)
             .then((response) => {
                 return response || fetch(event.request);
             })
     );
-});
\ No newline at end of file
+});
+
+// Offline vote queue
+// Every POST /vote gets an idempotency key and the time it was cast. A vote
+// that can't reach the server is kept in IndexedDB; the queue is sent in
+// one POST /votes/batch when the connection is back, and the server drops
+// any key it has already stored, so resending never duplicates a vote.
+const VOTE_DB = 'airvote-votes';
+const VOTE_STORE = 'queue';
+const FLUSH_TAG = 'flush-votes';
+// The server's default rate limit burst; a larger batch is partly deferred
+const BATCH_MAX = 10;
+
+function openVoteDb() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(VOTE_DB, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(VOTE_STORE, { keyPath: 'key' });
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+// Run `action` on the queue in one transaction; resolves with the result
+// of the request it returns, once the transaction commits
+function withVoteStore(mode, action) {
+    return openVoteDb().then(db => new Promise((resolve, reject) => {
+        const tx = db.transaction(VOTE_STORE, mode);
+        const request = action(tx.objectStore(VOTE_STORE));
+        tx.oncomplete = () => {
+            db.close();
+            resolve(request ? request.result : undefined);
+        };
+        tx.onerror = tx.onabort = () => {
+            db.close();
+            reject(tx.error);
+        };
+    }));
+}
+
+const queueVote = (vote) => withVoteStore('readwrite', store => store.put(vote));
+const queuedVotes = () => withVoteStore('readonly', store => store.getAll());
+const removeVotes = (keys) => withVoteStore('readwrite', store => {
+    keys.forEach(key => store.delete(key));
+});
+
+function jsonResponse(body, status) {
+    return new Response(JSON.stringify(body), {
+        status: status,
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+function sendVote(request) {
+    return request.clone().json().then(body => {
+        const vote = Object.assign({
+            key: self.crypto.randomUUID(),
+            timestamp: new Date().toISOString()
+        }, body);
+
+        return fetch(request.url, {
+            method: 'POST',
+            headers: request.headers,
+            credentials: request.credentials,
+            body: JSON.stringify(vote)
+        })
+        .then(response => {
+            // Online again: send anything left from before
+            flushVotes().catch(() => {});
+            return response;
+        })
+        .catch(() => {
+            // The vote may or may not have arrived; the key makes the
+            // replay safe either way
+            vote.batchUrl = new URL('/votes/batch', request.url).href;
+            // Sent with the batch, so the vote still counts as the user's
+            vote.authorization = request.headers.get('Authorization');
+            return queueVote(vote).then(() => {
+                requestFlush();
+                return jsonResponse({
+                    message: "You're offline. Your vote will be sent when you reconnect.",
+                    queued: true
+                }, 202);
+            });
+        });
+    }, () => fetch(request));
+}
+
+// Background Sync flushes the queue when the browser is back online, where
+// supported; the page also asks for a flush on its 'online' event
+function requestFlush() {
+    if (self.registration.sync) {
+        self.registration.sync.register(FLUSH_TAG).catch(() => {});
+    }
+}
+
+// Send up to BATCH_MAX queued votes in one request; resolves with whether
+// more are left. A batch holds votes cast under one session token. Votes
+// the server answered for, stored or rejected, leave the queue. After a
+// network error, 429 or 5xx they stay for the next try, as do votes the
+// server deferred under its rate limit.
+function flushBatch() {
+    return queuedVotes().then(votes => {
+        if (!votes.length) return false;
+        const authorization = votes[0].authorization;
+        const batch = votes.filter(vote => vote.authorization === authorization).slice(0, BATCH_MAX);
+        const headers = { 'Content-Type': 'application/json' };
+        if (authorization) {
+            headers['Authorization'] = authorization;
+        }
+        return fetch(batch[0].batchUrl, {
+            method: 'POST',
+            headers: headers,
+            credentials: 'include',
+            body: JSON.stringify({
+                votes: batch.map(({ batchUrl, authorization, ...vote }) => vote)
+            })
+        })
+        .then(response => {
+            if (response.status === 429 || response.status >= 500) {
+                throw new Error(`Vote batch not accepted: ${response.status}`);
+            }
+            if (!response.ok) {
+                // A malformed batch would fail the same way every time
+                console.error('Vote batch rejected:', response.status);
+                return batch.map(vote => ({ key: vote.key, status: 'rejected' }));
+            }
+            return response.json().then(data => data.results);
+        })
+        .then(results => removeVotes(
+            results.filter(result => result.status !== 'deferred').map(result => result.key)
+        ).then(() => {
+            // Deferred votes wait for the next flush, once the limit refills
+            if (results.some(result => result.status === 'deferred')) {
+                throw new Error('Votes deferred by the rate limit');
+            }
+        }))
+        .then(() => votes.length > batch.length);
+    });
+}
+
+// One flush at a time; later calls share the running one
+let flushing = null;
+
+function flushVotes() {
+    if (!flushing) {
+        const next = () => flushBatch().then(more => (more ? next() : undefined));
+        flushing = next().finally(() => {
+            flushing = null;
+        });
+    }
+    return flushing;
+}
+
+self.addEventListener('sync', (event) => {
+    if (event.tag === FLUSH_TAG) {
+        // A rejected promise makes the browser retry the sync later
+        event.waitUntil(flushVotes());
+    }
+});
+
+self.addEventListener('message', (event) => {
+    if (event.data && event.data.type === FLUSH_TAG) {
+        event.waitUntil(flushVotes().catch(error => console.error('Error sending queued votes:', error)));
+    }
+});
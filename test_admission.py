@@ -0,0 +1,46 @@
+from datetime import datetime
+from admission import RateLimiter, WindowVoters
+
+def test_token_bucket_allows_bursts_then_refills():
+    limiter = RateLimiter(rate=0.5, burst=3)
+    assert [limiter.acquire("a", now=0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a", now=0) == 2.0
+    assert limiter.acquire("b", now=0) == 0
+    assert limiter.acquire("a", now=2) == 0
+    assert limiter.rejected == 1
+
+def test_batches_take_what_the_bucket_holds():
+    limiter = RateLimiter(rate=1, burst=5)
+    assert limiter.acquire_many("a", 3, now=0) == (3, 0)
+    assert limiter.acquire_many("a", 3, now=0) == (2, 0)
+    assert limiter.acquire_many("a", 3, now=0) == (0, 1.0)
+    assert limiter.acquire_many("a", 10, now=4) == (4, 0)
+    assert limiter.rejected == 10
+
+def test_rate_limiter_keeps_at_most_max_keys():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=100)
+    for i in range(1000):
+        limiter.acquire(f"user-{i}", now=0)
+    assert len(limiter) == 100
+    # The oldest buckets were dropped, the newest are still empty
+    assert limiter.acquire("user-0", now=0) == 0
+    assert limiter.acquire("user-999", now=0) > 0
+
+def test_disabled_rate_limit():
+    limiter = RateLimiter(rate=0, burst=0)
+    assert all(limiter.acquire("a") == 0 for _ in range(100))
+
+def test_one_vote_per_window():
+    voters = WindowVoters()
+    morning, afternoon = datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 13, 0)
+    assert voters.claim("a@example.com", morning)
+    assert not voters.claim("a@example.com", morning)
+    assert voters.claim("b@example.com", morning)
+
+    voters.release("b@example.com", morning)
+    assert voters.claim("b@example.com", morning)
+
+    # The next window starts with an empty set
+    assert voters.claim("a@example.com", afternoon)
+    assert len(voters) == 1
+    assert voters.rejected == 1
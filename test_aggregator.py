@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from aggregator import VoteAggregator, ZoneAggregators
+from database import Base, Vote
+
+NOW = datetime(2025, 1, 6, 9, 30, 30)
+
+def test_average_matches_plain_mean():
+    agg = VoteAggregator()
+    temps = [20.0, 21.5, 22.25, 19.0]
+    for i, temp in enumerate(temps):
+        agg.add(temp, NOW - timedelta(minutes=i))
+    assert agg.average(NOW) == round(sum(temps) / len(temps), 1)
+    stats = agg.stats(NOW)
+    assert stats["count"] == 4
+    assert stats["min"] == 19.0
+    assert stats["max"] == 22.25
+
+def test_window_edge_is_exact():
+    agg = VoteAggregator()
+    cutoff = NOW - timedelta(hours=1)
+    agg.add(15.0, cutoff - timedelta(seconds=1))  # same minute, just outside
+    agg.add(25.0, cutoff)
+    agg.add(21.0, NOW)
+    assert agg.stats(NOW)["count"] == 2
+    assert agg.average(NOW) == 23.0
+
+def test_old_votes_are_evicted():
+    agg = VoteAggregator()
+    agg.add(20.0, NOW - timedelta(hours=2))
+    assert agg.average(NOW) is None
+    assert agg.stats(NOW)["count"] == 0
+
+def test_rebuild_from_database():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        Vote(temperature=18.0, timestamp=NOW - timedelta(hours=3)),
+        Vote(temperature=20.0, timestamp=NOW - timedelta(minutes=10)),
+        Vote(temperature=23.0, timestamp=NOW - timedelta(minutes=5)),
+    ])
+    db.commit()
+
+    agg = VoteAggregator()
+    agg.rebuild(db, now=NOW)
+    db.close()
+    assert agg.stats(NOW)["count"] == 2
+    assert agg.average(NOW) == 21.5
+
+def test_expires_when_oldest_vote_leaves_the_window():
+    agg = VoteAggregator()
+    assert agg.expires_at(NOW) is None
+    agg.add(20.0, NOW - timedelta(minutes=70))
+    agg.add(21.0, NOW - timedelta(minutes=50, seconds=10))
+    agg.add(22.0, NOW - timedelta(minutes=5))
+    assert agg.expires_at(NOW) == NOW + timedelta(minutes=9, seconds=50)
+
+def test_zones_are_aggregated_separately():
+    zones = ZoneAggregators()
+    zones.add(1, 20.0, NOW)
+    zones.add(1, 22.0, NOW)
+    zones.add(2, 25.0, NOW - timedelta(minutes=5))
+    assert zones.average(1, NOW) == 21.0
+    assert zones.average(2, NOW) == 25.0
+    assert zones.average(3, NOW) is None
+    assert zones.take_touched() == [1, 2]
+    assert zones.take_touched() == []
+    assert zones.expires_at(2, NOW) == NOW - timedelta(minutes=5) + timedelta(hours=1)
+
+def test_zone_rebuild_skips_votes_without_a_zone():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        Vote(temperature=20.0, timestamp=NOW, zone_id=1),
+        Vote(temperature=24.0, timestamp=NOW, zone_id=2),
+        Vote(temperature=18.0, timestamp=NOW),
+        Vote(temperature=15.0, timestamp=NOW - timedelta(hours=2), zone_id=1),
+    ])
+    db.commit()
+    zones = ZoneAggregators()
+    zones.rebuild(db, NOW)
+    assert sorted(zones.zone_ids()) == [1, 2]
+    assert zones.average(1, NOW) == 20.0
+    assert zones.average(2, NOW) == 24.0
+    db.close()
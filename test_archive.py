@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, time, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote, VoteArchive, VoteRollup
+from schedule import VotingSchedule
+import archive
+import export
+
+WINDOWS = VotingSchedule.daily([(time(9, 0), time(9, 15))])
+NOW = datetime(2025, 6, 15)
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'votes.db'}")
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA auto_vacuum=INCREMENTAL"))
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    # Two votes a day at 09:01 and 09:02 from January to June
+    day = datetime(2025, 1, 1, 9, 1)
+    while day < NOW:
+        db.add_all([Vote(temperature=20.0, timestamp=day), Vote(temperature=22.0, timestamp=day + timedelta(minutes=1))])
+        day += timedelta(days=1)
+    db.commit()
+    db.close()
+    return factory
+
+def test_old_months_are_rolled_up_archived_and_deleted(session_factory, tmp_path):
+    db = session_factory()
+    result = archive.apply_retention(db, WINDOWS, timedelta(days=90), tmp_path / "archive", now=NOW, batch=7)
+
+    # Cutoff is 2025-03-17: only January and February are whole months before it
+    assert result["archived"] == {"2025-01": 62, "2025-02": 56}
+    assert result["pages_freed"] > 0
+    assert db.query(Vote).filter(Vote.timestamp < datetime(2025, 3, 1)).count() == 0
+    assert db.query(Vote).count() == 2 * (NOW - datetime(2025, 3, 1)).days
+
+    january = db.get(VoteArchive, datetime(2025, 1, 1))
+    assert (january.vote_count, january.first_id, january.last_id) == (62, 1, 62)
+    rows = list(archive.read_rows(str(tmp_path / "archive" / january.path)))
+    assert rows[0] == (1, 20.0, datetime(2025, 1, 1, 9, 1), "Anonymous")
+
+    rollup = db.query(VoteRollup).filter(VoteRollup.window_start == datetime(2025, 1, 31, 9, 0)).one()
+    assert rollup.vote_count == 2
+    assert json.loads(rollup.histogram)[20 - 15] == 1
+
+    # Nothing left to do on the next run
+    assert archive.apply_retention(db, WINDOWS, timedelta(days=90), tmp_path / "archive", now=NOW)["archived"] == {}
+    db.close()
+
+def test_late_votes_are_added_to_an_archived_month(session_factory, tmp_path):
+    db = session_factory()
+    archive.archive_month(db, datetime(2025, 1, 1), WINDOWS, tmp_path)
+    db.add(Vote(temperature=18.0, timestamp=datetime(2025, 1, 20, 9, 5)))
+    db.commit()
+
+    assert archive.archive_month(db, datetime(2025, 1, 1), WINDOWS, tmp_path) == 1
+    entry = db.get(VoteArchive, datetime(2025, 1, 1))
+    assert entry.vote_count == 63
+    ids = [row[0] for row in archive.read_rows(str(tmp_path / entry.path))]
+    assert ids == sorted(ids) and len(set(ids)) == 63
+    db.close()
+
+def test_reads_reach_archived_months(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive.config, "ARCHIVE_DIR", str(tmp_path))
+    db = session_factory()
+    total = db.query(Vote).count()
+    archive.apply_retention(db, WINDOWS, timedelta(days=90), now=NOW)
+
+    chunks = list(export.vote_chunks(session_factory, chunk_size=50))
+    ids = [row[0] for chunk in chunks for row in chunk]
+    assert ids == list(range(1, total + 1))
+
+    february = [row for chunk in export.vote_chunks(session_factory, since=datetime(2025, 2, 10),
+                                                    until=datetime(2025, 3, 2)) for row in chunk]
+    assert len(february) == 2 * 20
+    assert february[0][2] == datetime(2025, 2, 10, 9, 1)
+
+    # A page spanning the last archived month and votes.db
+    page = export.vote_page(db, after_id=110, limit=20)
+    assert [vote["id"] for vote in page["votes"]] == list(range(111, 131))
+    assert page["next_cursor"] == 130
+    db.close()
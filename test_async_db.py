@@ -0,0 +1,57 @@
+import asyncio
+import json
+from datetime import datetime
+import pytest
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote, User, hash_password
+from models import UserLogin
+import backend
+
+pytest.importorskip("aiosqlite")
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+@pytest.fixture
+def async_session(tmp_path):
+    url = f"sqlite:///{tmp_path}/async.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Vote(temperature=21.0, timestamp=datetime.utcnow()))
+    db.add(User(email="test@example.com", password_hash=hash_password("password")))
+    db.commit()
+    db.close()
+
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    yield sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(async_engine.dispose())
+
+def run_with_session(factory, handler, *args):
+    async def call():
+        async with factory() as db:
+            return await handler(*args, db=db)
+    return asyncio.run(call())
+
+def test_latest_votes_async(async_session):
+    backend.response_cache.invalidate()
+    request = Request({"type": "http", "method": "GET", "path": "/votes/latest", "query_string": b"",
+                       "headers": [], "scheme": "http", "server": ("testserver", 80)})
+    response = run_with_session(async_session, backend.get_latest_votes_async, request)
+    votes = json.loads(response.body)
+    assert len(votes) == 1
+    assert votes[0]["temperature"] == 21.0
+    assert votes[0]["username"] == "Anonymous"
+
+def test_login_async(async_session):
+    request = Request({"type": "http", "headers": []})
+    user = UserLogin(email="test@example.com", password="password")
+    response = Response()
+    result = run_with_session(async_session, backend.login_user_async, user, request, response)
+    assert result == {"message": "Login successful"}
+    assert "X-Session-Token" in response.headers
+
+    with pytest.raises(HTTPException) as exc:
+        user = UserLogin(email="test@example.com", password="nope")
+        run_with_session(async_session, backend.login_user_async, user, request, Response())
+    assert exc.value.status_code == 401
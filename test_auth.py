@@ -0,0 +1,43 @@
+import time
+import pytest
+from auth import PasswordVerifier, SessionTokens, LoginPoolSaturated
+from database import hash_password
+
+HASHED = hash_password("password")
+
+def test_verifier_checks_password():
+    verifier = PasswordVerifier(workers=2)
+    try:
+        assert verifier.verify("password", HASHED) is True
+        assert verifier.verify("wrong", HASHED) is False
+    finally:
+        verifier.shutdown()
+
+def test_verifier_rejects_when_saturated():
+    verifier = PasswordVerifier(workers=1, max_pending=1)
+    try:
+        futures = [verifier.submit("password", HASHED) for _ in range(2)]
+        with pytest.raises(LoginPoolSaturated):
+            verifier.submit("password", HASHED)
+        assert all(f.result() for f in futures)
+        assert verifier.rejected == 1
+        # Slots are released once checks finish
+        assert verifier.verify("password", HASHED) is True
+    finally:
+        verifier.shutdown()
+
+def test_session_tokens_expire():
+    tokens = SessionTokens(ttl=0.05)
+    token = tokens.issue("test@example.com")
+    assert tokens.lookup(token) == "test@example.com"
+    assert tokens.lookup("unknown") is None
+    time.sleep(0.06)
+    assert tokens.lookup(token) is None
+
+def test_expired_tokens_are_pruned_on_issue():
+    tokens = SessionTokens(ttl=0.05)
+    for i in range(5):
+        tokens.issue(f"user{i}@example.com")
+    time.sleep(0.06)
+    token = tokens.issue("fresh@example.com")
+    assert list(tokens._tokens) == [token]
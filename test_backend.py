@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from admission import RateLimiter, WindowVoters
+from aggregator import VoteAggregator
+from database import Base, User, Vote, hash_password
+from ingest import ACK_COMMIT, VoteIngestor
+from iot_dispatcher import ThermostatDispatcher
+from mock_thermostat import MockThermostat
+import backend
+import config
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/backend.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = factory()
+    db.add(User(email="test@example.com", password_hash=hash_password("password")))
+    db.commit()
+    db.close()
+    return factory
+
+@pytest.fixture
+def client(factory):
+    def override_get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    backend.app.dependency_overrides[backend.get_db] = override_get_db
+    backend.user_directory.invalidate()
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.pop(backend.get_db, None)
+    backend.user_directory.invalidate()
+
+def test_login_issues_session_token(client):
+    response = client.post("/login", json={"email": "test@example.com", "password": "password"})
+    assert response.status_code == 200
+    token = response.headers["X-Session-Token"]
+
+    # Repeat login with the token skips the password check
+    client.cookies.clear()
+    response = client.post("/login", json={"email": "test@example.com", "password": "ignored"},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+    response = client.post("/login", json={"email": "test@example.com", "password": "wrong"},
+                           headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+def test_cached_average_reaches_a_recovered_thermostat(client, monkeypatch):
+    device = MockThermostat(port=0).start()
+    dispatcher = ThermostatDispatcher(device.url, max_retries=0, retry_interval=60)
+    aggregator = VoteAggregator()
+    aggregator.add(21.5, datetime.utcnow())
+    monkeypatch.setattr(backend, "thermostat_dispatcher", dispatcher)
+    monkeypatch.setattr(backend, "vote_aggregator", aggregator)
+    monkeypatch.setattr(config, "AVERAGE_METHOD", "mean")
+    backend.response_cache.invalidate()
+
+    device.fail_next = 1
+    assert client.get("/average").json() == {"average": 21.5}
+    assert dispatcher.wait_idle() and device.received == []
+
+    # The device is back; a cached /average still hands it the value
+    hits = backend.response_cache.stats()["hits"]
+    assert client.get("/average").json() == {"average": 21.5}
+    assert backend.response_cache.stats()["hits"] == hits + 1
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    device.stop()
+    backend.response_cache.invalidate()
+    assert device.received == [21.5]
+
+def test_vote_key_length_matches_batch(client):
+    for key in ["", "x" * 65]:
+        assert client.post("/vote", json={"temperature": 21.0, "key": key}).status_code == 422
+
+class OpenWindow:
+    def current_window(self, moment):
+        opened = moment.replace(minute=0, second=0, microsecond=0)
+        return opened, opened + timedelta(hours=1)
+
+def test_vote_retried_after_commit_timeout_is_not_a_conflict(client, factory, monkeypatch):
+    # Votes wait up to a second to be batched, longer than the reply does
+    ingestor = VoteIngestor(factory, max_delay=1.0)
+    monkeypatch.setattr(backend, "vote_ingestor", ingestor)
+    monkeypatch.setattr(backend, "window_voters", WindowVoters())
+    monkeypatch.setattr(backend, "voting_schedule", OpenWindow())
+    monkeypatch.setattr(config, "VOTE_ACK_MODE", ACK_COMMIT)
+    monkeypatch.setattr(config, "VOTE_COMMIT_TIMEOUT", 0.05)
+    token = client.post("/login", json={"email": "test@example.com", "password": "password"}).headers["X-Session-Token"]
+    client.cookies.clear()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post("/vote", json={"temperature": 21.0, "key": "k1"}, headers=headers)
+    assert response.status_code == 503
+
+    # The retry joins the first attempt's batch and is answered once stored
+    monkeypatch.setattr(config, "VOTE_COMMIT_TIMEOUT", 5.0)
+    try:
+        response = client.post("/vote", json={"temperature": 21.0, "key": "k1"}, headers=headers)
+        assert response.status_code == 200
+        response = client.post("/vote", json={"temperature": 22.0, "key": "k2"}, headers=headers)
+        assert response.status_code == 409
+        response = client.post("/vote", json={"temperature": 22.0}, headers=headers)
+        assert response.status_code == 409
+    finally:
+        ingestor.stop()
+    db = factory()
+    assert db.query(Vote).count() == 1
+    db.close()
+
+# As script.js votes: cross-origin, {temperature} only, the token from
+# login.html as a Bearer header and no cookies
+def test_page_vote_counts_as_the_signed_in_user(client, factory, monkeypatch):
+    monkeypatch.setattr(backend, "vote_ingestor", VoteIngestor(factory))
+    monkeypatch.setattr(backend, "vote_limiter", RateLimiter(30 / 60, 10))
+    monkeypatch.setattr(backend, "window_voters", WindowVoters())
+    monkeypatch.setattr(backend, "voting_schedule", OpenWindow())
+    monkeypatch.setattr(config, "VOTE_ACK_MODE", ACK_COMMIT)
+    origin = {"Origin": "http://127.0.0.1:5500"}
+    response = client.post("/login", json={"email": "test@example.com", "password": "password"}, headers=origin)
+    assert "x-session-token" in response.headers["Access-Control-Expose-Headers"].lower()
+    token = response.headers["X-Session-Token"]
+    client.cookies.clear()
+
+    try:
+        headers = dict(origin, Authorization=f"Bearer {token}")
+        assert client.post("/vote", json={"temperature": 21.0}, headers=headers).status_code == 200
+        assert client.post("/vote", json={"temperature": 22.0}, headers=headers).status_code == 409
+        # Anonymous voters share the test client's address, without
+        # sharing a rate limit
+        for _ in range(config.VOTE_RATE_BURST + 1):
+            assert client.post("/vote", json={"temperature": 20.0}, headers=origin).status_code == 200
+    finally:
+        backend.vote_ingestor.stop()
+    db = factory()
+    user = db.query(User).filter_by(email="test@example.com").one()
+    assert db.query(Vote).filter_by(user_id=user.id).count() == 1
+    assert db.query(Vote).filter(Vote.user_id.is_(None)).count() == config.VOTE_RATE_BURST + 1
+    db.close()
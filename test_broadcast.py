@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+from broadcast import BroadcastHub
+
+def vote(minute, temperature=21.0):
+    return {"username": "Anonymous", "timestamp": datetime(2025, 1, 6, 9, minute).isoformat(), "temperature": temperature}
+
+def parse(chunk):
+    events = []
+    for block in chunk.decode().strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_snapshot_then_incremental_votes():
+    hub = BroadcastHub()
+    hub.seed([vote(1)], datetime(2025, 1, 6, 9, 5))
+
+    async def scenario():
+        client = hub.subscribe(datetime(2025, 1, 6, 9, 5))
+        assert parse(await client.next()) == [("snapshot", {
+            "interval_start": "2025-01-06T09:00:00",
+            "interval_end": "2025-01-06T09:15:00",
+            "votes": [vote(1)],
+        })]
+        # Published from another thread, like the vote ingestor does
+        thread = threading.Thread(target=hub.publish, args=([vote(6, 22.0), vote(7, 23.0)],))
+        thread.start()
+        thread.join()
+        events = parse(await asyncio.wait_for(client.next(), 1))
+        hub.unsubscribe(client)
+        return events
+
+    assert asyncio.run(scenario()) == [("vote", vote(6, 22.0)), ("vote", vote(7, 23.0))]
+    assert hub.client_count == 0
+
+def test_new_interval_starts_a_fresh_snapshot():
+    hub = BroadcastHub()
+    hub.seed([vote(1)], datetime(2025, 1, 6, 9, 5))
+    hub.publish([vote(16)])
+
+    async def scenario():
+        client = hub.subscribe(datetime(2025, 1, 6, 9, 16))
+        return parse(await client.next())
+
+    [(event, snapshot)] = asyncio.run(scenario())
+    assert snapshot["interval_start"] == "2025-01-06T09:15:00"
+    assert snapshot["votes"] == [vote(16)]
+
+def test_quiet_interval_and_late_votes():
+    hub = BroadcastHub()
+    hub.seed([vote(1)], datetime(2025, 1, 6, 9, 5))
+
+    async def scenario():
+        # Nothing published since 09:15; the snapshot is the 13:00 interval
+        client = hub.subscribe(datetime(2025, 1, 6, 13, 5))
+        snapshot = parse(await client.next())
+        hub.publish([vote(2)])
+        hub.unsubscribe(client)
+        return snapshot, client._buffer
+
+    [(event, snapshot)], buffered = asyncio.run(scenario())
+    assert (snapshot["interval_start"], snapshot["votes"]) == ("2025-01-06T13:00:00", [])
+    assert not buffered and hub.published == 0
+
+def test_slow_client_is_dropped_without_blocking_others():
+    hub = BroadcastHub(max_buffer=10)
+    hub.seed([], datetime(2025, 1, 6, 9, 0))
+
+    async def scenario():
+        slow = hub.subscribe(datetime(2025, 1, 6, 9, 0))
+        fast = hub.subscribe(datetime(2025, 1, 6, 9, 0))
+        await slow.next()
+        await fast.next()
+        received = 0
+        for minute in range(8):
+            hub.publish([vote(minute), vote(minute)])
+            await asyncio.sleep(0)
+            received += len(parse(await fast.next()))
+        return slow, received
+
+    slow, received = asyncio.run(scenario())
+    assert received == 16
+    assert slow.closed
+    assert hub.dropped == 1
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from cache import ResponseCache
+
+def make_app(cache, payload, expires_at=None):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/plain")
+    def plain():
+        return payload
+
+    @app.get("/cached")
+    def cached(request: Request):
+        def build():
+            calls.append(1)
+            return payload, expires_at
+        return cache.respond(request, build)
+
+    return TestClient(app), calls
+
+def test_cached_body_matches_uncached_and_revalidates():
+    cache = ResponseCache()
+    client, calls = make_app(cache, {"average": 21.5, "label": "22°C"})
+
+    first = client.get("/cached")
+    second = client.get("/cached")
+    assert first.content == second.content == client.get("/plain").content
+    assert first.headers["content-type"] == client.get("/plain").headers["content-type"]
+    assert len(calls) == 1
+
+    etag = first.headers["etag"]
+    revalidated = client.get("/cached", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["not_modified"] == 1
+
+    cache.invalidate()
+    client.get("/cached")
+    assert len(calls) == 2
+
+def test_expired_entries_are_rebuilt():
+    cache = ResponseCache()
+    client, calls = make_app(cache, {"average": None}, expires_at=datetime.utcnow() - timedelta(seconds=1))
+    client.get("/cached")
+    client.get("/cached")
+    assert len(calls) == 2
+
+def test_lru_eviction_and_stale_builds():
+    cache = ResponseCache(max_entries=2)
+    client, calls = make_app(cache, {"average": 20.0})
+    for query in ("a", "b", "a", "c"):
+        client.get(f"/cached?{query}=1")
+    assert cache.stats()["evictions"] == 1
+    client.get("/cached?a=1")
+    assert len(calls) == 3  # "b" was evicted, "a" was kept
+
+    # A response built across an invalidation is served but not kept
+    entry, generation = cache.lookup("/stale", datetime.utcnow())
+    cache.invalidate()
+    cache._render("/stale", generation, {"average": 1.0}, None)
+    assert cache.lookup("/stale", datetime.utcnow())[0] is None
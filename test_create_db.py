@@ -1,10 +1,46 @@
 import os
+import subprocess
+import sys
 from sqlalchemy import inspect
-from database import engine, Base
 
-def test_database_creation():
-    inspector = inspect(engine)
-    tables = inspector.get_table_names()
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def test_database_creation(tmp_path):
+    from sqlalchemy import create_engine
+    from database import migrate_db
+
+    fresh = create_engine(f"sqlite:///{tmp_path}/fresh.db")
+    migrate_db(fresh)
+    tables = inspect(fresh).get_table_names()
     assert "votes" in tables
     assert "users" in tables
     assert "feedback" in tables
+
+def test_importing_the_app_does_not_touch_the_database(tmp_path):
+    subprocess.run([sys.executable, "-c", "import backend"], cwd=tmp_path, check=True,
+                   env=dict(os.environ, PYTHONPATH=HERE), capture_output=True)
+    assert not (tmp_path / "votes.db").exists()
+
+def test_migration_adds_vote_indexes(tmp_path):
+    from sqlalchemy import create_engine, text
+    from database import migrate_db
+
+    legacy = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with legacy.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE votes (id INTEGER PRIMARY KEY, temperature FLOAT NOT NULL, "
+            "timestamp DATETIME, username VARCHAR)"
+        ))
+    migrate_db(legacy)
+    indexes = {index["name"] for index in inspect(legacy).get_indexes("votes")}
+    assert "ix_votes_timestamp_temperature" in indexes
+
+def test_sqlite_profile_is_applied(tmp_path):
+    from sqlalchemy import create_engine, event
+    from database import apply_sqlite_pragmas
+
+    profiled = create_engine(f"sqlite:///{tmp_path}/profiled.db")
+    event.listen(profiled, "connect", apply_sqlite_pragmas)
+    with profiled.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote
+import export
+
+START = datetime(2025, 1, 6, 9, 0)
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add_all([Vote(temperature=15 + i % 10, timestamp=START + timedelta(seconds=i)) for i in range(25)])
+    db.commit()
+    db.close()
+    return factory
+
+def test_json_array_streams_in_chunks(session_factory):
+    chunks = list(export.vote_chunks(session_factory, chunk_size=10))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+
+    body = b"".join(export.iter_json_array(iter(chunks)))
+    votes = json.loads(body)
+    assert len(votes) == 25
+    assert votes[0] == {"id": 1, "temperature": 15.0, "timestamp": "2025-01-06T09:00:00", "username": "Anonymous"}
+
+def test_empty_json_array():
+    assert b"".join(export.iter_json_array(iter([]))) == b"[]"
+
+def test_ndjson_and_csv(session_factory):
+    lines = b"".join(export.iter_ndjson(export.vote_chunks(session_factory, chunk_size=7))).splitlines()
+    assert len(lines) == 25
+    assert json.loads(lines[-1])["id"] == 25
+
+    text = b"".join(export.iter_csv(export.vote_chunks(session_factory, chunk_size=7))).decode()
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == list(export.VOTE_COLUMNS)
+    assert len(rows) == 26
+
+def test_keyset_pages(session_factory):
+    db = session_factory()
+    seen, cursor = [], 0
+    while cursor is not None:
+        page = export.vote_page(db, after_id=cursor, limit=10)
+        seen += [vote["id"] for vote in page["votes"]]
+        cursor = page["next_cursor"]
+    assert seen == list(range(1, 26))
+
+    page = export.vote_page(db, limit=100, since=START + timedelta(seconds=20))
+    assert [vote["id"] for vote in page["votes"]] == [21, 22, 23, 24, 25]
+    db.close()
@@ -0,0 +1,154 @@
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote, User
+from ingest import DuplicateKey, DuplicateVote, PendingVote, VoteIngestor
+from users import UserDirectory
+
+NOW = datetime(2025, 1, 6, 9, 5)
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/ingest.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = factory()
+    db.add(User(email="a@example.com", password_hash="x", votes_count=9))
+    db.commit()
+    db.close()
+    return factory
+
+def test_votes_are_committed_in_batches(session_factory):
+    committed = []
+    ingestor = VoteIngestor(session_factory, max_batch=50, max_delay=0.05, on_commit=committed.extend)
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        futures = [pool.submit(ingestor.submit, 20.0 + i % 5, NOW) for i in range(200)]
+        results = [f.result().result(timeout=5) for f in futures]
+    ingestor.stop()
+
+    assert results == [None] * 200
+    assert len(committed) == 200
+    assert ingestor.batches < 200
+
+    db = session_factory()
+    assert db.query(Vote).count() == 200
+    db.close()
+
+def test_votes_count_updated_in_bulk(session_factory):
+    ingestor = VoteIngestor(session_factory, max_batch=10, max_delay=0.5)
+    futures = [ingestor.submit(21.0, NOW, "a@example.com") for _ in range(3)]
+    futures.append(ingestor.submit(21.0, NOW, "nobody@example.com"))
+    counts = [f.result(timeout=5) for f in futures]
+    ingestor.stop()
+
+    assert counts == [10, 11, 12, None]
+    db = session_factory()
+    assert db.query(User).filter(User.email == "a@example.com").one().votes_count == 12
+    db.close()
+
+def test_second_vote_in_a_window_is_dropped(session_factory):
+    window = datetime(2025, 1, 6, 9, 0)
+    committed = []
+    ingestor = VoteIngestor(session_factory, max_batch=10, max_delay=0.5, on_commit=committed.extend)
+    first = ingestor.submit(21.0, NOW, "a@example.com", window)
+    repeat = ingestor.submit(24.0, NOW, "a@example.com", window)
+    anonymous = [ingestor.submit(22.0, NOW, None, window) for _ in range(2)]
+    assert first.result(timeout=5) == 10
+    with pytest.raises(DuplicateVote):
+        repeat.result(timeout=5)
+    assert [f.result(timeout=5) for f in anonymous] == [None, None]
+
+    # Also caught against votes committed earlier, e.g. by another worker
+    later = ingestor.submit(23.0, NOW, "a@example.com", window)
+    with pytest.raises(DuplicateVote):
+        later.result(timeout=5)
+    ingestor.stop()
+
+    assert len(committed) == 3
+    assert ingestor.duplicates == 2
+    db = session_factory()
+    assert db.query(Vote).count() == 3
+    assert db.query(User).filter(User.email == "a@example.com").one().votes_count == 10
+    db.close()
+
+def test_stop_flushes_queued_votes(session_factory):
+    ingestor = VoteIngestor(session_factory, max_batch=1000, max_delay=10)
+    future = ingestor.submit(22.0, NOW)
+    ingestor.stop()
+    assert future.done()
+
+    db = session_factory()
+    assert db.query(Vote).count() == 1
+    db.close()
+
+def test_failing_commit_callback_keeps_the_worker(session_factory):
+    def on_commit(batch):
+        raise RuntimeError("broadcast failed")
+
+    ingestor = VoteIngestor(session_factory, max_delay=0.01, on_commit=on_commit)
+    assert ingestor.submit(22.0, NOW).result(timeout=5) is None
+    assert ingestor.submit(23.0, NOW).result(timeout=5) is None
+    ingestor.stop()
+
+    db = session_factory()
+    assert db.query(Vote).count() == 2
+    db.close()
+
+def test_vote_takes_the_users_zone(session_factory):
+    db = session_factory()
+    db.query(User).update({User.zone_id: 7})
+    db.commit()
+    db.close()
+
+    committed = []
+    ingestor = VoteIngestor(session_factory, max_batch=10, max_delay=0.5, on_commit=committed.extend)
+    futures = [
+        ingestor.submit(21.0, NOW, "a@example.com"),
+        ingestor.submit(22.0, NOW, None, zone_id=3),
+        ingestor.submit(23.0, NOW),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+    ingestor.stop()
+
+    assert [p.zone_id for p in committed] == [7, 3, None]
+    db = session_factory()
+    assert [z for (z,) in db.query(Vote.zone_id).order_by(Vote.id)] == [7, 3, None]
+    db.close()
+
+def test_replayed_keys_are_stored_once(session_factory):
+    ingestor = VoteIngestor(session_factory, max_batch=2, max_delay=0.5)
+    first = [PendingVote(20.0 + i, NOW, None, key=f"k{i}") for i in range(3)]
+    # Written in one transaction even though it is larger than max_batch
+    assert [f.result(timeout=5) for f in ingestor.submit_many(first)] == [None] * 3
+    assert ingestor.batches == 1
+
+    again = [PendingVote(25.0, NOW, None, key="k1"), PendingVote(22.0, NOW, None, key="k3"),
+             PendingVote(23.0, NOW, None, key="k3")]
+    futures = ingestor.submit_many(again)
+    ingestor.stop()
+    assert isinstance(futures[0].exception(timeout=5), DuplicateKey)
+    assert futures[1].result(timeout=5) is None
+    assert isinstance(futures[2].exception(timeout=5), DuplicateKey)
+    assert ingestor.replayed == 2
+
+    db = session_factory()
+    assert sorted(t for (t,) in db.query(Vote.temperature)) == [20.0, 21.0, 22.0, 22.0]
+    db.close()
+
+def test_votes_count_kept_in_the_user_directory(session_factory):
+    users = UserDirectory(session_factory)
+    ingestor = VoteIngestor(session_factory, max_batch=10, max_delay=0.5, users=users)
+    first = ingestor.submit(21.0, NOW, "a@example.com").result(timeout=5)
+    second = ingestor.submit(21.0, NOW, "a@example.com").result(timeout=5)
+    ingestor.stop()
+    assert (first, second) == (10, 11)
+
+    db = session_factory()
+    assert db.query(User.votes_count).scalar() == 9
+    users.flush()
+    db.expire_all()
+    assert db.query(User.votes_count).scalar() == 11
+    db.close()
@@ -0,0 +1,117 @@
+import time
+import pytest
+from iot_dispatcher import ThermostatDispatcher, ThermostatRouter
+from mock_thermostat import MockThermostat
+
+@pytest.fixture
+def device():
+    device = MockThermostat(port=0).start()
+    yield device
+    device.stop()
+
+def test_identical_values_are_pushed_once(device):
+    dispatcher = ThermostatDispatcher(device.url)
+    for _ in range(500):
+        dispatcher.submit(21.5)
+    assert dispatcher.wait_idle()
+    dispatcher.submit(21.5)
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    assert device.received == [21.5]
+
+def test_burst_collapses_to_latest_value(device):
+    device.latency = 0.2
+    dispatcher = ThermostatDispatcher(device.url)
+    dispatcher.submit(20.0)
+    time.sleep(0.05)
+    for temp in (20.5, 21.0, 21.5, 22.0):
+        dispatcher.submit(temp)
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    assert device.received == [20.0, 22.0]
+    assert dispatcher.coalesced == 3
+
+def test_submit_does_not_block_on_slow_device(device):
+    device.latency = 0.5
+    dispatcher = ThermostatDispatcher(device.url)
+    start = time.perf_counter()
+    dispatcher.submit(19.0)
+    assert time.perf_counter() - start < 0.1
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+
+def test_failed_push_is_retried(device):
+    device.fail_next = 2
+    dispatcher = ThermostatDispatcher(device.url, backoff=0.01)
+    dispatcher.submit(23.0)
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    assert device.received == [23.0]
+    assert dispatcher.failures == 2
+
+def test_retries_are_bounded(device):
+    device.fail_next = 100
+    dispatcher = ThermostatDispatcher(device.url, max_retries=3, backoff=0.01)
+    dispatcher.submit(23.0)
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    assert device.received == []
+    assert dispatcher.failures == 4
+
+def test_undelivered_value_is_retried_after_recovery(device):
+    device.fail_next = 100
+    dispatcher = ThermostatDispatcher(device.url, max_retries=1, backoff=0.01, retry_interval=0.1)
+    dispatcher.submit(23.0)
+    assert dispatcher.wait_idle()
+    assert dispatcher.undelivered == 23.0 and dispatcher.gave_up == 1
+
+    # The device comes back; the timer delivers the value without a submit
+    device.fail_next = 0
+    deadline = time.monotonic() + 2
+    while not device.received and time.monotonic() < deadline:
+        time.sleep(0.02)
+    dispatcher.stop()
+    assert device.received == [23.0]
+    assert dispatcher.undelivered is None
+
+def test_same_value_resubmitted_after_giving_up(device):
+    device.fail_next = 2
+    dispatcher = ThermostatDispatcher(device.url, max_retries=1, backoff=0.01, retry_interval=60)
+    dispatcher.submit(23.0)
+    assert dispatcher.wait_idle()
+    dispatcher.submit(23.0)
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    assert device.received == [23.0]
+
+def test_idle_thread_exits_and_restarts(device):
+    dispatcher = ThermostatDispatcher(device.url, idle_timeout=0.05)
+    dispatcher.submit(20.0)
+    assert dispatcher.wait_idle()
+    time.sleep(0.2)
+    assert not dispatcher.running
+    dispatcher.submit(21.0)
+    assert dispatcher.wait_idle()
+    dispatcher.stop()
+    assert device.received == [20.0, 21.0]
+
+def test_router_sends_each_zone_to_its_device(device):
+    other = MockThermostat(port=0).start()
+    router = ThermostatRouter(idle_timeout=0.05)
+    router.route(1, device.url)
+    router.route(2, other.url)
+    assert router.submit(1, 20.5)
+    assert router.submit(2, 23.0)
+    assert not router.submit(3, 21.0)
+    assert router.get(1).wait_idle() and router.get(2).wait_idle()
+    time.sleep(0.2)
+    assert router.active == 0
+
+    # Rerouting a zone replaces its dispatcher; its pushes still count
+    router.route(2, None)
+    assert not router.submit(2, 24.0)
+    router.stop()
+    other.stop()
+    assert device.received == [20.5]
+    assert other.received == [23.0]
+    assert router.pushes == 2
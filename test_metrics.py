@@ -0,0 +1,43 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Test", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, "/vote")
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/vote",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/vote",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/vote",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{route="/vote"} 4' in lines
+    assert "# TYPE test_latency_seconds histogram" in metrics.render()
+
+def test_middleware_labels_routes_by_template():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    samples = metrics.HTTP_REQUESTS.render()
+    assert 'airvote_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in samples
+    assert 'airvote_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in samples
+
+def test_engine_hooks_time_queries_and_count_rows():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    before = dict(metrics.DB_ROWS._values)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (:x)"), [{"x": 1}, {"x": 2}, {"x": 3}])
+        conn.execute(text("SELECT * FROM t")).all()
+    assert metrics.DB_ROWS._values[("INSERT",)] - before.get(("INSERT",), 0) == 3
+    assert any(line.startswith('airvote_db_query_duration_seconds_count{operation="SELECT"}')
+               for line in metrics.DB_QUERIES.render())
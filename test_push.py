@@ -0,0 +1,54 @@
+import pytest
+from py_vapid import Vapid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, PushSubscription
+from mock_push import MockPushService
+import push
+
+@pytest.fixture
+def service():
+    service = MockPushService(port=0).start()
+    yield service
+    service.stop()
+
+@pytest.fixture
+def fanout():
+    vapid = Vapid()
+    vapid.generate_keys()
+    return push.PushFanout(vapid, {"sub": "mailto:admin@example.com"}, workers=4)
+
+def test_fanout_reaches_every_subscriber(service, fanout):
+    service.expired = {"3", "7"}
+    subscriptions = [service.subscription(i) for i in range(20)]
+    result = fanout.send_all(subscriptions, "{}")
+
+    assert service.received == 20
+    assert result.sent == 18
+    assert sorted(result.expired) == [f"{service.base_url}/push/{i}" for i in (3, 7)]
+    assert service.connections <= 4
+
+def test_vapid_headers_cached_per_origin(fanout):
+    first = fanout.vapid_headers("https://push.example.com/a")
+    assert fanout.vapid_headers("https://push.example.com/b") is first
+    assert fanout.vapid_headers("https://other.example.com/a") is not first
+
+def test_invalid_vapid_key_fails_without_sending(service):
+    fanout = push.PushFanout("your-private-key", {"sub": "mailto:admin@example.com"})
+    result = fanout.send_all([service.subscription(1)], "{}")
+    assert result.failed == 1
+    assert service.received == 0
+
+def test_subscription_storage():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    sub = {"endpoint": "https://push.example.com/1", "keys": {"p256dh": "a", "auth": "b"}}
+    push.save_subscription(db, sub)
+    push.save_subscription(db, dict(sub, keys={"p256dh": "c", "auth": "d"}))
+    assert db.query(PushSubscription).count() == 1
+    assert push.load_subscriptions(db)[0]["keys"]["p256dh"] == "c"
+
+    assert push.remove_subscriptions(db, [sub["endpoint"]]) == 1
+    assert push.load_subscriptions(db) == []
+    db.close()
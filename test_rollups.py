@@ -0,0 +1,57 @@
+import json
+from datetime import datetime, time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote, VoteRollup
+from schedule import VotingSchedule
+import rollups
+
+WINDOWS = VotingSchedule.daily([(time(9, 0), time(9, 15)), (time(13, 0), time(13, 15))])
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Vote(temperature=20.0, timestamp=datetime(2025, 1, 6, 9, 1)),
+        Vote(temperature=22.5, timestamp=datetime(2025, 1, 6, 9, 14)),
+        Vote(temperature=24.0, timestamp=datetime(2025, 1, 6, 13, 5)),
+        Vote(temperature=18.0, timestamp=datetime(2025, 1, 7, 9, 3)),
+        Vote(temperature=30.0, timestamp=datetime(2025, 1, 7, 11, 0)),  # outside any window
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+def test_only_closed_windows_are_rolled_up(db):
+    now = datetime(2025, 1, 6, 9, 20)
+    # Yesterday's two windows plus this morning's; 13:00 is still ahead
+    assert rollups.rollup_closed_windows(db, WINDOWS, now) == 3
+    assert rollups.rollup_closed_windows(db, WINDOWS, now) == 0
+
+    rollup = db.query(VoteRollup).filter(VoteRollup.window_start == datetime(2025, 1, 6, 9, 0)).one()
+    assert rollup.vote_count == 2
+    assert rollup.min_temperature == 20.0
+    assert rollup.max_temperature == 22.5
+    histogram = json.loads(rollup.histogram)
+    assert histogram[20 - rollups.HISTOGRAM_MIN] == 1
+    assert histogram[22 - rollups.HISTOGRAM_MIN] == 1
+
+def test_backfill_and_trends(db):
+    rollups.backfill(db, WINDOWS, now=datetime(2025, 1, 8))
+    daily = rollups.trends(db, "day", since=datetime(2025, 1, 6))
+    morning = [row for row in daily if row["window"] == "09:00-09:15"]
+    assert [(row["period"], row["count"], row["average"]) for row in morning] == [
+        ("2025-01-06", 2, 21.2), ("2025-01-07", 1, 18.0),
+    ]
+
+    weekly = rollups.trends(db, "week", since=datetime(2025, 1, 6))
+    morning_week = next(row for row in weekly if row["window"] == "09:00-09:15")
+    assert morning_week["period"] == "2025-01-06"
+    assert morning_week["count"] == 3
+    assert morning_week["min"] == 18.0
+
+    with pytest.raises(ValueError):
+        rollups.trends(db, "year", since=datetime(2025, 1, 6))
@@ -0,0 +1,59 @@
+from datetime import date, datetime, time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from schedule import VotingSchedule, Window, load_schedule, save_schedule
+
+DAILY = VotingSchedule.daily([(time(9, 0), time(9, 15)), (time(13, 0), time(13, 15))])
+
+def test_current_window_lookup():
+    # 2025-01-06 is a Monday
+    assert DAILY.current_window(datetime(2025, 1, 6, 9, 5)) == (
+        datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 9, 15))
+    assert DAILY.is_open(datetime(2025, 1, 6, 9, 0))
+    assert DAILY.is_open(datetime(2025, 1, 6, 9, 15))  # end is inclusive
+    assert not DAILY.is_open(datetime(2025, 1, 6, 9, 15, 1))
+    assert not DAILY.is_open(datetime(2025, 1, 6, 8, 59))
+    assert DAILY.is_open(datetime(2025, 1, 12, 13, 10))  # Sunday
+
+def test_window_crossing_midnight_and_week_end():
+    schedule = VotingSchedule.daily([(time(23, 50), time(0, 10))])
+    assert schedule.current_window(datetime(2025, 1, 7, 0, 5)) == (
+        datetime(2025, 1, 6, 23, 50), datetime(2025, 1, 7, 0, 10))
+    # Sunday night into Monday morning
+    assert schedule.current_window(datetime(2025, 1, 13, 0, 5)) == (
+        datetime(2025, 1, 12, 23, 50), datetime(2025, 1, 13, 0, 10))
+    assert not schedule.is_open(datetime(2025, 1, 13, 0, 11))
+
+def test_weekdays_and_holidays():
+    schedule = VotingSchedule([Window(time(9, 0), time(9, 15), weekdays=[0, 1, 2, 3, 4])],
+                              holidays=[date(2025, 1, 7)])
+    assert schedule.is_open(datetime(2025, 1, 6, 9, 5))
+    assert not schedule.is_open(datetime(2025, 1, 7, 9, 5))  # holiday
+    assert not schedule.is_open(datetime(2025, 1, 11, 9, 5))  # Saturday
+    assert schedule.next_opening(datetime(2025, 1, 6, 10, 0)) == datetime(2025, 1, 8, 9, 0)
+    assert schedule.next_opening(datetime(2025, 1, 10, 10, 0)) == datetime(2025, 1, 13, 9, 0)
+
+def test_occurrences():
+    spans = DAILY.occurrences(datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 7, 9, 0))
+    assert [opened for opened, _ in spans] == [datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 13, 0)]
+
+def test_overlapping_windows_are_rejected():
+    with pytest.raises(ValueError):
+        VotingSchedule.daily([(time(9, 0), time(9, 30)), (time(9, 15), time(9, 45))])
+    with pytest.raises(ValueError):
+        VotingSchedule.daily([(time(23, 0), time(1, 0)), (time(0, 30), time(0, 45))])
+
+def test_schedule_round_trip():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    assert load_schedule(db) is None
+
+    schedule = VotingSchedule([Window(time(8, 30), time(8, 45), weekdays=[5, 6])], [date(2025, 12, 25)])
+    save_schedule(db, schedule)
+    loaded = load_schedule(db)
+    assert loaded.to_dict() == schedule.to_dict()
+    assert loaded.is_open(datetime(2025, 1, 11, 8, 40))
+    db.close()
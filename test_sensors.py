@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, SensorReading, SensorRollup
+import sensors
+
+# 2025-01-06 09:00:00 UTC
+T0 = 1736154000
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/sensors.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def test_ingest_skips_duplicates_and_faulty_readings(session_factory):
+    store = sensors.SensorStore(session_factory)
+    batch = [("a", T0, 21.0), ("b", T0, 22.0), ("a", T0 + 1.4, 21.5), ("a", T0, 999.0)]
+    assert store.ingest(batch) == 3
+    # A retried batch is ignored
+    assert store.ingest(batch) == 0
+    assert store.ingest([("a", T0, 21.0), ("a", T0 + 5, 21.0)]) == 1
+
+    db = session_factory()
+    assert db.query(SensorReading).count() == 4
+    db.close()
+
+def test_compaction_tiers_and_series(session_factory):
+    store = sensors.SensorStore(session_factory)
+    # Two sensors, one reading every 10 s for two hours
+    store.ingest([(name, T0 + i * 10, 20.0 + (i % 6)) for i in range(720) for name in ("a", "b")])
+
+    db = session_factory()
+    now = T0 + 2 * 3600 + 120
+    written = sensors.compact(db, now)
+    assert written["1h"] == 4  # two closed hours per sensor
+    assert sensors.compact(db, now)["1m"] == 2 * 1  # only the newest minute is redone
+
+    minutes = sensors.series(db, "1m", T0, T0 + 3600, sensor="a")
+    assert len(minutes) == 60
+    assert minutes[0] == {"ts": T0, "count": 6, "average": 22.5, "min": 20.0, "max": 25.0}
+
+    hours = sensors.series(db, "1h", T0, T0 + 7200)
+    assert [h["count"] for h in hours] == [720, 720]
+    assert sensors.series(db, "raw", T0, T0 + 20, sensor="b")[1]["average"] == 21.0
+    assert sensors.series(db, "1m", T0, now, sensor="missing") == []
+
+    deleted = sensors.apply_retention(db, raw=3600, minute=86400, hour=86400, now=now)
+    assert deleted["raw"] == 2 * 372  # readings before now - 1 h
+    assert db.query(SensorRollup).filter(SensorRollup.resolution == sensors.HOUR).count() == 4
+    db.close()
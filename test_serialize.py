@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+import msgpack
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import serialize
+
+NAMES = ("username", "timestamp", "temperature")
+ROWS = [("Anonymous", datetime(2025, 1, 6, 9, 0), 21.5), ("a@example.com", datetime(2025, 1, 6, 9, 1, 0, 250000), 22.0)]
+
+def test_rows_match_isoformat_dicts():
+    body = serialize.dumps(serialize.layout_rows(ROWS, NAMES))
+    assert json.loads(body) == [
+        {"username": name, "timestamp": timestamp.isoformat(), "temperature": temperature}
+        for name, timestamp, temperature in ROWS
+    ]
+
+def test_columns_layout():
+    columns = json.loads(serialize.dumps(serialize.layout_rows(ROWS, NAMES, "columns")))
+    assert columns == {
+        "usernames": ["Anonymous", "a@example.com"],
+        "timestamps": ["2025-01-06T09:00:00", "2025-01-06T09:01:00.250000"],
+        "temperatures": [21.5, 22.0],
+    }
+    assert serialize.as_columns([], NAMES) == {"usernames": [], "timestamps": [], "temperatures": []}
+
+def test_msgpack_negotiation():
+    app = FastAPI()
+
+    @app.get("/votes")
+    def votes(request: Request):
+        return serialize.render(serialize.as_columns(ROWS, NAMES), serialize.negotiate(request))
+
+    client = TestClient(app)
+    response = client.get("/votes", headers={"Accept": "application/x-msgpack, application/json;q=0.5"})
+    assert response.headers["content-type"] == serialize.MSGPACK
+    assert msgpack.unpackb(response.content)["timestamps"][0] == "2025-01-06T09:00:00"
+
+    assert client.get("/votes").headers["content-type"] == serialize.JSON
+    assert client.get("/votes", headers={"Accept": "application/json, application/msgpack"}).headers["content-type"] == serialize.JSON
@@ -0,0 +1,88 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from aggregator import VoteAggregator
+from database import Base, Vote
+from shared_state import MemoryState, SqliteState, LeaderElector, ConfigWatcher
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/shared.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_state(request, session_factory):
+    # Each call is one "process"; sqlite ones share the database file
+    memory = MemoryState()
+    def make(clock):
+        if request.param == "memory":
+            memory.clock = clock
+            return memory
+        return SqliteState(session_factory, clock)
+    return make
+
+def test_config_versions_and_watcher(make_state):
+    clock = Clock()
+    first, second = make_state(clock), make_state(clock)
+    assert first.get("voting_schedule") == (None, 0)
+
+    changes = []
+    watcher = ConfigWatcher(second)
+    watcher.watch("voting_schedule", changes.append)
+    watcher.poll()
+    assert changes == []
+
+    assert first.set("voting_schedule", "a") == 1
+    assert first.set("voting_schedule", "b") == 2
+    watcher.poll()
+    watcher.poll()
+    assert changes == ["b"]
+    assert second.get("voting_schedule") == ("b", 2)
+
+def test_single_leader_and_failover(make_state):
+    clock = Clock()
+    one = LeaderElector(make_state(clock), holder="one", ttl=15, clock=clock)
+    two = LeaderElector(make_state(clock), holder="two", ttl=15, clock=clock)
+    assert one.renew(force=True)
+    assert not two.renew(force=True)
+
+    # "one" keeps renewing, so the lease never lapses
+    clock.now += 10
+    assert one.renew()
+    clock.now += 10
+    assert not two.renew(force=True)
+
+    # "one" stops renewing; "two" takes over after the ttl
+    clock.now += 16
+    assert two.renew(force=True)
+    assert not one.renew(force=True)
+
+    two.resign()
+    assert one.renew(force=True)
+
+def test_aggregator_catches_up_on_votes_from_other_workers(session_factory):
+    now = datetime.utcnow()
+    db = session_factory()
+    db.add(Vote(temperature=20.0, timestamp=now))
+    db.commit()
+
+    aggregator = VoteAggregator()
+    aggregator.rebuild(db, now)
+    assert aggregator.catch_up(db) == []
+
+    db.add_all([Vote(temperature=22.0, timestamp=now), Vote(temperature=24.0, timestamp=now)])
+    db.commit()
+    assert aggregator.catch_up(db) == [(now, 22.0), (now, 24.0)]
+    assert aggregator.catch_up(db) == []
+    assert aggregator.stats(now)["count"] == 3
+    db.close()
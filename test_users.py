@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base, User
+from users import UserDirectory
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add_all([User(email=f"u{i}@example.com", password_hash=f"hash{i}", votes_count=i) for i in range(3)])
+    db.commit()
+    db.close()
+    return factory
+
+def test_lookups_are_cached_and_bounded(session_factory):
+    users = UserDirectory(session_factory, max_entries=2)
+    db = session_factory()
+    assert users.get(db, "u1@example.com").password_hash == "hash1"
+    assert users.get(db, "u1@example.com").id is not None
+    assert not users.get(db, "nobody@example.com").exists
+    users.get(db, "u2@example.com")
+    db.close()
+
+    stats = users.stats()
+    assert (stats["hits"], stats["misses"], stats["size"], stats["evictions"]) == (1, 3, 2, 1)
+    assert users.cached("u1@example.com") is None
+
+def test_entries_expire_and_invalidate(session_factory):
+    clock = Clock()
+    users = UserDirectory(session_factory, ttl=60, clock=clock)
+    db = session_factory()
+    users.get(db, "u1@example.com")
+    db.query(User).filter(User.email == "u1@example.com").update({User.password_hash: "new"})
+    db.commit()
+
+    assert users.get(db, "u1@example.com").password_hash == "hash1"
+    clock.now += 61
+    assert users.get(db, "u1@example.com").password_hash == "new"
+
+    db.query(User).filter(User.email == "u1@example.com").update({User.zone_id: 4})
+    db.commit()
+    users.invalidate("u1@example.com")
+    assert users.get(db, "u1@example.com").zone_id == 4
+    db.close()
+
+def test_vote_counts_are_flushed_as_increments(session_factory):
+    users = UserDirectory(session_factory, max_entries=1)
+    db = session_factory()
+    one = users.get(db, "u1@example.com")
+    users.add_votes(one.id, 2)
+    assert users.votes_count(one) == 3
+
+    # Evicted before the flush: the increments are kept
+    users.get(db, "u2@example.com")
+    # Another worker counted a vote in the meantime
+    db.query(User).filter(User.email == "u1@example.com").update({User.votes_count: User.votes_count + 1})
+    db.commit()
+
+    assert users.flush() == 1
+    assert users.flush() == 0
+    db.expire_all()
+    assert db.query(User.votes_count).filter(User.email == "u1@example.com").scalar() == 4
+    assert users.votes_count(users.get(db, "u1@example.com")) == 4
+    db.close()
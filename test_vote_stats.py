@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, Vote
+import vote_stats
+
+NOW = datetime(2025, 1, 6, 10, 0)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Vote(temperature=30.0, timestamp=NOW - timedelta(hours=2)),  # outside the hour
+        Vote(temperature=20.0, timestamp=NOW - timedelta(minutes=45)),
+        Vote(temperature=21.0, timestamp=NOW - timedelta(minutes=30)),
+        Vote(temperature=22.5, timestamp=NOW - timedelta(minutes=15)),
+        Vote(temperature=24.0, timestamp=NOW),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+def test_fetch_window_returns_temperatures_and_ages(db):
+    temperatures, ages = vote_stats.fetch_window(db, NOW - timedelta(hours=1), NOW)
+    assert temperatures.tolist() == [20.0, 21.0, 22.5, 24.0]
+    assert np.allclose(ages, [2700, 1800, 900, 0], atol=0.01)
+
+def test_summary_statistics(db):
+    temperatures, ages = vote_stats.fetch_window(db, NOW - timedelta(hours=1), NOW)
+    summary = vote_stats.summarize(temperatures, ages, trim=0.25, half_life=900)
+    assert summary["count"] == 4
+    assert summary["mean"] == pytest.approx(21.875)
+    assert summary["median"] == pytest.approx(21.75)
+    # One vote cut from each end
+    assert summary["trimmed_mean"] == pytest.approx(21.75)
+    assert summary["stddev"] == pytest.approx(np.std([20.0, 21.0, 22.5, 24.0]))
+    # Weights 1/8, 1/4, 1/2, 1
+    assert summary["weighted_mean"] == pytest.approx((20 / 8 + 21 / 4 + 22.5 / 2 + 24) / (15 / 8))
+    assert (summary["min"], summary["max"]) == (20.0, 24.0)
+    assert summary["histogram"][20 - 15:25 - 15] == [1, 1, 1, 0, 1]
+
+def test_outlier_barely_moves_the_median():
+    temperatures = np.array([21.0] * 99 + [1000.0])
+    summary = vote_stats.summarize(temperatures)
+    assert summary["mean"] > 30
+    assert summary["median"] == 21.0
+    assert summary["trimmed_mean"] == 21.0
+
+def test_empty_window(db):
+    temperatures, ages = vote_stats.fetch_window(db, NOW + timedelta(hours=1), NOW + timedelta(hours=2))
+    summary = vote_stats.summarize(temperatures, ages)
+    assert summary["count"] == 0
+    assert summary["median"] is None
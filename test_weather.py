@@ -0,0 +1,95 @@
+import threading
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from mock_weather import MockWeather
+from weather import OpenMeteo, WeatherCache, WeatherUnavailable, bucket, outdoor_means, record_reading
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def api():
+    api = MockWeather(port=0).start()
+    yield api
+    api.stop()
+
+def test_bucket_snaps_to_grid():
+    assert bucket(52.5163, 13.3777) == (52.5, 13.4)
+    assert bucket(52.54, 13.36) == (52.5, 13.4)
+    assert bucket(-33.8688, 151.2093, step=0.25) == (-33.75, 151.25)
+
+def test_nearby_requests_share_a_cached_reading(api):
+    clock = Clock()
+    recorded = []
+    cache = WeatherCache(OpenMeteo(api.url), ttl=600, clock=clock,
+                         on_fetch=lambda key, reading, fetched_at: recorded.append((key, reading)))
+    first = cache.get(52.5163, 13.3777)
+    clock.now = 100
+    second = cache.get(52.52, 13.41)
+
+    assert (first["temperature"], first["weathercode"]) == (12.5, 3)
+    assert (second["latitude"], second["longitude"], second["max_age"]) == (52.5, 13.4, 500)
+    assert api.requests == [(52.5, 13.4)]
+    assert recorded == [((52.5, 13.4), {"temperature": 12.5, "weathercode": 3})]
+
+    clock.now = 600
+    cache.get(52.5, 13.4)
+    assert len(api.requests) == 2
+
+def test_concurrent_misses_make_one_upstream_call(api):
+    api.latency = 0.2
+    cache = WeatherCache(OpenMeteo(api.url))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(48.85, 2.35))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8 and all(result["temperature"] == 12.5 for result in results)
+    assert len(api.requests) == 1
+    assert cache.stats()["fetches"] == 1
+
+def test_upstream_errors_fall_back_and_back_off(api, capsys):
+    clock = Clock()
+    cache = WeatherCache(OpenMeteo(api.url), ttl=60, error_ttl=15, clock=clock)
+    api.fail_next = 1
+    with pytest.raises(WeatherUnavailable):
+        cache.get(40.4, -3.7)
+    clock.now = 10
+    with pytest.raises(WeatherUnavailable):
+        cache.get(40.4, -3.7)
+    assert len(api.requests) == 1
+
+    clock.now = 20
+    assert cache.get(40.4, -3.7)["stale"] is False
+    clock.now = 100
+    api.fail_next = 1
+    stale = cache.get(40.4, -3.7)
+    assert (stale["temperature"], stale["stale"], stale["max_age"]) == (12.5, True, 0)
+    # A retry after the back-off that fails again is counted, not logged
+    clock.now = 120
+    api.fail_next = 1
+    assert cache.get(40.4, -3.7)["stale"] is True
+    assert cache.stats()["errors"] == 3
+    assert capsys.readouterr().out.count("Error fetching weather") == 2
+
+def test_outdoor_means_per_span(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/weather.db")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for minute, temperature in [(0, 10.0), (5, 12.0), (20, 20.0), (40, None)]:
+        record_reading(db, (52.5, 13.4), {"temperature": temperature}, datetime(2025, 1, 6, 9, minute))
+
+    spans = [(datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 9, 15)),
+             (datetime(2025, 1, 6, 9, 15), datetime(2025, 1, 6, 9, 30)),
+             (datetime(2025, 1, 6, 9, 30), datetime(2025, 1, 6, 9, 45))]
+    assert outdoor_means(db, spans) == [11.0, 20.0, None]
+    db.close()
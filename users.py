@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+from sqlalchemy import bindparam, func, select, update
+from database import User
+
+
+class CachedUser:
+    __slots__ = ("email", "id", "password_hash", "zone_id", "base_count", "loaded_at")
+
+    def __init__(self, email: str, row=None, loaded_at: float = 0.0):
+        self.email = email
+        # An email with no user is cached too, with id None
+        self.id = row.id if row is not None else None
+        self.password_hash = row.password_hash if row is not None else None
+        self.zone_id = row.zone_id if row is not None else None
+        # votes_count as last read from the users table
+        self.base_count = (row.votes_count or 0) if row is not None else 0
+        self.loaded_at = loaded_at
+
+    @property
+    def exists(self) -> bool:
+        return self.id is not None
+
+
+class UserDirectory:
+    """
+    Bounded LRU of users by email: id, password hash, zone and votes_count,
+    so /vote and /login don't query the users table for every request.
+
+    Entries are reloaded after `ttl` seconds, and invalidate() drops one
+    when the app changes a user. votes_count increments are kept in memory
+    and added to the table by flush(). A user evicted before the flush
+    keeps its pending increments.
+    """
+
+    def __init__(self, session_factory, max_entries: int = 10000, ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+
+        self._entries: "OrderedDict[str, CachedUser]" = OrderedDict()
+        # Unflushed votes_count increments by user id
+        self._pending: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query(emails: Iterable[str]):
+        return select(User.id, User.email, User.password_hash, User.zone_id, User.votes_count).where(
+            User.email.in_(list(emails)))
+
+    # The cached entry, or None on a miss or expiry
+    def cached(self, email: str) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or self.clock() - entry.loaded_at >= self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry
+
+    # Cache the row read for `email` (None if there is no such user)
+    def put(self, email: str, row=None) -> CachedUser:
+        entry = CachedUser(email, row, self.clock())
+        with self._lock:
+            self._entries[email] = entry
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    # Users by email, loading the misses with one query on `db`
+    def get_many(self, db, emails: Iterable[str]) -> Dict[str, CachedUser]:
+        found, missing = {}, []
+        for email in set(emails):
+            entry = self.cached(email)
+            if entry is None:
+                missing.append(email)
+            else:
+                found[email] = entry
+        if missing:
+            rows = {row.email: row for row in db.execute(self.query(missing))}
+            for email in missing:
+                found[email] = self.put(email, rows.get(email))
+        return found
+
+    def get(self, db, email: str) -> CachedUser:
+        return self.get_many(db, [email])[email]
+
+    def invalidate(self, email: Optional[str] = None):
+        with self._lock:
+            if email is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(email, None)
+
+    # The user's votes_count including increments not flushed yet
+    def votes_count(self, entry: CachedUser) -> int:
+        with self._lock:
+            return entry.base_count + self._pending.get(entry.id, 0)
+
+    def add_votes(self, user_id: int, count: int = 1):
+        with self._lock:
+            self._pending[user_id] = self._pending.get(user_id, 0) + count
+
+    # Add pending increments to the users table and re-read the totals,
+    # which also picks up votes counted by other workers. Returns the
+    # number of users updated.
+    def flush(self) -> int:
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return 0
+
+        users = User.__table__
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(users).where(users.c.id == bindparam("user_id")).values(
+                    votes_count=func.coalesce(users.c.votes_count, 0) + bindparam("delta")),
+                [{"user_id": user_id, "delta": delta} for user_id, delta in pending.items()],
+            )
+            totals = dict(db.execute(select(User.id, User.votes_count).where(User.id.in_(list(pending)))).all())
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Counts read in between see either the old base plus every
+        # increment or the new base plus the ones since the snapshot
+        with self._lock:
+            for user_id, delta in pending.items():
+                left = self._pending.get(user_id, 0) - delta
+                if left:
+                    self._pending[user_id] = left
+                else:
+                    self._pending.pop(user_id, None)
+            for entry in self._entries.values():
+                if entry.id in totals:
+                    entry.base_count = totals[entry.id] or 0
+            self.flushes += 1
+        return len(pending)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "pending_users": len(self._pending),
+                "flushes": self.flushes,
+            }
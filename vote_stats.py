@@ -0,0 +1,91 @@
+from datetime import datetime
+from itertools import chain
+from typing import TYPE_CHECKING, Optional, Tuple
+from rollups import HISTOGRAM_BINS, HISTOGRAM_MIN
+
+# NumPy is imported on first use: only non-mean /average methods and
+# /stats/summary need it
+if TYPE_CHECKING:
+    import numpy as np
+
+# How /average summarizes the last hour (AIRVOTE_AVERAGE_METHOD)
+METHODS = ("mean", "median", "trimmed_mean", "weighted_mean")
+
+# Temperature and age in seconds of every vote in a time range, read
+# straight off the (timestamp, temperature) index
+WINDOW_QUERY = (
+    "SELECT temperature, (julianday(?) - julianday(timestamp)) * 86400.0 "
+    "FROM votes WHERE timestamp >= ? AND timestamp <= ?"
+)
+# The same for one zone, off the (zone_id, timestamp, temperature) index
+ZONE_WINDOW_QUERY = WINDOW_QUERY + " AND zone_id = ?"
+
+
+# Same text format SQLAlchemy stores DateTime columns in
+def _sqlite_time(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+# Temperatures and ages (seconds before `until`) of the votes cast in
+# [since, until], in one zone if `zone_id` is given, as two float arrays.
+# Runs on the DBAPI cursor so no ORM objects or Row tuples are built.
+def fetch_window(db, since: datetime, until: datetime,
+                 zone_id: Optional[int] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+    import numpy as np
+
+    end = _sqlite_time(until)
+    if zone_id is None:
+        query, params = WINDOW_QUERY, (end, _sqlite_time(since), end)
+    else:
+        query, params = ZONE_WINDOW_QUERY, (end, _sqlite_time(since), end, zone_id)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=2 * len(rows)).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def summarize(temperatures: "np.ndarray", ages: Optional["np.ndarray"] = None,
+              trim: float = 0.1, half_life: float = 900.0) -> dict:
+    """
+    Every statistic /average can serve, from one sort of the window.
+
+    `trim` is the fraction cut from each end for the trimmed mean; votes
+    lose half their weight every `half_life` seconds of age for the
+    weighted mean. The histogram uses the rollup bins (one per degree).
+    """
+    import numpy as np
+
+    count = int(temperatures.size)
+    if count == 0:
+        return {"count": 0, "mean": None, "median": None, "trimmed_mean": None, "weighted_mean": None,
+                "stddev": None, "min": None, "max": None, "histogram": [0] * HISTOGRAM_BINS}
+
+    ordered = np.sort(temperatures)
+    middle = count // 2
+    median = ordered[middle] if count % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+    cut = int(count * trim)
+    trimmed = ordered[cut:count - cut] if count > 2 * cut else ordered
+
+    if ages is None:
+        weighted = ordered.mean()
+    else:
+        # Clock skew can put a vote slightly in the future; count it as new
+        weights = np.exp2(-np.maximum(ages, 0.0) / half_life)
+        weighted = np.dot(temperatures, weights) / weights.sum()
+
+    bins = np.clip(np.floor(temperatures).astype(np.int64) - HISTOGRAM_MIN, 0, HISTOGRAM_BINS - 1)
+    return {
+        "count": count,
+        "mean": float(ordered.mean()),
+        "median": float(median),
+        "trimmed_mean": float(trimmed.mean()),
+        "weighted_mean": float(weighted),
+        "stddev": float(ordered.std()),
+        "min": float(ordered[0]),
+        "max": float(ordered[-1]),
+        "histogram": np.bincount(bins, minlength=HISTOGRAM_BINS).tolist(),
+    }
@@ -0,0 +1,238 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from database import WeatherReading
+import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+Bucket = Tuple[float, float]
+
+
+class WeatherUnavailable(Exception):
+    """The upstream failed and there is no cached reading to fall back on."""
+
+
+class OpenMeteo:
+    """
+    Current conditions from an Open-Meteo style forecast API. `url` can
+    point at mock_weather.py instead; any callable taking (latitude,
+    longitude) and returning {"temperature", "weathercode"} can stand in
+    for this class.
+    """
+
+    def __init__(self, url: str = "https://api.open-meteo.com/v1/forecast", timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        # Opened on the first fetch (requests is imported there)
+        self.session: Optional["requests.Session"] = None
+
+    def __call__(self, latitude: float, longitude: float) -> dict:
+        import requests
+
+        if self.session is None:
+            self.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.url, timeout=self.timeout, params={
+                "latitude": latitude, "longitude": longitude,
+                "current": "temperature_2m,weathercode", "timezone": "auto",
+            })
+            response.raise_for_status()
+            current = response.json()["current"]
+        except Exception:
+            metrics.OUTBOUND.observe(time.perf_counter() - started, "weather", "error")
+            raise
+        metrics.OUTBOUND.observe(time.perf_counter() - started, "weather", "ok")
+        return {"temperature": current["temperature_2m"], "weathercode": current["weathercode"]}
+
+
+# Snap coordinates to the centre of a `step`-degree grid cell, so nearby
+# clients share one cache entry (0.1° is about 11 km)
+def bucket(latitude: float, longitude: float, step: float = 0.1) -> Bucket:
+    digits = max(0, len(f"{step:g}".partition(".")[2]))
+    return round(round(latitude / step) * step, digits), round(round(longitude / step) * step, digits)
+
+
+class _Entry:
+    __slots__ = ("reading", "fetched_at", "expires_at")
+
+    def __init__(self, reading: dict, fetched_at: datetime, expires_at: float):
+        self.reading = reading
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+
+class WeatherCache:
+    """
+    Upstream readings per coordinate bucket, kept for `ttl` seconds in a
+    bounded LRU.
+
+    Concurrent misses for one bucket share a single upstream fetch. When
+    the upstream fails, an expired reading is served instead, and the
+    bucket is not retried for `error_ttl` seconds. Each fetched reading
+    is passed to `on_fetch`, e.g. to record it.
+    """
+
+    def __init__(self, upstream: Callable[[float, float], dict], ttl: float = 600.0, step: float = 0.1,
+                 max_entries: int = 1024, error_ttl: float = 15.0,
+                 on_fetch: Optional[Callable[[Bucket, dict, datetime], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.upstream = upstream
+        self.ttl = ttl
+        self.step = step
+        self.max_entries = max_entries
+        self.error_ttl = error_ttl
+        self.on_fetch = on_fetch
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.errors = 0
+        self.shared = 0
+        self.stale = 0
+        self.record_errors = 0
+        self._record_failing = False
+
+        self._entries: "OrderedDict[Bucket, _Entry]" = OrderedDict()
+        self._inflight: Dict[Bucket, Future] = {}
+        self._failed: Dict[Bucket, float] = {}
+        self._lock = threading.Lock()
+
+    # The bucket's reading as {"latitude", "longitude", "temperature",
+    # "weathercode", "fetched_at", "max_age", "stale"}; raises
+    # WeatherUnavailable
+    def get(self, latitude: float, longitude: float) -> dict:
+        key = bucket(latitude, longitude, self.step)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._result(key, entry, now)
+            self.misses += 1
+
+            if self._failed.get(key, 0) > now:
+                return self._fallback(key, entry, now)
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+
+        if leader:
+            self._fetch(key, future)
+        if future.exception() is not None:
+            with self._lock:
+                return self._fallback(key, self._entries.get(key), self.clock())
+        with self._lock:
+            return self._result(key, future.result(), self.clock())
+
+    def _fetch(self, key: Bucket, future: Future):
+        try:
+            reading = self.upstream(*key)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                # Logged when the bucket starts failing, not on every retry
+                # (errors are counted here and in metrics.OUTBOUND)
+                if key not in self._failed:
+                    print(f"Error fetching weather for {key}: {e}")
+                self._failed[key] = self.clock() + self.error_ttl
+                del self._inflight[key]
+            future.set_exception(e)
+            return
+
+        fetched_at = datetime.utcnow()
+        entry = _Entry(reading, fetched_at, self.clock() + self.ttl)
+        with self._lock:
+            self.fetches += 1
+            self._failed.pop(key, None)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(entry)
+        if self.on_fetch is not None:
+            try:
+                self.on_fetch(key, reading, fetched_at)
+            except Exception as e:
+                with self._lock:
+                    self.record_errors += 1
+                    first = not self._record_failing
+                    self._record_failing = True
+                if first:
+                    print(f"Error recording weather reading: {e}")
+            else:
+                self._record_failing = False
+
+    # Called with the lock held
+    def _fallback(self, key: Bucket, entry: Optional[_Entry], now: float) -> dict:
+        if entry is None:
+            raise WeatherUnavailable()
+        self.stale += 1
+        return self._result(key, entry, now)
+
+    def _result(self, key: Bucket, entry: _Entry, now: float) -> dict:
+        return {
+            "latitude": key[0],
+            "longitude": key[1],
+            "temperature": entry.reading.get("temperature"),
+            "weathercode": entry.reading.get("weathercode"),
+            "fetched_at": entry.fetched_at.isoformat(),
+            "max_age": max(0, int(entry.expires_at - now)),
+            "stale": entry.expires_at <= now,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "fetches": self.fetches,
+                "shared_fetches": self.shared,
+                "errors": self.errors,
+                "stale": self.stale,
+                "record_errors": self.record_errors,
+            }
+
+
+def record_reading(db: Session, key: Bucket, reading: dict, fetched_at: datetime):
+    db.add(WeatherReading(latitude=key[0], longitude=key[1], temperature=reading.get("temperature"),
+                          weathercode=reading.get("weathercode"), fetched_at=fetched_at))
+    db.commit()
+
+
+# Mean outdoor temperature recorded during each (start, end) span, None
+# for spans without readings. The readings are read once, in time order;
+# each span is then two bisects into running sums.
+def outdoor_means(db: Session, spans: List[Tuple[datetime, datetime]]) -> List[Optional[float]]:
+    if not spans:
+        return []
+    rows = db.query(WeatherReading.fetched_at, WeatherReading.temperature).filter(
+        WeatherReading.fetched_at >= min(start for start, _ in spans),
+        WeatherReading.fetched_at <= max(end for _, end in spans),
+        WeatherReading.temperature.isnot(None),
+    ).order_by(WeatherReading.fetched_at).all()
+    times = [fetched_at for fetched_at, _ in rows]
+    sums = [0.0]
+    for _, temperature in rows:
+        sums.append(sums[-1] + temperature)
+
+    means = []
+    for start, end in spans:
+        lo, hi = bisect_left(times, start), bisect_right(times, end)
+        means.append(round((sums[hi] - sums[lo]) / (hi - lo), 1) if hi > lo else None)
+    return means
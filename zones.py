@@ -0,0 +1,41 @@
+from typing import Collection, Dict, Optional
+from urllib.parse import urlsplit
+from sqlalchemy.orm import Session
+from database import User, Zone
+
+
+def _as_dict(zone: Zone) -> dict:
+    return {"id": zone.id, "name": zone.name, "thermostat_url": zone.thermostat_url}
+
+
+# Every zone by id; small enough to keep in memory and swap as a whole
+def load_zones(db: Session) -> Dict[int, dict]:
+    return {zone.id: _as_dict(zone) for zone in db.query(Zone).order_by(Zone.id)}
+
+
+# True if `url` is an http(s) URL on one of `hosts`
+def thermostat_url_allowed(url: str, hosts: Collection[str]) -> bool:
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and host is not None and host.lower() in hosts
+
+
+# Create the zone or, if the name exists, repoint it at a new thermostat
+def save_zone(db: Session, name: str, thermostat_url: Optional[str]) -> dict:
+    zone = db.query(Zone).filter(Zone.name == name).first()
+    if zone is None:
+        zone = Zone(name=name)
+        db.add(zone)
+    zone.thermostat_url = thermostat_url
+    db.commit()
+    return _as_dict(zone)
+
+
+# Set the zone a user's votes count towards; False if there is no such user
+def assign_user(db: Session, email: str, zone_id: Optional[int]) -> bool:
+    updated = db.query(User).filter(User.email == email).update({User.zone_id: zone_id})
+    db.commit()
+    return bool(updated)